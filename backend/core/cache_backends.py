@@ -0,0 +1,228 @@
+"""
+Cache backend with Redis failover
+
+FailoverCache serves every call from Redis (through django-redis) and falls
+back to a local memory tier of the process while Redis is unreachable:
+
+    - nothing connects at import time: the Redis client is created and
+      connected on the first cache call, so manage.py, gunicorn workers and
+      Celery forks don't wait on Redis during startup
+    - a connection error or timeout marks Redis down for RETRY_INTERVAL
+      seconds (for the whole process); calls in that window go straight to
+      the local tier instead of waiting on Redis again
+    - the first call after the interval tries Redis again; once it answers,
+      the keys and patterns deleted while it was down are deleted in Redis
+      too (so invalidate_process_caches() isn't lost) and the local tier is
+      dropped, as other workers never saw it
+
+tier_metrics() reports which tier served the calls of this process (also
+shown by the health check).
+
+    CACHES = {'default': {
+        'BACKEND': 'core.cache_backends.FailoverCache',
+        'LOCATION': 'redis://localhost:6379/0',
+        'OPTIONS': {'RETRY_INTERVAL': 30, 'REDIS_OPTIONS': {...django-redis OPTIONS...}},
+    }}
+"""
+import logging
+import threading
+import time
+from collections import Counter
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+from django.core.cache.backends.locmem import LocMemCache
+from django_redis.cache import RedisCache
+from django_redis.exceptions import ConnectionInterrupted
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+
+logger = logging.getLogger(__name__)
+
+REDIS_ERRORS = (ConnectionInterrupted, RedisConnectionError, RedisTimeoutError)
+
+# Deletions remembered while Redis is down; past this the whole key prefix
+# is invalidated on recovery
+MAX_PENDING_DELETES = 10000
+
+# Django creates one backend instance per thread, the tier state is shared
+# by the process (per LOCATION)
+_states = {}
+_states_lock = threading.Lock()
+
+
+class _TierState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.down_until = None
+        self.pending_keys = set()
+        self.pending_patterns = set()
+        self.pending_clear = False
+        self.calls = Counter()
+
+
+def _tier_state(location):
+    with _states_lock:
+        return _states.setdefault(location, _TierState())
+
+
+def tier_metrics():
+    """
+    Per-location counters of the calls served by each tier in this process
+    """
+    return {
+        location: {
+            'tier': 'local' if state.down_until is not None else 'redis',
+            **state.calls,
+        }
+        for location, state in list(_states.items())
+    }
+
+
+class FailoverCache(BaseCache):
+    """
+    Redis cache falling back to a local memory tier while Redis is down
+    """
+
+    def __init__(self, server, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.location = server
+        self.retry_interval = options.get('RETRY_INTERVAL', 30)
+        self._redis = RedisCache(server, {**params, 'OPTIONS': options.get('REDIS_OPTIONS', {})})
+        self._local = LocMemCache(f'failover:{server}', {**params, 'OPTIONS': {}})
+        self._state = _tier_state(server)
+
+    @property
+    def tier(self):
+        return 'local' if self._state.down_until is not None else 'redis'
+
+    # Tier selection
+
+    def _redis_usable(self):
+        down_until = self._state.down_until
+        return down_until is None or time.monotonic() >= down_until
+
+    def _mark_down(self, error):
+        state = self._state
+        with state.lock:
+            if state.down_until is None:
+                state.calls['failovers'] += 1
+                logger.warning(f"Redis unreachable ({error}); serving the cache from local memory")
+            state.down_until = time.monotonic() + self.retry_interval
+
+    def _recover(self):
+        state = self._state
+        with state.lock:
+            if state.down_until is None:
+                return
+            keys, patterns, clear = state.pending_keys, state.pending_patterns, state.pending_clear
+            state.pending_keys, state.pending_patterns, state.pending_clear = set(), set(), False
+            state.down_until = None
+            state.calls['recoveries'] += 1
+
+        # Replay the invalidations Redis missed; the local tier is dropped as
+        # other processes never saw what was written there
+        if clear:
+            self._redis.delete_pattern('*')
+        else:
+            for pattern, version in patterns:
+                self._redis.delete_pattern(pattern, version=version)
+            for key, version in keys:
+                self._redis.delete(key, version=version)
+        self._local.clear()
+        logger.info("Redis reachable again; cache served from Redis")
+
+    def _try_redis(self, method, *args, **kwargs):
+        """
+        Run a call on Redis; returns (True, result), or (False, None) when
+        Redis is down
+        """
+        if not self._redis_usable():
+            return False, None
+        try:
+            result = getattr(self._redis, method)(*args, **kwargs)
+            if self._state.down_until is not None:
+                self._recover()
+        except REDIS_ERRORS as e:
+            self._mark_down(e)
+            return False, None
+        self._state.calls['redis'] += 1
+        return True, result
+
+    def _call(self, method, *args, **kwargs):
+        served, result = self._try_redis(method, *args, **kwargs)
+        if served:
+            return result
+        self._state.calls['local'] += 1
+        return getattr(self._local, method)(*args, **kwargs)
+
+    def _remember_deletes(self, keys=(), pattern=None, clear=False):
+        state = self._state
+        if state.down_until is None:
+            return
+        with state.lock:
+            if clear or len(state.pending_keys) + len(keys) > MAX_PENDING_DELETES:
+                state.pending_clear = True
+            elif pattern is not None:
+                state.pending_patterns.add(pattern)
+            else:
+                state.pending_keys.update(keys)
+
+    # Cache API
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._call('add', key, value, timeout=timeout, version=version)
+
+    def get(self, key, default=None, version=None):
+        return self._call('get', key, default=default, version=version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._call('set', key, value, timeout=timeout, version=version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._call('touch', key, timeout=timeout, version=version)
+
+    def has_key(self, key, version=None):
+        return self._call('has_key', key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        return self._call('incr', key, delta=delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        return self._call('decr', key, delta=delta, version=version)
+
+    def get_many(self, keys, version=None):
+        return self._call('get_many', keys, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._call('set_many', data, timeout=timeout, version=version)
+
+    def delete(self, key, version=None):
+        result = self._call('delete', key, version=version)
+        self._remember_deletes(keys=[(key, version)])
+        return result
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        result = self._call('delete_many', keys, version=version)
+        self._remember_deletes(keys=[(key, version) for key in keys])
+        return result
+
+    def delete_pattern(self, pattern, version=None):
+        """
+        Delete the keys matching a glob pattern (the local tier, which can't
+        match patterns, is cleared instead)
+        """
+        served, result = self._try_redis('delete_pattern', pattern, version=version)
+        if served:
+            return result
+        self._state.calls['local'] += 1
+        self._local.clear()
+        self._remember_deletes(pattern=(pattern, version))
+        return 0
+
+    def clear(self):
+        result = self._call('clear')
+        self._remember_deletes(clear=True)
+        return result
+
+    def close(self, **kwargs):
+        self._redis.close(**kwargs)
@@ -0,0 +1,101 @@
+"""
+Read-replica routing
+
+Replicas are listed in DATABASE_REPLICA_URLS and registered as the aliases
+in READ_REPLICAS. Only views that opt in with ReplicaReadMixin (the public
+dataset endpoints and the dashboard) read from a replica, so long searches
+and exports don't compete with imports on the primary; everything else,
+and every write, stays on the primary.
+
+Read-your-writes: a user who just changed something (any successful
+non-GET request, or an import/append finishing in the background) is pinned
+to the primary for READ_REPLICA_PIN_SECONDS, so they see their own data
+even if the replicas lag behind.
+"""
+import logging
+import random
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+logger = logging.getLogger(__name__)
+
+PIN_CACHE_PREFIX = 'db_primary_pin'
+
+# Set by ReplicaReadMixin and reset at the start of every request (see
+# ReplicaPinningMiddleware); it stays set while a streaming response is
+# consumed, after the view returned
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def replicas_enabled():
+    return bool(settings.READ_REPLICAS)
+
+
+def use_replica_reads(enabled):
+    _replica_reads.set(enabled)
+
+
+def pin_to_primary(user_id):
+    """
+    Send the replica reads of a user to the primary for READ_REPLICA_PIN_SECONDS
+    """
+    if not user_id or not replicas_enabled():
+        return
+    try:
+        cache.set(f'{PIN_CACHE_PREFIX}:{user_id}', True, settings.READ_REPLICA_PIN_SECONDS)
+    except Exception as e:
+        logger.warning(f"Could not pin user {user_id} to the primary: {e}")
+
+
+def is_pinned(user):
+    if user is None or not user.is_authenticated:
+        return False
+    try:
+        return bool(cache.get(f'{PIN_CACHE_PREFIX}:{user.pk}'))
+    except Exception as e:
+        # Without the pin a user may briefly read stale data; the primary is the safe side
+        logger.warning(f"Could not read primary pin of user {user.pk}: {e}")
+        return True
+
+
+class ReplicaRouter:
+    """
+    Database router sending opted-in reads to a random read replica
+    """
+
+    def db_for_read(self, model, **hints):
+        if not _replica_reads.get() or not replicas_enabled():
+            return None
+        # Related objects are read from where their instance came from
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return random.choice(settings.READ_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {'default', *settings.READ_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.READ_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    """
+    APIView mixin routing the reads of GET/HEAD requests to a read replica,
+    unless the user is pinned to the primary
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS and replicas_enabled() and not is_pinned(request.user):
+            use_replica_reads(True)
@@ -43,9 +43,20 @@ def check_cache():
 
         if result == test_value:
             cache.delete(test_key)
+            # FailoverCache serves from local memory while Redis is down
+            tier = getattr(cache, 'tier', None)
+            if tier == 'local':
+                from core.cache_backends import tier_metrics
+                return {
+                    'status': 'degraded',
+                    'message': 'Redis unreachable, cache served from local memory',
+                    'tier': tier,
+                    'metrics': tier_metrics(),
+                }
             return {
                 'status': 'healthy',
-                'message': 'Cache connection OK'
+                'message': 'Cache connection OK',
+                **({'tier': tier} if tier else {}),
             }
         else:
             return {
@@ -63,3 +63,27 @@ class RequestIDMiddleware:
             # Clean up thread local
             if hasattr(thread, 'request'):
                 delattr(thread, 'request')
+
+
+class ReplicaPinningMiddleware:
+    """
+    Middleware resetting read-replica routing per request and pinning users
+    who changed data to the primary (see core.db_routing)
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        from rest_framework.permissions import SAFE_METHODS
+        from core.db_routing import use_replica_reads, pin_to_primary
+
+        use_replica_reads(False)
+        response = self.get_response(request)
+
+        # DRF sets the authenticated (e.g. JWT) user back on the request
+        user = getattr(request, 'user', None)
+        if (request.method not in SAFE_METHODS and response.status_code < 400
+                and user is not None and user.is_authenticated):
+            pin_to_primary(user.pk)
+
+        return response
@@ -0,0 +1,48 @@
+"""
+orjson-backed renderers for the DataPort API
+"""
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    Drop-in replacement for DRF's JSONRenderer using orjson.
+    Types orjson does not know (Decimal, lazy strings, querysets...) are
+    delegated to DRF's JSONEncoder, and anything orjson rejects (e.g. integers
+    wider than 64 bits) falls back to the stdlib renderer.
+    """
+    options = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+    _fallback_encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """
+        Render `data` into JSON, returning a bytestring.
+        """
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        options = self.options
+        if self.get_indent(accepted_media_type, renderer_context) is not None:
+            options |= orjson.OPT_INDENT_2
+
+        try:
+            ret = orjson.dumps(data, default=self._fallback_encoder.default, option=options)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Keep the output a strict javascript subset, like DRF does
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class EventStreamRenderer(ORJSONRenderer):
+    """
+    Lets views that stream Server-Sent Events pass content negotiation for
+    `Accept: text/event-stream`; error responses are rendered as JSON.
+    """
+    media_type = 'text/event-stream'
+    format = 'sse'
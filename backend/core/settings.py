@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 import os
 from dotenv import load_dotenv
+from core.database import database_config, parse_pool
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -73,6 +74,7 @@ MIDDLEWARE = [
     # Custom middleware
     'core.middleware.RequestIDMiddleware',
     'core.middleware.APIVersionMiddleware',
+    'core.middleware.ReplicaPinningMiddleware',
 ]
 
 ROOT_URLCONF = 'core.urls'
@@ -99,30 +101,62 @@ WSGI_APPLICATION = 'core.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# DATABASE_URL selects the backend (see core/database.py): postgresql://... in production,
+# sqlite:///db.sqlite3 (WAL mode) for development
+DATABASE_URL = os.environ.get('DATABASE_URL', 'sqlite:///db.sqlite3')
+# Seconds a PostgreSQL connection is kept open between requests/tasks
+DATABASE_CONN_MAX_AGE = int(os.environ.get('DATABASE_CONN_MAX_AGE', 60))
+# psycopg3 connection pool per process as "min:max" (e.g. "2:10"; needs psycopg[pool], off by default)
+DATABASE_POOL = os.environ.get('DATABASE_POOL', '')
+DATABASE_POOL_TIMEOUT = int(os.environ.get('DATABASE_POOL_TIMEOUT', 10))
+# Set when connecting through PgBouncer in transaction pooling mode (disables server-side cursors)
+DATABASE_PGBOUNCER = os.environ.get('DATABASE_PGBOUNCER', 'False') == 'True'
+
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_config(
+        DATABASE_URL, BASE_DIR,
+        conn_max_age=DATABASE_CONN_MAX_AGE,
+        pool=parse_pool(DATABASE_POOL),
+        pool_timeout=DATABASE_POOL_TIMEOUT,
+        pgbouncer=DATABASE_PGBOUNCER,
+    )
 }
 
-# Cache configuration with Redis (fallback to local memory if Redis not available)
+# Read replicas (comma-separated DATABASE_URLs, registered as replica_1, replica_2, ...). The public
+# dataset endpoints and the dashboard read from them; see core/db_routing.py
+DATABASE_REPLICA_URLS = [url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+READ_REPLICAS = []
+for index, replica_url in enumerate(DATABASE_REPLICA_URLS, start=1):
+    DATABASES[f'replica_{index}'] = {
+        **database_config(
+            replica_url, BASE_DIR,
+            conn_max_age=DATABASE_CONN_MAX_AGE,
+            pool=parse_pool(DATABASE_POOL),
+            pool_timeout=DATABASE_POOL_TIMEOUT,
+            pgbouncer=DATABASE_PGBOUNCER,
+        ),
+        'TEST': {'MIRROR': 'default'},
+    }
+    READ_REPLICAS.append(f'replica_{index}')
+# Seconds a user's reads stay on the primary after they changed data (read-your-writes)
+READ_REPLICA_PIN_SECONDS = int(os.environ.get('READ_REPLICA_PIN_SECONDS', 30))
+DATABASE_ROUTERS = ['core.db_routing.ReplicaRouter']
+
+# Cache: Redis with a per-process local memory tier used while Redis is unreachable (see
+# core/cache_backends.py). Redis is connected on first use, not at import, and retried every
+# CACHE_FAILOVER_RETRY_INTERVAL seconds after a failure
 REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+CACHE_FAILOVER_RETRY_INTERVAL = int(os.environ.get('CACHE_FAILOVER_RETRY_INTERVAL', 30))
 
-# Try to use Redis, fallback to local memory cache if not available
-try:
-    import redis
-    r = redis.Redis.from_url(REDIS_URL, socket_connect_timeout=1)
-    r.ping()
-
-    # Redis is available
-    CACHES = {
-        'default': {
-            'BACKEND': 'django_redis.cache.RedisCache',
-            'LOCATION': REDIS_URL,
-            'OPTIONS': {
+CACHES = {
+    'default': {
+        'BACKEND': 'core.cache_backends.FailoverCache',
+        'LOCATION': REDIS_URL,
+        'OPTIONS': {
+            'RETRY_INTERVAL': CACHE_FAILOVER_RETRY_INTERVAL,
+            'REDIS_OPTIONS': {
                 'CLIENT_CLASS': 'django_redis.client.DefaultClient',
-                'SOCKET_CONNECT_TIMEOUT': 5,
+                'SOCKET_CONNECT_TIMEOUT': 1,
                 'SOCKET_TIMEOUT': 5,
                 'COMPRESSOR': 'django_redis.compressors.zlib.ZlibCompressor',
                 'CONNECTION_POOL_KWARGS': {
@@ -130,24 +164,13 @@ try:
                     'retry_on_timeout': True,
                 },
             },
-            'KEY_PREFIX': 'dataport',
-            'TIMEOUT': 300,
-        }
-    }
-    SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
-    SESSION_CACHE_ALIAS = 'default'
-    print("[OK] Redis conectado - usando cache Redis")
-except Exception as e:
-    # Redis not available, use local memory cache
-    CACHES = {
-        'default': {
-            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-            'LOCATION': 'dataport-cache',
-            'TIMEOUT': 300,
-        }
+        },
+        'KEY_PREFIX': 'dataport',
+        'TIMEOUT': 300,
     }
-    SESSION_ENGINE = 'django.contrib.sessions.backends.db'
-    print(f"[INFO] Redis nao disponivel - usando cache em memoria local")
+}
+# Sessions survive a failover to the local tier (it isn't shared between workers)
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
 
 
 # Password validation
@@ -206,6 +229,16 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # orjson-backed JSON rendering/parsing (record payloads can be hundreds of thousands of dicts)
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     # API Documentation
@@ -309,6 +342,115 @@ CELERY_WORKER_PREFETCH_MULTIPLIER = 1  # One task at a time
 CELERY_WORKER_MAX_TASKS_PER_CHILD = 1000  # Restart worker after 1000 tasks
 CELERY_TASK_ACKS_LATE = True  # Acknowledge task after completion
 CELERY_TASK_REJECT_ON_WORKER_LOST = True  # Re-queue task if worker crashes
+CELERY_BEAT_SCHEDULE = {
+    'cleanup-import-spool': {
+        'task': 'data_import.tasks.cleanup_spool_async',
+        'schedule': 60 * 60,  # hourly
+    },
+    'cleanup-export-artifacts': {
+        'task': 'data_import.tasks.cleanup_exports_async',
+        'schedule': 60 * 60,  # hourly
+    },
+    'purge-deleted-datasets': {
+        'task': 'data_import.tasks.purge_deleted_datasets_async',
+        'schedule': 60 * 60,  # hourly
+    },
+    'archive-inactive-datasets': {
+        'task': 'data_import.tasks.archive_inactive_datasets_async',
+        'schedule': 60 * 60 * 24,  # daily
+    },
+}
+
+# Data Export Configuration
+# Export artifacts are written by Celery workers and served with HTTP Range support
+EXPORT_ROOT = Path(os.environ.get('EXPORT_ROOT', BASE_DIR / 'media' / 'exports'))
+# Export artifacts are removed this many seconds after they were written
+EXPORT_ARTIFACT_TTL = int(os.environ.get('EXPORT_ARTIFACT_TTL', 60 * 60 * 24))
+# Public xlsx downloads above this many records are routed to a background export job
+EXPORT_SYNC_MAX_ROWS = int(os.environ.get('EXPORT_SYNC_MAX_ROWS', 50000))
+# Gzip-compress streamed CSV downloads when the client sends Accept-Encoding: gzip
+EXPORT_GZIP_STREAMING = os.environ.get('EXPORT_GZIP_STREAMING', 'True') == 'True'
+
+# Cold-tier archival: inactive datasets untouched for ARCHIVE_AFTER_DAYS days are moved to
+# compressed Parquet files under ARCHIVE_ROOT and loaded back when reactivated (0 disables it)
+ARCHIVE_ROOT = Path(os.environ.get('ARCHIVE_ROOT', BASE_DIR / 'media' / 'archive'))
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 90))
+ARCHIVE_COMPRESSION = os.environ.get('ARCHIVE_COMPRESSION', 'zstd')
+
+# Async Task Progress Configuration
+# Hot task progress lives in the cache; the AsyncTask row is only written every few seconds
+TASK_PROGRESS_PUBLISH_INTERVAL = float(os.environ.get('TASK_PROGRESS_PUBLISH_INTERVAL', 0.5))
+TASK_PROGRESS_DB_INTERVAL = float(os.environ.get('TASK_PROGRESS_DB_INTERVAL', 5))
+TASK_PROGRESS_CACHE_TIMEOUT = int(os.environ.get('TASK_PROGRESS_CACHE_TIMEOUT', 60 * 60 * 24))
+# How often long-poll / SSE status requests re-read the cached state
+TASK_PROGRESS_POLL_INTERVAL = float(os.environ.get('TASK_PROGRESS_POLL_INTERVAL', 0.5))
+# Upper bounds for ?wait= long-polls and for a single SSE stream. Each one holds
+# a gunicorn thread while it waits: deploy with gthread workers (see Dockerfile)
+TASK_STATUS_LONG_POLL_MAX = int(os.environ.get('TASK_STATUS_LONG_POLL_MAX', 25))
+TASK_STATUS_STREAM_TIMEOUT = int(os.environ.get('TASK_STATUS_STREAM_TIMEOUT', 60))
+
+# Parallel Import Configuration
+# File imports above IMPORT_PARALLEL_MIN_BYTES are split into chunks processed by a Celery chord
+IMPORT_PARALLEL_ENABLED = os.environ.get('IMPORT_PARALLEL_ENABLED', 'True') == 'True'
+IMPORT_PARALLEL_MIN_BYTES = int(os.environ.get('IMPORT_PARALLEL_MIN_BYTES', 20 * 1024 * 1024))
+# CSV chunks are byte ranges, XLSX chunks are row ranges
+IMPORT_CHUNK_BYTES = int(os.environ.get('IMPORT_CHUNK_BYTES', 8 * 1024 * 1024))
+IMPORT_CHUNK_ROWS = int(os.environ.get('IMPORT_CHUNK_ROWS', 20000))
+
+# Deleted datasets are hidden at once and their records deleted in the background,
+# this many rows per DELETE statement (see data_import/deletion.py)
+DATASET_PURGE_BATCH_SIZE = int(os.environ.get('DATASET_PURGE_BATCH_SIZE', 10000))
+
+# PostgreSQL only: partition the records table by dataset (convert an existing table with
+# `manage.py partition_records`; see data_import/partitioning.py)
+RECORD_PARTITIONING = os.environ.get('RECORD_PARTITIONING', 'False') == 'True'
+
+# Batch imports (workbooks and zip bundles): maximum sheets/files imported from one upload
+IMPORT_BATCH_MAX_ENTRIES = int(os.environ.get('IMPORT_BATCH_MAX_ENTRIES', 100))
+
+# Resource limits of file imports: the row limit applies to imports run inside the
+# request, the column limit to all of them (checked by a pre-flight scan before parsing)
+IMPORT_SYNC_MAX_ROWS = int(os.environ.get('IMPORT_SYNC_MAX_ROWS', 100000))
+IMPORT_MAX_COLUMNS = int(os.environ.get('IMPORT_MAX_COLUMNS', 100))
+# Compressed imports (.csv.gz, .csv.bz2, .csv.zst, .zip) stop past this many decompressed bytes
+IMPORT_DECOMPRESSED_MAX_BYTES = int(os.environ.get('IMPORT_DECOMPRESSED_MAX_BYTES', 2 * 1024 * 1024 * 1024))
+
+# CSV parser of file imports: 'auto' uses the pyarrow streaming reader when installed
+# (falling back to pandas per file), 'pandas' always uses pandas
+IMPORT_CSV_ENGINE = os.environ.get('IMPORT_CSV_ENGINE', 'auto')
+IMPORT_ARROW_BLOCK_SIZE = int(os.environ.get('IMPORT_ARROW_BLOCK_SIZE', 4 * 1024 * 1024))
+
+# XLSX reader of file imports: 'auto' uses python-calamine when installed, 'stream'
+# always streams the worksheet XML (see data_import/xlsx_reader.py)
+IMPORT_XLSX_ENGINE = os.environ.get('IMPORT_XLSX_ENGINE', 'auto')
+
+# Imports above these thresholds are spooled to IMPORT_SPOOL_DIR (shared with the Celery
+# workers) and run in the background; the API answers 202 with the AsyncTask id
+IMPORT_ASYNC_ENABLED = os.environ.get('IMPORT_ASYNC_ENABLED', 'True') == 'True'
+IMPORT_ASYNC_MIN_BYTES = int(os.environ.get('IMPORT_ASYNC_MIN_BYTES', 5 * 1024 * 1024))
+IMPORT_ASYNC_MIN_ROWS = int(os.environ.get('IMPORT_ASYNC_MIN_ROWS', 20000))
+IMPORT_ASYNC_PROBE_TIMEOUT = float(os.environ.get('IMPORT_ASYNC_PROBE_TIMEOUT', 5))
+IMPORT_SPOOL_DIR = Path(os.environ.get('IMPORT_SPOOL_DIR', BASE_DIR / 'media' / 'spool'))
+# Spooled uploads left behind by tasks that never finished are removed after this many seconds
+IMPORT_SPOOL_TTL = int(os.environ.get('IMPORT_SPOOL_TTL', 60 * 60 * 24))
+# Large uploads are written by Django next to the spool so they can be hard-linked into it
+FILE_UPLOAD_TEMP_DIR = str(IMPORT_SPOOL_DIR / 'incoming')
+os.makedirs(FILE_UPLOAD_TEMP_DIR, exist_ok=True)
+# Resumable uploads (uploads/ endpoints): largest file accepted, chunk size suggested to
+# clients and largest chunk accepted per PUT (keep it below nginx client_max_body_size)
+UPLOAD_RESUMABLE_MAX_BYTES = int(os.environ.get('UPLOAD_RESUMABLE_MAX_BYTES', 10 * 1024 * 1024 * 1024))
+UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024))
+UPLOAD_CHUNK_MAX_BYTES = int(os.environ.get('UPLOAD_CHUNK_MAX_BYTES', 32 * 1024 * 1024))
+
+# Row normalization/hashing pool used by imports. Off by default: enable it only where
+# `manage.py benchmark_hashing` measures a speedup on the host. IMPORT_HASH_WORKERS defaults
+# to the CPUs shared among the WEB_CONCURRENCY gunicorn workers (gunicorn reads the same variable)
+IMPORT_HASH_POOL_ENABLED = os.environ.get('IMPORT_HASH_POOL_ENABLED', 'False') == 'True'
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', 4))
+IMPORT_HASH_WORKERS = int(os.environ['IMPORT_HASH_WORKERS']) if os.environ.get('IMPORT_HASH_WORKERS') else None
+IMPORT_HASH_POOL_MIN_ROWS = int(os.environ.get('IMPORT_HASH_POOL_MIN_ROWS', 20000))
+IMPORT_HASH_BLOCK_ROWS = int(os.environ.get('IMPORT_HASH_BLOCK_ROWS', 5000))
+IMPORT_HASH_POOL_START_METHOD = os.environ.get('IMPORT_HASH_POOL_START_METHOD', 'spawn')
 
 # Structured Logging Configuration
 import os
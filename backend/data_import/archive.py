@@ -0,0 +1,163 @@
+"""
+Cold-tier archival of inactive datasets
+
+Inactive datasets that were not touched for ARCHIVE_AFTER_DAYS days are
+written to a compressed Parquet file under ARCHIVE_ROOT and their records are
+deleted from the hot table (see deletion.purge_records / partition drop), so
+the records table and its indexes only hold datasets that are queried.
+Reactivating an archived dataset loads the file back with bulk inserts.
+
+The Parquet file keeps one row per record (retired versions included): the
+JSON payload in `data` plus the hashes, version and date columns, so the
+restored dataset has the same records and versions (with new ids and
+creation dates). pyarrow is required; without it nothing is archived.
+"""
+import logging
+import os
+from datetime import timedelta
+import orjson
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .deletion import purge_records
+from .partitioning import drop_partition, ensure_partition
+from .progress import NULL_PROGRESS
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = pq = None
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 10000
+
+RECORD_FIELDS = ['data', 'row_hash', 'key_hash', 'version', 'retired_version', 'deleted_at', 'created_at']
+
+ARCHIVE_SCHEMA = pa.schema([
+    ('data', pa.string()),
+    ('row_hash', pa.string()),
+    ('key_hash', pa.string()),
+    ('version', pa.int64()),
+    ('retired_version', pa.int64()),
+    ('deleted_at', pa.timestamp('us', tz='UTC')),
+    ('created_at', pa.timestamp('us', tz='UTC')),
+]) if pa else None
+
+
+def archive_file_path(process):
+    return os.path.join(str(settings.ARCHIVE_ROOT), f'dataset_{process.id}.parquet')
+
+
+def archival_available():
+    return pq is not None
+
+
+def _record_batches(process):
+    from .models import ImportedDataRecord
+
+    rows = (
+        ImportedDataRecord.all_objects.filter(process=process).order_by('id')
+        .values_list(*RECORD_FIELDS).iterator(chunk_size=BATCH_SIZE)
+    )
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _to_table(batch):
+    columns = list(zip(*batch))
+    columns[0] = [orjson.dumps(data).decode() for data in columns[0]]
+    return pa.Table.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(columns, ARCHIVE_SCHEMA)],
+        schema=ARCHIVE_SCHEMA
+    )
+
+
+def archive_process(process):
+    """
+    Write the records of a dataset to its Parquet archive and delete them from
+    the hot table. Returns the number of records archived.
+    """
+    path = archive_file_path(process)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.tmp'
+
+    archived = 0
+    with pq.ParquetWriter(tmp_path, ARCHIVE_SCHEMA, compression=settings.ARCHIVE_COMPRESSION) as writer:
+        for batch in _record_batches(process):
+            writer.write_table(_to_table(batch))
+            archived += len(batch)
+    os.replace(tmp_path, path)
+
+    # Once the dataset is marked archived the file is the source of truth;
+    # records left behind by a crash are removed again on restore
+    process.archived_at = timezone.now()
+    process.archive_path = path
+    process.save(update_fields=['archived_at', 'archive_path'])
+
+    drop_partition(process.id)
+    purge_records(process.id)
+
+    logger.info(f"Archived {process.table_name}: {archived} records to {path}")
+    return archived
+
+
+def restore_process(process, progress=None):
+    """
+    Load the Parquet archive of a dataset back into the hot table and remove
+    the file. Returns the number of records restored.
+    """
+    from .models import ImportedDataRecord
+
+    progress = progress or NULL_PROGRESS
+    path = process.archive_path
+    purge_records(process.id)
+    ensure_partition(process.id)
+
+    parquet_file = pq.ParquetFile(path)
+    progress.start_stage('restore', total=parquet_file.metadata.num_rows)
+    restored = 0
+    with transaction.atomic():
+        for batch in parquet_file.iter_batches(batch_size=BATCH_SIZE):
+            ImportedDataRecord.all_objects.bulk_create(
+                [
+                    ImportedDataRecord(
+                        process=process,
+                        data=orjson.loads(row['data']),
+                        row_hash=row['row_hash'],
+                        key_hash=row['key_hash'],
+                        version=row['version'],
+                        retired_version=row['retired_version'],
+                        deleted_at=row['deleted_at'],
+                    )
+                    for row in batch.to_pylist()
+                ],
+                batch_size=1000
+            )
+            restored += batch.num_rows
+            progress.advance(batch.num_rows)
+
+        process.archived_at = None
+        process.archive_path = ''
+        process.save(update_fields=['archived_at', 'archive_path'])
+
+    os.remove(path)
+    logger.info(f"Restored {process.table_name}: {restored} records from {path}")
+    return restored
+
+
+def stale_datasets():
+    """
+    Inactive, not yet archived datasets untouched for ARCHIVE_AFTER_DAYS days
+    """
+    from .models import DataImportProcess
+
+    cutoff = timezone.now() - timedelta(days=settings.ARCHIVE_AFTER_DAYS)
+    return DataImportProcess.objects.filter(status='inactive', archived_at__isnull=True, updated_at__lt=cutoff)
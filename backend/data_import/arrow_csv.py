@@ -0,0 +1,138 @@
+"""
+Arrow CSV reader for file imports
+
+CSV files are parsed by pyarrow's streaming reader (pyarrow.csv.open_csv),
+which decodes and converts blocks of IMPORT_ARROW_BLOCK_SIZE bytes in native
+threads, and the RecordBatches are turned straight into the row dicts used by
+type inference and hashing, without building a pandas DataFrame.
+
+Rows come out as pandas would produce them, so hashes and inferred types do
+not depend on the engine:
+- dates and timestamps stay strings (pandas does not parse dates by default);
+- integer columns with missing values become floats;
+- missing values, empty strings included, are None.
+
+pandas (dialect.read_csv) is used when pyarrow is not installed,
+IMPORT_CSV_ENGINE is 'pandas', the format needs options Arrow lacks (thousands
+separators), the header has empty or repeated names, or a later block does not
+fit the types inferred from the first one.
+"""
+import logging
+from django.conf import settings
+from .dialect import detect_csv_format, read_sample_bytes, read_csv, parse_source
+
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+except ImportError:  # pragma: no cover - optional dependency
+    pa = pa_csv = None
+
+logger = logging.getLogger(__name__)
+
+# pandas' default missing-value markers and booleans, so both engines agree
+NA_VALUES = [
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+]
+TRUE_VALUES = ['True', 'TRUE', 'true']
+FALSE_VALUES = ['False', 'FALSE', 'false']
+
+
+class ArrowFallback(Exception):
+    """
+    The file has to be read with pandas instead
+    """
+
+
+def arrow_enabled(csv_format=None):
+    """
+    Check if a CSV (of the given format) can be read with Arrow
+    """
+    if pa_csv is None or settings.IMPORT_CSV_ENGINE == 'pandas':
+        return False
+    if csv_format is None:
+        return True
+    return not csv_format.get('thousands') and len(csv_format['sep']) == 1
+
+
+def _options(csv_format, column_types=None):
+    read_options = pa_csv.ReadOptions(
+        encoding=csv_format['encoding'].replace('-sig', ''),
+        skip_rows=csv_format.get('skiprows') or 0,
+        block_size=settings.IMPORT_ARROW_BLOCK_SIZE,
+        use_threads=True,
+    )
+    parse_options = pa_csv.ParseOptions(
+        delimiter=csv_format['sep'],
+        quote_char=csv_format['quotechar'],
+    )
+    convert_options = pa_csv.ConvertOptions(
+        decimal_point=csv_format['decimal'],
+        null_values=NA_VALUES,
+        true_values=TRUE_VALUES,
+        false_values=FALSE_VALUES,
+        strings_can_be_null=True,
+        column_types=column_types or {},
+    )
+    return read_options, parse_options, convert_options
+
+
+def _open(source, csv_format, column_types=None):
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return pa_csv.open_csv(source, *_options(csv_format, column_types))
+
+
+def _text_column_types(schema):
+    """
+    Types to force so the reader matches pandas: dates, times and columns
+    empty in the first block are read as strings
+    """
+    forced = {}
+    for field in schema:
+        if pa.types.is_temporal(field.type) or pa.types.is_null(field.type):
+            forced[field.name] = pa.string()
+    return forced
+
+
+def iter_record_batches(source, csv_format):
+    """
+    Yield the RecordBatches of a CSV path or binary file-like
+    """
+    schema = _open(source, csv_format).schema
+    names = schema.names
+    if '' in names or len(set(names)) != len(names):
+        raise ArrowFallback('cabeçalho com colunas vazias ou repetidas')
+
+    yield from _open(source, csv_format, _text_column_types(schema))
+
+
+def _pandas_compatible(table):
+    # pandas reads integer columns with missing values as float64
+    for index, field in enumerate(table.schema):
+        if pa.types.is_integer(field.type) and table.column(index).null_count:
+            table = table.set_column(index, field.name, table.column(index).cast(pa.float64()))
+    return table
+
+
+def read_csv_records(source, csv_format=None):
+    """
+    Parse a CSV path or uploaded file into a list of row dicts (None for
+    missing values)
+    """
+    if csv_format is None:
+        csv_format = detect_csv_format(read_sample_bytes(source))
+
+    if arrow_enabled(csv_format):
+        try:
+            batches = list(iter_record_batches(parse_source(source), csv_format))
+            if not batches:
+                return []
+            return _pandas_compatible(pa.Table.from_batches(batches)).to_pylist()
+        except (ArrowFallback, pa.ArrowInvalid, UnicodeDecodeError) as e:
+            logger.info(f"Arrow CSV reader unavailable for this file, using pandas: {e}")
+            if hasattr(source, 'seek'):
+                source.seek(0)
+
+    from .services import DataImportService
+    return DataImportService.dataframe_to_dict_list(read_csv(source, csv_format))
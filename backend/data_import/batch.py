@@ -0,0 +1,146 @@
+"""
+Batch imports of workbooks and zip bundles
+
+One upload holds several tables: the worksheets of an XLSX workbook or the
+CSV/XLSX members of a zip file. Each one (an "entry") is imported into its own
+dataset by an import_batch_entry_async task, all of them running concurrently
+on the Celery workers, and a single AsyncTask reports the aggregated progress.
+
+The mapping spec says where each entry goes:
+    {
+        "Janeiro": "movimentacao_janeiro",    # new dataset with this name
+        "Fevereiro": {"process_id": 12},      # append to an existing dataset
+        "Março": {"process_id": 13, "delete_missing": true},  # keyed merge, see merge.py
+        "Notas": null                         # not imported
+    }
+Entries missing from the mapping are imported into new datasets named after
+them (table_prefix + sanitized entry name).
+"""
+import os
+import shutil
+import uuid
+import zipfile
+from django.conf import settings
+from .services import DataImportService
+from .decompress import open_decompressed
+from .xlsx_reader import sheet_names
+
+BATCH_EXTENSIONS = ('.xlsx', '.zip')
+MEMBER_EXTENSIONS = ('.csv', '.xlsx')
+
+
+class BatchSpecError(ValueError):
+    """
+    The batch file or its mapping spec can't be imported; the message is
+    user-facing
+    """
+
+
+def _is_member_entry(info):
+    name = info.filename
+    base = os.path.basename(name)
+    return (
+        not info.is_dir()
+        and not name.startswith('__MACOSX/')
+        and not base.startswith('.')
+        and base.lower().endswith(MEMBER_EXTENSIONS)
+    )
+
+
+def list_entries(source, file_name):
+    """
+    Importable entries of a batch file (path or file-like): worksheet names of
+    a workbook or CSV/XLSX member names of a zip file
+    """
+    file_name = file_name.lower()
+    try:
+        if file_name.endswith('.xlsx'):
+            return sheet_names(source)
+        if file_name.endswith('.zip'):
+            if hasattr(source, 'seek'):
+                source.seek(0)
+            with zipfile.ZipFile(source) as archive:
+                return [info.filename for info in archive.infolist() if _is_member_entry(info)]
+    except (zipfile.BadZipFile, KeyError) as e:
+        raise BatchSpecError(f'Arquivo inválido ou corrompido: {e}')
+    finally:
+        if hasattr(source, 'seek'):
+            source.seek(0)
+    raise BatchSpecError(f'Formato não suportado para importação em lote. Use: {", ".join(BATCH_EXTENSIONS)}')
+
+
+def _default_table_name(entry, table_prefix):
+    name = entry
+    if entry.lower().endswith(MEMBER_EXTENSIONS):
+        name = os.path.splitext(os.path.basename(entry))[0]
+    return DataImportService.sanitize_column_name(f'{table_prefix}{name}')
+
+
+def plan_batch(entries, mapping=None, table_prefix=''):
+    """
+    Resolve the target of every entry from the mapping spec. Returns a list of
+    {'entry', 'table_name'} (new dataset) or {'entry', 'process_id'} (append)
+    dicts; skipped entries are left out. Table names are validated like in a
+    single import and must be unique within the batch.
+    """
+    from rest_framework import serializers
+    from .serializers import DataImportRequestSerializer
+
+    mapping = mapping or {}
+    unknown = [name for name in mapping if name not in entries]
+    if unknown:
+        raise BatchSpecError(f'Entradas do mapeamento não encontradas no arquivo: {", ".join(unknown)}')
+
+    plan, table_names = [], set()
+    for entry in entries:
+        target = mapping.get(entry, _default_table_name(entry, table_prefix))
+        if target is None:
+            continue
+
+        if isinstance(target, dict) and target.get('process_id'):
+            plan.append({'entry': entry, 'process_id': int(target['process_id'])})
+            if target.get('delete_missing'):
+                plan[-1]['delete_missing'] = True
+            continue
+        if isinstance(target, dict):
+            target = target.get('table_name')
+        if not isinstance(target, str) or not target:
+            raise BatchSpecError(
+                f'Destino inválido para "{entry}": use o nome da tabela, {{"process_id": id}} ou null'
+            )
+
+        try:
+            table_name = DataImportRequestSerializer().validate_table_name(target)
+        except serializers.ValidationError as e:
+            raise BatchSpecError(f'"{entry}": {" ".join(str(detail) for detail in e.detail)}')
+        if table_name in table_names:
+            raise BatchSpecError(f'Tabela "{table_name}" usada por mais de uma entrada do lote')
+        table_names.add(table_name)
+        plan.append({'entry': entry, 'table_name': table_name})
+
+    if not plan:
+        raise BatchSpecError('Nenhuma planilha ou arquivo a importar no lote')
+    if len(plan) > settings.IMPORT_BATCH_MAX_ENTRIES:
+        raise BatchSpecError(
+            f'Lote contém {len(plan)} entradas. Máximo permitido: {settings.IMPORT_BATCH_MAX_ENTRIES}'
+        )
+    return plan
+
+
+def read_batch_entry(file_path, entry):
+    """
+    Parse one entry of a spooled batch file. Returns (data, column_structure)
+    """
+    if file_path.lower().endswith('.xlsx'):
+        return DataImportService.process_file_data_from_path(file_path, sheet=entry)
+
+    # Zip members are extracted next to the spooled file and parsed from disk
+    # (XLSX members need random access); the decompressed size is limited
+    member_path = f'{file_path}.{uuid.uuid4().hex}{os.path.splitext(entry)[1].lower()}'
+    try:
+        with open_decompressed(file_path, member=entry) as member, open(member_path, 'wb') as out:
+            shutil.copyfileobj(member, out, 1024 * 1024)
+        return DataImportService.process_file_data_from_path(member_path)
+    finally:
+        if os.path.exists(member_path):
+            os.remove(member_path)
@@ -0,0 +1,199 @@
+"""
+File chunking for parallel imports
+
+Large files are split into independent chunks that Celery workers can parse,
+hash and insert concurrently:
+- CSV files are split by byte ranges aligned on line boundaries; every chunk
+  is parsed with the header line prepended.
+- XLSX files are split by row ranges of the first worksheet, each read by
+  the streaming reader (see xlsx_reader.py).
+
+Chunk specs are plain dicts so they can be sent as Celery task arguments;
+CSV specs carry the format detected once for the file (see dialect.py).
+Column types are inferred once on the sample (sample_dtypes) and applied to
+every chunk, so a column gets the same JSON type and hashes in all chunks.
+Note: byte ranges are aligned on '\n', so CSV files with line breaks inside
+quoted fields must use the sequential import.
+"""
+import os
+import logging
+import pandas as pd
+from django.conf import settings
+from .spool import MappedRange
+from .dialect import detect_csv_format, read_sample_bytes, read_csv
+from .preflight import scan_xlsx
+from .xlsx_reader import read_xlsx_records
+
+logger = logging.getLogger(__name__)
+
+CSV_EXTENSIONS = ('.csv',)
+XLSX_EXTENSIONS = ('.xlsx',)
+
+# Rows used to infer the column structure before the chunks are dispatched
+SAMPLE_ROWS = 10000
+
+# pandas.api.types.infer_dtype() kinds -> dtype applied to the chunks
+CHUNK_DTYPES = {
+    'integer': 'Int64',
+    'floating': 'float64',
+    'mixed-integer-float': 'float64',
+    'boolean': 'boolean',
+    'string': 'str',
+}
+
+
+def supports_parallel_import(file_path):
+    """
+    Check if a file can be imported in parallel chunks
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    return extension in CSV_EXTENSIONS + XLSX_EXTENSIONS
+
+
+def should_import_in_parallel(file_path):
+    """
+    Check if a file is large enough to be worth splitting across workers
+    """
+    if not settings.IMPORT_PARALLEL_ENABLED or not supports_parallel_import(file_path):
+        return False
+    return os.path.getsize(file_path) >= settings.IMPORT_PARALLEL_MIN_BYTES
+
+
+def _csv_header(fh, skiprows=0):
+    """
+    (header line, offset where the data starts), skipping preamble lines
+    """
+    fh.seek(0)
+    for _ in range(skiprows):
+        fh.readline()
+    header = fh.readline()
+    return header, fh.tell()
+
+
+def csv_byte_ranges(file_path, chunk_bytes, skiprows=0):
+    """
+    Split a CSV file (after its header) into [start, end) byte ranges of about
+    `chunk_bytes`, each ending right after a newline
+    """
+    size = os.path.getsize(file_path)
+    ranges = []
+
+    with open(file_path, 'rb') as fh:
+        start = _csv_header(fh, skiprows)[1]
+        while start < size:
+            fh.seek(min(start + chunk_bytes, size))
+            if fh.tell() < size:
+                fh.readline()  # move to the end of the current line
+            end = fh.tell()
+            ranges.append((start, end))
+            start = end
+
+    return ranges
+
+
+def xlsx_row_ranges(file_path, chunk_rows):
+    """
+    Split the first worksheet of an XLSX file into [min_row, max_row] ranges
+    (1-based, header row excluded)
+    """
+    rows = scan_xlsx(file_path)['rows']
+    if rows is None:
+        # Worksheet without a <dimension> element
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(file_path, read_only=True)
+        try:
+            rows = (workbook.worksheets[0].max_row or 1) - 1
+        finally:
+            workbook.close()
+    max_row = rows + 1
+
+    return [
+        (first, min(first + chunk_rows - 1, max_row))
+        for first in range(2, max_row + 1, chunk_rows)
+    ]
+
+
+def plan_chunks(file_path):
+    """
+    Build the list of chunk specs for a file
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+
+    if extension in CSV_EXTENSIONS:
+        csv_format = detect_csv_format(read_sample_bytes(file_path))
+        return [
+            {'kind': 'csv', 'start': start, 'end': end, 'format': csv_format}
+            for start, end in csv_byte_ranges(file_path, settings.IMPORT_CHUNK_BYTES, csv_format['skiprows'])
+        ]
+    if extension in XLSX_EXTENSIONS:
+        return [
+            {'kind': 'xlsx', 'min_row': first, 'max_row': last}
+            for first, last in xlsx_row_ranges(file_path, settings.IMPORT_CHUNK_ROWS)
+        ]
+    raise ValueError(f'Formato de arquivo não suportado para importação paralela: {extension}')
+
+
+def _read_xlsx_rows(file_path, min_row=2, max_row=None):
+    return pd.DataFrame(read_xlsx_records(file_path, min_row, max_row))
+
+
+def sample_dtypes(df):
+    """
+    Column dtypes inferred on the sample ({column: dtype name}, JSON-safe so
+    they travel as Celery arguments). Columns without values in the sample or
+    with mixed values are left to each chunk.
+    """
+    dtypes = {}
+    for column, series in df.items():
+        dtype = CHUNK_DTYPES.get(pd.api.types.infer_dtype(series, skipna=True))
+        if dtype and series.notna().any():
+            dtypes[str(column)] = dtype
+    return dtypes
+
+
+def _apply_dtypes(df, dtypes):
+    # 'str' columns are read as strings by the CSV parser itself (XLSX cells
+    # keep their own types, as in the sequential import)
+    for column in df.columns:
+        dtype = dtypes.get(str(column))
+        if dtype in (None, 'str') or str(df[column].dtype) == dtype:
+            continue
+        try:
+            df[column] = df[column].astype(dtype)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Column {column} doesn't fit the sample type {dtype} in this chunk: {e}")
+    return df
+
+
+def read_chunk(file_path, chunk, dtypes=None):
+    """
+    Read one chunk into a DataFrame with the file's header, with the column
+    dtypes inferred on the sample (see sample_dtypes)
+    """
+    dtypes = dtypes or {}
+
+    if chunk['kind'] == 'csv':
+        csv_format = chunk.get('format') or detect_csv_format(read_sample_bytes(file_path))
+        with open(file_path, 'rb') as fh:
+            header = _csv_header(fh, csv_format['skiprows'])[0]
+        string_columns = {column: str for column, dtype in dtypes.items() if dtype == 'str'}
+        # The chunk is parsed straight from the memory-mapped file
+        with MappedRange(file_path, chunk['start'], chunk['end'], prefix=header) as source:
+            df = read_csv(source, {**csv_format, 'skiprows': 0}, dtype=string_columns or None)
+        return _apply_dtypes(df, dtypes)
+
+    if chunk['kind'] == 'xlsx':
+        return _apply_dtypes(_read_xlsx_rows(file_path, chunk['min_row'], chunk['max_row']), dtypes)
+
+    raise ValueError(f"Tipo de bloco desconhecido: {chunk['kind']}")
+
+
+def read_sample(file_path, rows=SAMPLE_ROWS):
+    """
+    Read the first `rows` rows of a file (used to infer the column structure)
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension in CSV_EXTENSIONS:
+        return read_csv(file_path, nrows=rows, memory_map=True)
+    return _read_xlsx_rows(file_path, 2, rows + 1)
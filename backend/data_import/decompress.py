@@ -0,0 +1,183 @@
+"""
+Compressed CSV inputs
+
+.csv.gz, .csv.bz2, .csv.zst and .zip (holding a single CSV) files are
+decompressed as a stream while they are parsed: no decompressed copy is
+written to disk or kept in memory. The stream counts the bytes it produces
+and stops with DecompressedSizeError past IMPORT_DECOMPRESSED_MAX_BYTES, so a
+small upload can't expand into an unbounded amount of data (zip bombs).
+
+Parsers that rewind the file (detection sample, Arrow schema pass) get a
+fresh decompressor on seek(0). .zst needs the optional zstandard package.
+"""
+import bz2
+import contextlib
+import gzip
+import io
+import os
+import zipfile
+from django.conf import settings
+from .preflight import FileLimitError
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+COMPRESSED_EXTENSIONS = ('.csv.gz', '.csv.bz2', '.csv.zst', '.zip')
+
+MAGIC_BYTES = {
+    '.gz': b'\x1f\x8b',
+    '.bz2': b'BZh',
+    '.zst': b'\x28\xb5\x2f\xfd',
+    '.zip': b'PK',
+}
+
+
+class CompressedFileError(ValueError):
+    """
+    A compressed file can't be imported; the message is user-facing
+    """
+
+
+class DecompressedSizeError(FileLimitError):
+    """
+    A compressed file expands past IMPORT_DECOMPRESSED_MAX_BYTES
+    """
+
+
+def is_compressed(file_name):
+    return str(file_name).lower().endswith(COMPRESSED_EXTENSIONS)
+
+
+def compressed_extension(file_name):
+    """
+    '.csv.gz' for 'portos.csv.gz' (None for uncompressed names)
+    """
+    file_name = str(file_name).lower()
+    return next((ext for ext in COMPRESSED_EXTENSIONS if file_name.endswith(ext)), None)
+
+
+def check_signature(header, file_name):
+    """
+    Check the magic bytes of a compressed file against its extension
+    """
+    codec = os.path.splitext(str(file_name).lower())[1]
+    return header.startswith(MAGIC_BYTES[codec])
+
+
+def _csv_member(archive):
+    members = [
+        info for info in archive.infolist()
+        if not info.is_dir()
+        and not info.filename.startswith('__MACOSX/')
+        and not os.path.basename(info.filename).startswith('.')
+    ]
+    if len(members) != 1 or not members[0].filename.lower().endswith('.csv'):
+        raise CompressedFileError(
+            'O arquivo .zip deve conter um único arquivo CSV. '
+            'Para vários arquivos ou planilhas, use a importação em lote (/batch/)'
+        )
+    return members[0]
+
+
+def _opener(source, file_name, member=None):
+    """
+    Function that opens a new decompressed stream of `source` on an ExitStack
+    """
+    codec = os.path.splitext(file_name.lower())[1]
+    is_path = isinstance(source, (str, os.PathLike))
+
+    def rewound():
+        if not is_path:
+            source.seek(0)
+        return source
+
+    if codec == '.gz':
+        return lambda stack: stack.enter_context(
+            gzip.open(source, 'rb') if is_path else gzip.GzipFile(fileobj=rewound(), mode='rb')
+        )
+    if codec == '.bz2':
+        return lambda stack: stack.enter_context(bz2.BZ2File(rewound(), 'rb'))
+    if codec == '.zst':
+        if zstandard is None:
+            raise CompressedFileError('Arquivos .zst não são suportados neste servidor (pacote zstandard ausente)')
+
+        def open_zstd(stack):
+            fh = stack.enter_context(open(source, 'rb')) if is_path else rewound()
+            return stack.enter_context(zstandard.ZstdDecompressor().stream_reader(fh, closefd=False))
+        return open_zstd
+    if codec == '.zip':
+        def open_zip(stack):
+            archive = stack.enter_context(zipfile.ZipFile(rewound()))
+            return stack.enter_context(archive.open(member or _csv_member(archive)))
+        return open_zip
+    raise CompressedFileError(f'Formato de compressão não suportado: {file_name}')
+
+
+class DecompressedReader(io.RawIOBase):
+    """
+    Raw stream of decompressed bytes with a size limit. Only forward seeks
+    and seek(0) (which restarts the decompressor) are supported.
+    """
+
+    def __init__(self, opener, limit, name=''):
+        self._opener = opener
+        self._limit = limit
+        self._stack = contextlib.ExitStack()
+        self._stream = opener(self._stack)
+        self._position = 0
+        self.name = name
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = self._stream.readinto(buffer)
+        self._position += count or 0
+        if self._position > self._limit:
+            raise DecompressedSizeError(
+                f'Arquivo {self.name} ultrapassa {self._limit // (1024 * 1024):,} MB depois de descompactado.'
+            )
+        return count
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset, whence = self._position + offset, io.SEEK_SET
+        if whence != io.SEEK_SET:
+            raise io.UnsupportedOperation('seek from the end of a compressed stream')
+
+        if offset < self._position:
+            self._stack.close()
+            self._stack = contextlib.ExitStack()
+            self._stream = self._opener(self._stack)
+            self._position = 0
+        while self._position < offset:
+            if not self.read(min(offset - self._position, 1024 * 1024)):
+                break
+        return self._position
+
+    def close(self):
+        if not self.closed:
+            self._stack.close()
+        super().close()
+
+
+def open_decompressed(source, file_name=None, member=None, limit=None):
+    """
+    Binary file-like with the decompressed content of a compressed path or
+    uploaded file (or of `member` of a zip file). The source is not closed.
+    """
+    from .dialect import parse_source
+
+    file_name = str(file_name or getattr(source, 'name', source))
+    source = parse_source(source)
+    limit = limit or settings.IMPORT_DECOMPRESSED_MAX_BYTES
+    name = member.filename if isinstance(member, zipfile.ZipInfo) else (member or os.path.basename(file_name))
+    return io.BufferedReader(DecompressedReader(_opener(source, file_name, member), limit, name))
@@ -0,0 +1,87 @@
+"""
+Background deletion of datasets
+
+Deleting a dataset through the ORM makes Django's CASCADE collector load the
+ids of every record and delete them in chunks inside the request, which times
+out (and holds locks) on datasets with millions of records. Instead:
+
+    - the request only marks the process deleted (deleted_at), which hides it
+      from every view (DataImportProcess.objects), and renames it so its table
+      name can be reused right away
+    - purge_dataset_async drops the partition of the dataset when the records
+      table is partitioned (see partitioning.py), or else removes the records
+      in DELETE batches of DATASET_PURGE_BATCH_SIZE rows, each one its own
+      short transaction, and then deletes the process row with its small
+      related tables
+    - purge_deleted_datasets_async (celery beat) picks up deletions whose task
+      never ran
+"""
+import logging
+import os
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from .partitioning import drop_partition
+
+logger = logging.getLogger(__name__)
+
+
+def mark_process_deleted(process):
+    """
+    Hide a dataset from all views and free its table name; its records are
+    reclaimed later by purge_process()
+    """
+    process.deleted_at = timezone.now()
+    process.status = 'inactive'
+    process.table_name = f'{process.table_name[:200]}__deleted_{process.id}'
+    process.save(update_fields=['deleted_at', 'status', 'table_name', 'updated_at'])
+
+
+def purge_records(process_id, batch_size=None, version=None):
+    """
+    Delete the records of a dataset (only those created by `version` when
+    given) in batches of raw DELETE ... WHERE process_id = %s statements.
+    Returns the number deleted.
+    """
+    from .models import ImportedDataRecord
+
+    batch_size = batch_size or settings.DATASET_PURGE_BATCH_SIZE
+    table = connection.ops.quote_name(ImportedDataRecord._meta.db_table)
+    # DELETE ... LIMIT isn't portable, the batch is selected by a subquery
+    where, params = 'process_id = %s', [process_id]
+    if version is not None:
+        where, params = f'{where} AND version = %s', [process_id, version]
+    sql = (
+        f'DELETE FROM {table} WHERE id IN '
+        f'(SELECT id FROM {table} WHERE {where} LIMIT %s)'
+    )
+
+    deleted = 0
+    while True:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [*params, batch_size])
+            count = cursor.rowcount
+        deleted += count
+        if count < batch_size:
+            return deleted
+
+
+def purge_process(process_id):
+    """
+    Reclaim a dataset marked deleted: its records, then the process row and
+    its related rows (versions, tasks). Returns the number of records deleted.
+    """
+    from .models import DataImportProcess
+
+    process = DataImportProcess.all_objects.filter(pk=process_id, deleted_at__isnull=False).first()
+    if process is None:
+        return 0
+
+    # Rows left in the default partition are deleted like on other tables
+    deleted = process.record_count if drop_partition(process.id) else 0
+    deleted += purge_records(process.id)
+    if process.archive_path and os.path.exists(process.archive_path):
+        os.remove(process.archive_path)
+    process.delete()
+    logger.info(f"Purged dataset {process.table_name}: {deleted} records deleted")
+    return deleted
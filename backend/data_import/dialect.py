@@ -0,0 +1,232 @@
+"""
+CSV format detection
+
+The encoding, delimiter, quote character, decimal/thousands separators and
+header row of a CSV file are detected once from a sample of its first bytes,
+and the file is then parsed in a single pd.read_csv call with those options
+(instead of re-parsing it once per candidate encoding).
+
+Typical pt-BR exports ("porto;carga\\nSantos;1.234,5") are read with
+sep=';', decimal=',' and thousands='.'. Preamble lines before the header
+(titles, export dates) are skipped.
+"""
+import codecs
+import csv
+import io
+import logging
+import os
+import re
+from collections import Counter
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_BYTES = 64 * 1024
+# Candidate delimiters, in order of preference on ties
+DELIMITERS = (',', ';', '\t', '|')
+SAMPLE_LINES = 100
+HEADER_SEARCH_LINES = 20
+
+DECIMAL_COMMA_RE = re.compile(r'^[+-]?(\d{1,3}(\.\d{3})+|\d+),\d+$')
+DECIMAL_POINT_RE = re.compile(r'^[+-]?(\d{1,3}(,\d{3})+|\d+)\.\d+$')
+THOUSANDS_DOT_RE = re.compile(r'^[+-]?\d{1,3}(\.\d{3})+(,\d+)?$')
+
+DEFAULT_FORMAT = {
+    'encoding': 'utf-8',
+    'sep': ',',
+    'quotechar': '"',
+    'decimal': '.',
+    'thousands': None,
+    'skiprows': 0,
+}
+
+
+class CSVFormatError(ValueError):
+    """
+    The sample does not look like a text CSV file
+    """
+
+
+def _is_path(source):
+    return isinstance(source, (str, os.PathLike))
+
+
+def read_sample_bytes(source, size=SAMPLE_BYTES):
+    """
+    First `size` bytes of a path or file-like (rewound afterwards)
+    """
+    if _is_path(source):
+        with open(source, 'rb') as fh:
+            return fh.read(size)
+
+    source.seek(0)
+    try:
+        sample = source.read(size)
+    finally:
+        source.seek(0)
+    return sample.encode('utf-8') if isinstance(sample, str) else sample
+
+
+def detect_encoding(sample):
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+
+    # Don't let a multi-byte character cut at the end of the sample fail UTF-8
+    last_newline = sample.rfind(b'\n')
+    complete = sample[:last_newline + 1] if last_newline >= 0 else sample
+    for encoding in ('utf-8', 'cp1252'):
+        try:
+            complete.decode(encoding)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return 'latin-1'
+
+
+def _field_counts(lines, delimiter, quotechar='"'):
+    return [len(row) for row in csv.reader(lines, delimiter=delimiter, quotechar=quotechar) if row]
+
+
+def _detect_delimiter(lines):
+    """
+    Delimiter that splits most lines into the same number (> 1) of fields
+    """
+    best, best_score = DEFAULT_FORMAT['sep'], None
+    for preference, delimiter in enumerate(DELIMITERS):
+        counts = _field_counts(lines, delimiter)
+        if not counts:
+            continue
+        fields, lines_with_fields = Counter(counts).most_common(1)[0]
+        if fields < 2:
+            continue
+        score = (lines_with_fields / len(counts), fields, -preference)
+        if best_score is None or score > best_score:
+            best, best_score = delimiter, score
+    return best
+
+
+def _detect_quotechar(lines, delimiter):
+    try:
+        return csv.Sniffer().sniff('\n'.join(lines), delimiters=delimiter).quotechar or '"'
+    except csv.Error:
+        return '"'
+
+
+def _detect_header_row(lines, delimiter, quotechar):
+    """
+    Index of the first line with the file's usual number of fields (lines
+    before it are a preamble)
+    """
+    counts = [len(row) for row in csv.reader(lines, delimiter=delimiter, quotechar=quotechar)]
+    non_empty = [count for count in counts if count]
+    if not non_empty:
+        return 0
+    fields = Counter(non_empty).most_common(1)[0][0]
+    for index, count in enumerate(counts[:HEADER_SEARCH_LINES]):
+        if count == fields:
+            return index
+    return 0
+
+
+def _detect_number_format(rows, delimiter):
+    """
+    (decimal, thousands) separators used by the numeric fields of the sample
+    """
+    if delimiter == ',':
+        return '.', None
+
+    comma = point = grouped = 0
+    for row in rows:
+        for value in row:
+            value = value.strip()
+            if DECIMAL_COMMA_RE.match(value):
+                comma += 1
+            elif DECIMAL_POINT_RE.match(value):
+                point += 1
+            if THOUSANDS_DOT_RE.match(value):
+                grouped += 1
+
+    if comma > point:
+        return ',', '.' if grouped else None
+    return '.', None
+
+
+def detect_csv_format(sample):
+    """
+    Detect the format of a CSV file from a sample of its first bytes.
+    Returns a dict with encoding, sep, quotechar, decimal, thousands and
+    skiprows (preamble lines before the header).
+    """
+    if not sample:
+        return dict(DEFAULT_FORMAT)
+    if b'\x00' in sample:
+        raise CSVFormatError('Arquivo CSV inválido ou corrompido')
+
+    encoding = detect_encoding(sample)
+    text = sample.decode(encoding, errors='replace')
+    if len(sample) >= SAMPLE_BYTES and '\n' in text:
+        text = text[:text.rfind('\n')]  # drop the line cut by the sample
+    lines = text.lstrip('\ufeff').splitlines()[:SAMPLE_LINES]
+
+    delimiter = _detect_delimiter(lines)
+    quotechar = _detect_quotechar(lines, delimiter)
+    skiprows = _detect_header_row(lines, delimiter, quotechar)
+    data_rows = list(csv.reader(lines[skiprows + 1:], delimiter=delimiter, quotechar=quotechar))
+    decimal, thousands = _detect_number_format(data_rows, delimiter)
+
+    return {
+        'encoding': encoding,
+        'sep': delimiter,
+        'quotechar': quotechar,
+        'decimal': decimal,
+        'thousands': thousands,
+        'skiprows': skiprows,
+    }
+
+
+def csv_read_options(csv_format):
+    """
+    pd.read_csv keyword arguments for a detected format
+    """
+    options = {
+        'encoding': csv_format['encoding'],
+        'sep': csv_format['sep'],
+        'quotechar': csv_format['quotechar'],
+        'decimal': csv_format['decimal'],
+    }
+    if csv_format.get('thousands'):
+        options['thousands'] = csv_format['thousands']
+    if csv_format.get('skiprows'):
+        options['skiprows'] = csv_format['skiprows']
+    return options
+
+
+def parse_source(source):
+    # pandas only honours non-UTF-8 encodings on real file objects, not on
+    # Django's File wrappers; uploads on disk are read from their path
+    if hasattr(source, 'temporary_file_path'):
+        return source.temporary_file_path()
+    if not _is_path(source) and not isinstance(source, io.IOBase) and hasattr(source, 'file'):
+        return source.file
+    return source
+
+
+def read_csv(source, csv_format=None, **kwargs):
+    """
+    Parse a CSV path or file-like in one pass with its detected format.
+    Extra keyword arguments go to pd.read_csv.
+    """
+    if csv_format is None:
+        csv_format = detect_csv_format(read_sample_bytes(source))
+    options = {**csv_read_options(csv_format), **kwargs}
+    source = parse_source(source)
+
+    try:
+        return pd.read_csv(source, **options)
+    except UnicodeDecodeError:
+        # A non-UTF-8 byte after the sample: latin-1 decodes any byte
+        logger.warning(f"CSV is not {options['encoding']} past the detection sample, re-reading as latin-1")
+        if not _is_path(source):
+            source.seek(0)
+        options['encoding'] = 'latin-1'
+        return pd.read_csv(source, **options)
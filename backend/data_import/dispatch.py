@@ -0,0 +1,176 @@
+"""
+Size-aware dispatch of HTTP imports
+
+Small payloads are still imported inside the request. Anything above the
+configured row/byte thresholds is spooled (see spool.py) and handed to
+process_data_import_async / append_data_async; the client gets a 202 with the
+AsyncTask id. Completed resumable uploads (see uploads.py) and batch imports
+(see batch.py) always go this way.
+"""
+import uuid
+import logging
+import requests
+from django.conf import settings
+from .models import AsyncTask
+from .progress import set_task_state, state_from_async_task
+from .preflight import scan_file
+from .spool import spool_upload, spool_file, upload_part_path, release_spool_file
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_file_rows(uploaded_file):
+    """
+    Cheap row estimate of an upload from the pre-flight scan (None when unknown)
+    """
+    return scan_file(uploaded_file)['rows']
+
+
+def probe_endpoint_size(endpoint_url):
+    """
+    Content-Length advertised by an endpoint (HEAD request), or None
+    """
+    try:
+        response = requests.head(endpoint_url, timeout=settings.IMPORT_ASYNC_PROBE_TIMEOUT, allow_redirects=True)
+        if response.ok and response.headers.get('Content-Length'):
+            return int(response.headers['Content-Length'])
+    except (requests.exceptions.RequestException, ValueError) as e:
+        logger.info(f"Could not probe endpoint size of {endpoint_url}: {e}")
+    return None
+
+
+def should_import_async(import_type, uploaded_file=None, endpoint_url=None):
+    """
+    Decide if an import is too large to run inside the request
+    """
+    if not settings.IMPORT_ASYNC_ENABLED:
+        return False
+
+    if import_type == 'file' and uploaded_file is not None:
+        if uploaded_file.size >= settings.IMPORT_ASYNC_MIN_BYTES:
+            return True
+        rows = estimate_file_rows(uploaded_file)
+        return rows is not None and rows >= settings.IMPORT_ASYNC_MIN_ROWS
+
+    if import_type == 'endpoint' and endpoint_url:
+        size = probe_endpoint_size(endpoint_url)
+        # Most JSON APIs send no Content-Length; unknown sizes stay synchronous
+        return size is not None and size >= settings.IMPORT_ASYNC_MIN_BYTES
+
+    return False
+
+
+def _create_pending_task(task_id, task_name, user, process=None):
+    async_task = AsyncTask.objects.create(
+        task_id=task_id,
+        task_name=task_name,
+        status='pending',
+        process=process,
+        created_by=user,
+    )
+    set_task_state(task_id, state_from_async_task(async_task))
+    return async_task
+
+
+def _enqueue(task, async_task, file_path, **options):
+    try:
+        task.apply_async(task_id=async_task.task_id, **options)
+    except Exception as e:
+        # Broker unavailable: don't leave a pending task or a spooled file behind
+        AsyncTask.objects.filter(pk=async_task.pk).update(status='failed', error=str(e))
+        async_task.refresh_from_db()
+        set_task_state(async_task.task_id, state_from_async_task(async_task))
+        release_spool_file(file_path)
+        raise
+
+
+def _spool_source(task_id, uploaded_file=None, chunked_upload=None):
+    if chunked_upload is not None:
+        return spool_file(
+            upload_part_path(chunked_upload.upload_id), chunked_upload.file_name,
+            task_id, digest=chunked_upload.checksum or None
+        )
+    return spool_upload(uploaded_file, task_id)
+
+
+def dispatch_import(table_name, user, import_type, endpoint_url=None, uploaded_file=None,
+                    chunked_upload=None):
+    """
+    Enqueue a new dataset import and return its pending AsyncTask
+    """
+    from .tasks import process_data_import_async
+
+    task_id = str(uuid.uuid4())
+    file_path = _spool_source(task_id, uploaded_file, chunked_upload) if import_type == 'file' else None
+    async_task = _create_pending_task(task_id, 'Data Import', user)
+
+    _enqueue(
+        process_data_import_async, async_task, file_path,
+        args=[table_name, user.id],
+        kwargs={'endpoint_url': endpoint_url, 'file_path': file_path, 'import_type': import_type}
+    )
+    logger.info(f"Import of {table_name} enqueued as task {task_id}")
+    return async_task
+
+
+def dispatch_append(process, user, import_type, endpoint_url=None, uploaded_file=None,
+                    chunked_upload=None, delete_missing=False):
+    """
+    Enqueue an append to an existing dataset and return its pending AsyncTask
+    """
+    from .tasks import append_data_async
+
+    task_id = str(uuid.uuid4())
+    file_path = _spool_source(task_id, uploaded_file, chunked_upload) if import_type == 'file' else None
+    async_task = _create_pending_task(task_id, 'Data Append', user, process=process)
+
+    _enqueue(
+        append_data_async, async_task, file_path,
+        kwargs={
+            'process_id': process.id,
+            'file_path': file_path,
+            'endpoint_url': endpoint_url,
+            'import_type': import_type,
+            'user_id': user.id,
+            'delete_missing': delete_missing,
+        }
+    )
+    logger.info(f"Append to {process.table_name} enqueued as task {task_id}")
+    return async_task
+
+
+def dispatch_batch_import(user, plan, uploaded_file=None, chunked_upload=None):
+    """
+    Enqueue a batch import (workbook sheets or zip members, see batch.py) and
+    return its pending AsyncTask
+    """
+    from .tasks import process_batch_import_async
+
+    task_id = str(uuid.uuid4())
+    file_path = _spool_source(task_id, uploaded_file, chunked_upload)
+    async_task = _create_pending_task(task_id, 'Batch Import', user)
+
+    _enqueue(
+        process_batch_import_async, async_task, file_path,
+        args=[file_path, user.id, plan]
+    )
+    logger.info(f"Batch import of {len(plan)} entries enqueued as task {task_id}")
+    return async_task
+
+
+def dispatch_restore(process, user):
+    """
+    Enqueue the restore of an archived dataset (see archive.py) and return
+    its pending AsyncTask
+    """
+    from .tasks import restore_dataset_async
+
+    task_id = str(uuid.uuid4())
+    async_task = _create_pending_task(task_id, 'Dataset Restore', user, process=process)
+
+    _enqueue(
+        restore_dataset_async, async_task, None,
+        kwargs={'process_id': process.id, 'user_id': user.id}
+    )
+    logger.info(f"Restore of {process.table_name} enqueued as task {task_id}")
+    return async_task
@@ -0,0 +1,436 @@
+"""
+Export job utilities for data_import app
+
+Large exports are materialized by a Celery task into an artifact on disk
+(settings.EXPORT_ROOT) and served with HTTP Range support. Identical export
+requests share the same deterministic task id and artifact.
+"""
+import csv
+import hashlib
+import io
+import itertools
+import json
+import os
+import re
+import time
+import zlib
+import logging
+import orjson
+from django.conf import settings
+from django.db.models import Q
+from django.http import FileResponse, HttpResponse
+from .readers import iter_record_data
+from .progress import set_task_state, state_from_async_task
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ('csv', 'xlsx')
+
+EXPORT_TASK_NAME = 'Data Export'
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+# Target size of each chunk emitted by the streaming encoders
+STREAM_BUFFER_SIZE = 64 * 1024
+
+
+def build_export_key(process, file_format, columns, filters=None):
+    """
+    Generate a deterministic key for an export request.
+    The dataset version (updated_at + record_count) is part of the key so a
+    changed dataset never reuses a stale artifact.
+    """
+    params = json.dumps({
+        'process_id': process.id,
+        'version': f"{process.updated_at.isoformat()}:{process.record_count}",
+        'format': file_format,
+        'columns': list(columns),
+        'filters': filters or {},
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(params.encode()).hexdigest()[:32]
+
+
+def export_task_id(export_key):
+    """
+    Celery task id (and AsyncTask.task_id) used for an export key
+    """
+    return f'export-{export_key}'
+
+
+def export_artifact_path(export_key, file_format):
+    """
+    Absolute path of the artifact produced for an export key
+    """
+    return os.path.join(str(settings.EXPORT_ROOT), f'{export_key}.{file_format}')
+
+
+def filter_records(queryset, filters=None):
+    """
+    Apply equality filters ({column: value}) on JSON data to a records queryset
+    """
+    if not filters:
+        return queryset
+
+    query = Q()
+    for column, value in filters.items():
+        query &= Q(**{f'data__{column}': value})
+    return queryset.filter(query)
+
+
+def encode_csv(data_iter, columns, delimiter=',', bom=False, buffer_size=STREAM_BUFFER_SIZE, rows_per_batch=1000):
+    """
+    Encode an iterable of record dicts as CSV, yielding UTF-8 byte chunks of
+    roughly `buffer_size` bytes instead of one string per row.
+    Rows are formatted a batch at a time with `writer.writerows` into a
+    reusable StringIO buffer.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=delimiter, quoting=csv.QUOTE_MINIMAL)
+
+    if bom:
+        buffer.write('\ufeff')
+    writer.writerow(columns)
+
+    data_iter = iter(data_iter)
+    while True:
+        batch = list(itertools.islice(data_iter, rows_per_batch))
+        if not batch:
+            break
+
+        # csv writes None as an empty string, so map(data.get) matches data.get(col, '')
+        writer.writerows([list(map(data.get, columns)) for data in batch])
+
+        if buffer.tell() >= buffer_size:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def gzip_chunks(chunks, level=6):
+    """
+    Gzip-compress a stream of byte chunks on the fly
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def _encoding_qvalues(header):
+    """
+    Parse an Accept-Encoding header into {coding: q}; malformed q-values count as 0
+    """
+    qvalues = {}
+    for entry in header.lower().split(','):
+        coding, *params = [part.strip() for part in entry.split(';')]
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qvalues[coding] = q
+    return qvalues
+
+
+def accepts_gzip(request):
+    """
+    Check whether the client accepts a gzip Content-Encoding (q > 0 for
+    gzip, or for `*` when gzip isn't listed)
+    """
+    if not settings.EXPORT_GZIP_STREAMING:
+        return False
+    qvalues = _encoding_qvalues(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    for coding in ('gzip', 'x-gzip', '*'):
+        if coding in qvalues:
+            return qvalues[coding] > 0
+    return False
+
+
+def csv_streaming_response(request, data_iter, columns, filename, delimiter=',', bom=False):
+    """
+    Build a StreamingHttpResponse for a CSV export, gzip-compressed when the
+    client advertises support for it.
+    """
+    from django.http import StreamingHttpResponse
+
+    chunks = encode_csv(data_iter, columns, delimiter=delimiter, bom=bom)
+    use_gzip = accepts_gzip(request)
+    if use_gzip:
+        chunks = gzip_chunks(chunks)
+
+    response = StreamingHttpResponse(chunks, content_type=CONTENT_TYPES['csv'])
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['Vary'] = 'Accept-Encoding'
+    if use_gzip:
+        response['Content-Encoding'] = 'gzip'
+    return response
+
+
+def _buffered(parts, buffer_size):
+    """
+    Join small byte strings into chunks of roughly `buffer_size` bytes
+    """
+    pending = []
+    pending_size = 0
+    for part in parts:
+        pending.append(part)
+        pending_size += len(part)
+        if pending_size >= buffer_size:
+            yield b''.join(pending)
+            pending = []
+            pending_size = 0
+    if pending:
+        yield b''.join(pending)
+
+
+def encode_ndjson(json_iter, buffer_size=STREAM_BUFFER_SIZE):
+    """
+    Encode an iterable of JSON documents (bytes) as newline-delimited JSON
+    """
+    def parts():
+        for item in json_iter:
+            yield item
+            yield b'\n'
+    return _buffered(parts(), buffer_size)
+
+
+def encode_json_envelope(envelope, json_iter, key='data', count_key='count', buffer_size=STREAM_BUFFER_SIZE):
+    """
+    Encode `envelope` as a JSON object whose `key` member is an array streamed
+    from `json_iter`. The number of items is appended as `count_key` once the
+    array is complete, so the document matches the non-streaming response.
+    """
+    def parts():
+        head = orjson.dumps(envelope)
+        yield head[:-1] + (b',' if len(head) > 2 else b'') + orjson.dumps(key) + b':['
+        count = 0
+        for item in json_iter:
+            if count:
+                yield b','
+            yield item
+            count += 1
+        yield b'],' + orjson.dumps(count_key) + b':' + str(count).encode() + b'}'
+    return _buffered(parts(), buffer_size)
+
+
+def json_streaming_response(request, chunks, stream_format):
+    """
+    Build a StreamingHttpResponse for JSON ('json') or NDJSON ('ndjson')
+    chunks, gzip-compressed when the client advertises support for it.
+    """
+    from django.http import StreamingHttpResponse
+
+    use_gzip = accepts_gzip(request)
+    if use_gzip:
+        chunks = gzip_chunks(chunks)
+
+    content_type = 'application/x-ndjson' if stream_format == 'ndjson' else 'application/json'
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Vary'] = 'Accept-Encoding'
+    response['X-Accel-Buffering'] = 'no'  # Let nginx forward chunks as they are produced
+    if use_gzip:
+        response['Content-Encoding'] = 'gzip'
+    return response
+
+
+def write_export_artifact(process, file_format, columns, filters, path, progress_callback=None):
+    """
+    Write the export artifact to `path` atomically (temp file + rename).
+    `progress_callback(done, total)` is called periodically while writing.
+    Returns the number of rows written.
+    """
+    from .models import ImportedDataRecord
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.part'
+
+    records = filter_records(ImportedDataRecord.objects.filter(process=process), filters)
+    total = records.count()
+    report_every = max(total // 100, 1000)
+    written = 0
+
+    try:
+        if file_format == 'csv':
+            def counted(data_iter):
+                nonlocal written
+                for data in data_iter:
+                    written += 1
+                    if progress_callback and written % report_every == 0:
+                        progress_callback(written, total)
+                    yield data
+
+            with open(tmp_path, 'wb') as fh:
+                # UTF-8 BOM for Excel compatibility
+                data_iter = counted(iter_record_data(records, columns=columns))
+                for chunk in encode_csv(data_iter, columns, delimiter=';', bom=True):
+                    fh.write(chunk)
+        elif file_format == 'xlsx':
+            from openpyxl import Workbook
+            wb = Workbook(write_only=True)
+            ws = wb.create_sheet(process.table_name[:31])
+            ws.append(columns)
+            for data in iter_record_data(records, columns=columns):
+                ws.append([data.get(col, '') for col in columns])
+                written += 1
+                if progress_callback and written % report_every == 0:
+                    progress_callback(written, total)
+            wb.save(tmp_path)
+        else:
+            raise ValueError(f'Formato de exportação não suportado: {file_format}')
+
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return written
+
+
+def cleanup_export_artifacts(ttl=None):
+    """
+    Remove export artifacts (and temp files of killed workers) older than
+    `ttl` seconds. A request for an expired artifact re-runs its export job.
+    Returns the number of files removed.
+    """
+    ttl = settings.EXPORT_ARTIFACT_TTL if ttl is None else ttl
+    cutoff = time.time() - ttl
+    removed = 0
+
+    if not os.path.isdir(settings.EXPORT_ROOT):
+        return 0
+
+    for entry in os.scandir(settings.EXPORT_ROOT):
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            continue
+
+    return removed
+
+
+def get_or_create_export_job(process, file_format, columns, filters=None, user=None):
+    """
+    Return the AsyncTask for an export request, enqueueing the export only
+    when no identical job is pending/running or already has its artifact.
+    Returns: (async_task, export_key, artifact_ready)
+    """
+    from .models import AsyncTask
+    from .tasks import export_data_async
+
+    export_key = build_export_key(process, file_format, columns, filters)
+    task_id = export_task_id(export_key)
+    path = export_artifact_path(export_key, file_format)
+
+    async_task, created = AsyncTask.objects.get_or_create(
+        task_id=task_id,
+        defaults={
+            'task_name': EXPORT_TASK_NAME,
+            'status': 'pending',
+            'process': process,
+            'created_by': user,
+        }
+    )
+
+    artifact_ready = async_task.status == 'success' and os.path.exists(path)
+    if artifact_ready:
+        return async_task, export_key, True
+
+    # Re-enqueue new jobs, failed jobs and jobs whose artifact was removed
+    needs_enqueue = created or async_task.status == 'failed' or (
+        async_task.status == 'success' and not os.path.exists(path)
+    )
+    if needs_enqueue:
+        if not created:
+            AsyncTask.objects.filter(pk=async_task.pk).update(
+                status='pending', progress=0, error=None, result=None, completed_at=None
+            )
+            async_task.refresh_from_db()
+        # Don't let status polls see the previous run's terminal state
+        set_task_state(task_id, state_from_async_task(async_task))
+
+        export_data_async.apply_async(
+            args=[process.id, file_format, list(columns), filters or {}, export_key],
+            task_id=task_id
+        )
+        logger.info(f"Export job {task_id} enqueued for process {process.id}")
+
+    return async_task, export_key, False
+
+
+def ranged_file_response(request, path, file_format, filename):
+    """
+    Serve a finished export artifact honoring single-range `Range` requests
+    so interrupted downloads can be resumed.
+    """
+    file_size = os.path.getsize(path)
+    content_type = CONTENT_TYPES[file_format]
+    disposition = f'attachment; filename="{filename}"'
+
+    # Multi-range or malformed headers are ignored and the full file is sent (RFC 9110)
+    range_header = request.META.get('HTTP_RANGE', '').strip()
+    match = RANGE_RE.match(range_header) if range_header else None
+
+    if match:
+        start_str, end_str = match.groups()
+        if start_str:
+            start = int(start_str)
+            end = int(end_str) if end_str else file_size - 1
+        elif end_str:
+            # Suffix range: last N bytes
+            start = max(file_size - int(end_str), 0)
+            end = file_size - 1
+        else:
+            start, end = 0, file_size - 1
+
+        end = min(end, file_size - 1)
+        if start >= file_size or start > end:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{file_size}'
+            return response
+
+        length = end - start + 1
+        fh = open(path, 'rb')
+        fh.seek(start)
+        response = FileResponse(_limited_reader(fh, length), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{file_size}'
+        response['Content-Length'] = str(length)
+    else:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+        response['Content-Length'] = str(file_size)
+
+    response['Accept-Ranges'] = 'bytes'
+    response['Content-Disposition'] = disposition
+    return response
+
+
+def _limited_reader(fh, length, block_size=64 * 1024):
+    """
+    Yield at most `length` bytes from an open file, closing it at the end
+    """
+    try:
+        remaining = length
+        while remaining > 0:
+            chunk = fh.read(min(block_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        fh.close()
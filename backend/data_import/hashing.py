@@ -0,0 +1,219 @@
+"""
+Row normalization and hashing for imports
+
+Normalizing rows to sanitized column names and hashing them for duplicate
+detection is pure CPU work. With IMPORT_HASH_POOL_ENABLED, large imports split
+the rows into blocks that a process pool normalizes and hashes in parallel;
+workers send the rows back as compact value tuples. The pool is off by
+default: enable it only where benchmark_hashing shows a gain on the host.
+
+This module must not import Django models: pool workers are started with the
+'spawn' method and only import what they need to hash a block.
+"""
+import atexit
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+_daemonic = None
+
+
+def row_hash(data):
+    """
+    Generate MD5 hash of a normalized row for duplicate detection
+    """
+    # Sort keys to ensure consistent hashing
+    data_str = json.dumps(data, sort_keys=True, ensure_ascii=False)
+    return hashlib.md5(data_str.encode()).hexdigest()
+
+
+def normalize_row(item, name_mapping):
+    """
+    Keep the known columns of a row, renamed to their sanitized names
+    """
+    normalized_data = {}
+    for original_name, value in item.items():
+        safe_name = name_mapping.get(original_name)
+        if safe_name:
+            normalized_data[safe_name] = value
+    return normalized_data
+
+
+def normalize_and_hash_block(rows, name_mapping, offset=0):
+    """
+    Normalize a block of rows to sanitized column names and hash them.
+
+    Returns a dict with:
+        rows: list of (row_hash, normalized_data) for valid rows
+        errors: number of rows that are not dicts or have no known column
+        not_dict: index of the first row that is not a dict (or None)
+        empty: index of the first row without any known column (or None)
+        empty_count: number of rows without any known column
+    """
+    hashed = []
+    errors = 0
+    empty_count = 0
+    first_not_dict = None
+    first_empty = None
+
+    for idx, item in enumerate(rows, start=offset):
+        if not isinstance(item, dict):
+            errors += 1
+            if first_not_dict is None:
+                first_not_dict = idx
+            continue
+
+        normalized_data = normalize_row(item, name_mapping)
+
+        if not normalized_data:
+            errors += 1
+            empty_count += 1
+            if first_empty is None:
+                first_empty = idx
+            continue
+
+        try:
+            hashed.append((row_hash(normalized_data), normalized_data))
+        except (TypeError, ValueError):
+            errors += 1
+
+    return {
+        'rows': hashed,
+        'errors': errors,
+        'not_dict': first_not_dict,
+        'empty': first_empty,
+        'empty_count': empty_count,
+    }
+
+
+def _columns(name_mapping):
+    return tuple(dict.fromkeys(name_mapping.values()))
+
+
+def _hash_block_in_worker(rows, name_mapping, offset):
+    # Rows with every column in mapping order travel back as value tuples
+    # (no repeated keys to pickle); the others keep their dict
+    result = normalize_and_hash_block(rows, name_mapping, offset)
+    columns = _columns(name_mapping)
+    result['rows'] = [
+        (hash_value, tuple(data.values()) if tuple(data) == columns else data)
+        for hash_value, data in result['rows']
+    ]
+    return result
+
+
+def _expand_rows(result, name_mapping):
+    columns = _columns(name_mapping)
+    result['rows'] = [
+        (hash_value, dict(zip(columns, data)) if isinstance(data, tuple) else data)
+        for hash_value, data in result['rows']
+    ]
+    return result
+
+
+def _pool_workers():
+    """
+    Pool size of this process: IMPORT_HASH_WORKERS, or the CPUs shared among
+    the WEB_CONCURRENCY gunicorn workers of the host
+    """
+    from django.conf import settings
+
+    workers = settings.IMPORT_HASH_WORKERS
+    if workers is None:
+        workers = (os.cpu_count() or 1) // max(settings.WEB_CONCURRENCY, 1)
+    return max(workers, 1)
+
+
+def _can_fork():
+    # Daemonic processes (Celery prefork children) can't have children
+    global _daemonic
+
+    if _daemonic is None:
+        _daemonic = multiprocessing.current_process().daemon
+    return not _daemonic
+
+
+def get_executor():
+    """
+    Return the shared process pool (created on first use)
+    """
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            from django.conf import settings
+
+            _executor = ProcessPoolExecutor(
+                max_workers=_pool_workers(),
+                mp_context=multiprocessing.get_context(settings.IMPORT_HASH_POOL_START_METHOD),
+            )
+        return _executor
+
+
+def shutdown_executor():
+    global _executor
+
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+atexit.register(shutdown_executor)
+
+
+def iter_hashed_blocks(data, name_mapping):
+    """
+    Yield normalize_and_hash_block() results for `data` in order, one per block.
+    Blocks are processed by the process pool when it is enabled, the import is
+    large enough (settings.IMPORT_HASH_POOL_MIN_ROWS), more than one worker is
+    available and this process may start children; otherwise they are
+    processed inline.
+    """
+    from django.conf import settings
+
+    block_rows = settings.IMPORT_HASH_BLOCK_ROWS
+    blocks = [(data[i:i + block_rows], i) for i in range(0, len(data), block_rows)]
+
+    use_pool = (
+        settings.IMPORT_HASH_POOL_ENABLED
+        and len(data) >= settings.IMPORT_HASH_POOL_MIN_ROWS
+        and len(blocks) > 1
+        and _pool_workers() > 1
+        and _can_fork()
+    )
+
+    if use_pool:
+        try:
+            executor = get_executor()
+            futures = [
+                executor.submit(_hash_block_in_worker, block, name_mapping, offset)
+                for block, offset in blocks
+            ]
+        except Exception as e:
+            # A broken pool must never fail the import
+            logger.warning(f"Hashing pool unavailable, hashing inline: {e}")
+            shutdown_executor()
+        else:
+            for future, (block, offset) in zip(futures, blocks):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # e.g. BrokenProcessPool after a worker was killed
+                    logger.warning(f"Hashing pool failed on block at row {offset}, hashing inline: {e}")
+                    shutdown_executor()
+                    yield normalize_and_hash_block(block, name_mapping, offset)
+                else:
+                    yield _expand_rows(result, name_mapping)
+            return
+
+    for block, offset in blocks:
+        yield normalize_and_hash_block(block, name_mapping, offset)
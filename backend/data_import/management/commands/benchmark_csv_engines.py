@@ -0,0 +1,92 @@
+"""
+Management command to benchmark the Arrow and pandas CSV readers of file imports
+"""
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from data_import.arrow_csv import read_csv_records, arrow_enabled
+from data_import.hashing import row_hash
+from data_import.services import DataImportService
+
+PORTS = ['Santos', 'Paranaguá', 'Itajaí', 'Rio Grande', 'Suape', 'Itaqui', 'Vila do Conde', 'São Francisco do Sul']
+CARGOS = ['Soja', 'Milho', 'Minério de ferro', 'Contêineres', 'Fertilizantes', 'Celulose', 'Petróleo', 'Açúcar']
+
+
+def write_port_dataset(path, rows, pt_br=False, seed=42):
+    """
+    Write a CSV shaped like the port movement datasets imported in production:
+    text, dates, integers with blanks, decimals and flags. With pt_br=True it
+    uses ';', decimal commas and cp1252, like files exported by Excel in pt-BR.
+    """
+    rng = random.Random(seed)
+    sep, encoding = (';', 'cp1252') if pt_br else (',', 'utf-8')
+    header = ['porto', 'terminal', 'navio', 'imo', 'data_atracacao', 'mercadoria',
+              'toneladas', 'teus', 'calado_m', 'carga_perigosa']
+    start = date(2020, 1, 1)
+
+    def decimal(value):
+        text = f'{value:.2f}'
+        return text.replace('.', ',') if pt_br else text
+
+    with open(path, 'w', encoding=encoding, newline='') as fh:
+        fh.write(sep.join(header) + '\n')
+        for i in range(rows):
+            fh.write(sep.join([
+                rng.choice(PORTS),
+                f'Terminal {rng.randint(1, 40)}',
+                f'MV Navio {rng.randint(1, 5000)}',
+                str(9000000 + rng.randint(0, 999999)),
+                (start + timedelta(days=rng.randint(0, 1500))).isoformat(),
+                rng.choice(CARGOS),
+                decimal(rng.random() * 80000),
+                '' if rng.random() < 0.3 else str(rng.randint(0, 9000)),
+                decimal(8 + rng.random() * 8),
+                rng.choice(['True', 'False']),
+            ]) + '\n')
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the Arrow and pandas CSV readers on generated port datasets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500000, help='Rows per dataset')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement (best is reported)')
+
+    def handle(self, *args, **options):
+        if not arrow_enabled():
+            raise CommandError('pyarrow não está instalado (ou IMPORT_CSV_ENGINE=pandas)')
+
+        self.stdout.write(f'CPUs: {os.cpu_count()}')
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for label, pt_br in (('utf-8, ","', False), ('pt-BR cp1252, ";" e decimal ","', True)):
+                path = os.path.join(tmpdir, 'portos.csv')
+                write_port_dataset(path, options['rows'], pt_br=pt_br)
+                self.stdout.write(
+                    f'\n{label}: {options["rows"]:,} rows ({os.path.getsize(path) / (1024 * 1024):.1f} MB)'
+                )
+
+                results = {}
+                for engine in ('pandas', 'auto'):
+                    with override_settings(IMPORT_CSV_ENGINE=engine):
+                        timings = []
+                        for _ in range(options['repeat']):
+                            start = time.perf_counter()
+                            records = read_csv_records(path)
+                            timings.append(time.perf_counter() - start)
+                    results[engine] = (min(timings), records)
+
+                (pandas_time, pandas_rows), (arrow_time, arrow_rows) = results['pandas'], results['auto']
+                same = (
+                    [row_hash(row) for row in pandas_rows] == [row_hash(row) for row in arrow_rows]
+                    and DataImportService.analyze_column_structure(pandas_rows[:1000])
+                    == DataImportService.analyze_column_structure(arrow_rows[:1000])
+                )
+                self.stdout.write(f'  pandas {pandas_time:7.3f}s | {len(pandas_rows) / pandas_time:10,.0f} rows/s')
+                self.stdout.write(
+                    f'  arrow  {arrow_time:7.3f}s | {len(arrow_rows) / arrow_time:10,.0f} rows/s | '
+                    f'{pandas_time / arrow_time:4.1f}x | same rows and types: {"yes" if same else "NO"}'
+                )
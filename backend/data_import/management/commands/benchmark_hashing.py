@@ -0,0 +1,74 @@
+"""
+Management command to benchmark row normalization/hashing of imports inline vs in the process pool
+"""
+import os
+import random
+import tempfile
+import time
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from data_import.hashing import iter_hashed_blocks, shutdown_executor
+from data_import.services import DataImportService
+
+
+class Command(BaseCommand):
+    help = 'Benchmark normalizing and hashing the rows of a CSV import inline and with the process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help='Number of rows in the CSV')
+        parser.add_argument('--columns', type=int, default=50, help='Number of columns in the CSV')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Pool workers')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement (best is reported)')
+
+    def handle(self, *args, **options):
+        import pandas as pd
+
+        rng = random.Random(42)
+        columns = [f'Coluna {i}' for i in range(options['columns'])]
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'benchmark.csv')
+            pd.DataFrame({
+                col: ([rng.randint(0, 10 ** 6) for _ in range(options['rows'])] if i % 3 == 0 else
+                      [round(rng.random() * 1000, 3) for _ in range(options['rows'])] if i % 3 == 1 else
+                      [f'Navio {rng.randint(0, 9999)}' for _ in range(options['rows'])])
+                for i, col in enumerate(columns)
+            }).to_csv(path, index=False)
+
+            self.stdout.write(
+                f'CSV: {options["rows"]:,} rows x {len(columns)} columns '
+                f'({os.path.getsize(path) / (1024 * 1024):.1f} MB) | CPUs: {os.cpu_count()}\n'
+            )
+            data = DataImportService.dataframe_to_dict_list(pd.read_csv(path))
+
+        name_mapping = {col: DataImportService.sanitize_column_name(col) for col in columns}
+
+        def best_of(workers):
+            timings = []
+            with override_settings(IMPORT_HASH_POOL_ENABLED=True, IMPORT_HASH_WORKERS=workers,
+                                   IMPORT_HASH_POOL_MIN_ROWS=0):
+                for _ in range(options['repeat']):
+                    start, cpu_start = time.perf_counter(), time.process_time()
+                    hashed = sum(len(block['rows']) for block in iter_hashed_blocks(data, name_mapping))
+                    timings.append((time.perf_counter() - start, time.process_time() - cpu_start))
+            wall, cpu = min(timings)
+            return wall, cpu, hashed
+
+        inline_time, inline_cpu, inline_rows = best_of(1)
+        # Warm the pool up so process start-up is not measured
+        best_of(options['workers'])
+        pool_time, pool_cpu, pool_rows = best_of(options['workers'])
+        shutdown_executor()
+
+        assert inline_rows == pool_rows
+        speedup = inline_time / pool_time if pool_time else 0
+        self.stdout.write(
+            f'inline           {inline_time:7.3f}s | {inline_rows / inline_time:10,.0f} rows/s | '
+            f'request CPU {inline_cpu:6.3f}s'
+        )
+        self.stdout.write(
+            f'pool ({options["workers"]} workers) {pool_time:7.3f}s | '
+            f'{pool_rows / pool_time:10,.0f} rows/s | request CPU {pool_cpu:6.3f}s | {speedup:4.1f}x'
+        )
+        if speedup <= 1:
+            self.stdout.write(self.style.WARNING('No speedup measured: keep IMPORT_HASH_POOL_ENABLED off on this host'))
@@ -0,0 +1,76 @@
+"""
+Management command to benchmark JSON decoding and rendering of dataset responses
+"""
+import json
+import random
+import time
+import orjson
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnDict
+from core.renderers import ORJSONRenderer
+
+
+class Command(BaseCommand):
+    help = 'Benchmark stdlib json/DRF JSONRenderer against orjson on a dataset response'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help='Number of records in the response')
+        parser.add_argument('--columns', type=int, default=15, help='Number of columns per record')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement (best is reported)')
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        columns = [f'col_{i}' for i in range(options['columns'])]
+        records = [
+            {
+                col: (rng.randint(0, 10 ** 6) if i % 4 == 0 else
+                      round(rng.random() * 1000, 3) if i % 4 == 1 else
+                      None if i % 4 == 2 and rng.random() < 0.2 else
+                      f'Navio {rng.randint(0, 9999)} - São Sebastião')
+                for i, col in enumerate(columns)
+            }
+            for _ in range(options['rows'])
+        ]
+        # Payloads as stored in ImportedDataRecord.data
+        stored = [json.dumps(record, ensure_ascii=False) for record in records]
+        response_data = ReturnDict({
+            'success': True,
+            'process_id': 1,
+            'table_name': 'benchmark',
+            'columns': columns,
+            'data': records,
+            'count': len(records),
+        }, serializer=None)
+
+        self.stdout.write(f'Records: {len(records):,} | Columns: {len(columns)}\n')
+
+        def best_of(func):
+            timings = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                result = func()
+                timings.append(time.perf_counter() - start)
+            return min(timings), result
+
+        drf_renderer = JSONRenderer()
+        orjson_renderer = ORJSONRenderer()
+
+        benchmarks = [
+            ('decode from_db_value', lambda: [json.loads(raw) for raw in stored],
+             lambda: [orjson.loads(raw) for raw in stored]),
+            ('render response', lambda: drf_renderer.render(response_data),
+             lambda: orjson_renderer.render(response_data)),
+        ]
+
+        for name, stdlib_func, orjson_func in benchmarks:
+            stdlib_time, stdlib_result = best_of(stdlib_func)
+            orjson_time, orjson_result = best_of(orjson_func)
+            speedup = stdlib_time / orjson_time if orjson_time else 0
+            self.stdout.write(
+                f'{name:<22} stdlib {stdlib_time:7.3f}s | orjson {orjson_time:7.3f}s | {speedup:5.1f}x'
+            )
+
+        self.stdout.write(
+            f'Rendered body: {len(drf_renderer.render(response_data)) / (1024 * 1024):.1f} MB'
+        )
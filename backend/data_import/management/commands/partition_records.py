@@ -0,0 +1,39 @@
+"""
+Management command to partition the records table by dataset (PostgreSQL)
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from data_import.partitioning import convert_to_partitioned, is_partitioned
+
+
+class Command(BaseCommand):
+    help = (
+        'Convert the ImportedDataRecord table into a table LIST-partitioned by process_id, '
+        'one partition per dataset (PostgreSQL only; locks the table while records are copied)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report whether the table is partitioned',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError(f'Partitioning requires PostgreSQL (database backend: {connection.vendor})')
+
+        if options['check']:
+            with connection.cursor() as cursor:
+                partitioned = is_partitioned(cursor)
+            self.stdout.write('partitioned' if partitioned else 'not partitioned')
+            return
+
+        if not settings.RECORD_PARTITIONING:
+            self.stdout.write(self.style.WARNING(
+                'RECORD_PARTITIONING is off: new datasets will go to the default partition until it is enabled'
+            ))
+
+        created = convert_to_partitioned(log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(f'Done, {created} partitions created'))
@@ -0,0 +1,196 @@
+"""
+Keyed upserts for appends
+
+A dataset can declare key columns (`'key': True` in its column_structure).
+Appends to a keyed dataset merge the incoming rows by key instead of only
+adding rows with a new full-row hash:
+
+    - rows with a new key are inserted
+    - rows whose key exists with different data replace that record
+    - rows equal to the stored record are counted as duplicates
+    - with delete_missing, live records whose key is absent from the incoming
+      data are deleted
+
+Replaced and deleted records are copy-on-write: they are only retired
+(deleted_at/retired_version) so previous versions still see them, see
+versions.py. Each record stores the hash of its key values (key_hash). The
+merge loads the key index of the live dataset once, classifies the incoming
+rows in memory and applies the result with bulk INSERT / UPDATE statements.
+"""
+import hashlib
+import json
+import logging
+from django.db import transaction
+from django.utils import timezone
+from .hashing import iter_hashed_blocks
+from .progress import NULL_PROGRESS
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+
+class KeyColumnsError(ValueError):
+    """
+    Key columns can't be declared on a dataset; the message is user-facing
+    """
+
+
+def key_columns(column_structure):
+    """
+    Sanitized names of the key columns of a dataset, in column order
+    """
+    return [name for name, info in (column_structure or {}).items() if info.get('key')]
+
+
+def key_hash(data, columns):
+    """
+    MD5 hash of the key values of a normalized row (None if any is missing)
+    """
+    values = [data.get(column) for column in columns]
+    if any(value is None or value == '' for value in values):
+        return None
+    return hashlib.md5(json.dumps(values, ensure_ascii=False).encode()).hexdigest()
+
+
+def _batches(items):
+    for i in range(0, len(items), BATCH_SIZE):
+        yield items[i:i + BATCH_SIZE]
+
+
+def set_key_columns(process, columns):
+    """
+    Declare `columns` (sanitized or original names) as the key of a dataset
+    and index the existing records by key (an empty list removes the key).
+    Raises KeyColumnsError if a column is unknown or the existing records
+    have missing or repeated keys.
+    """
+    from .models import ImportedDataRecord
+
+    structure = process.column_structure or {}
+    by_original = {info.get('original_name'): name for name, info in structure.items()}
+    resolved = []
+    for column in columns:
+        name = column if column in structure else by_original.get(column)
+        if name is None:
+            raise KeyColumnsError(f'Coluna não encontrada no dataset: {column}')
+        if name not in resolved:
+            resolved.append(name)
+    ordered = [name for name in structure if name in resolved]
+
+    records = ImportedDataRecord.objects.filter(process=process)
+    updates = []
+    if ordered:
+        seen = set()
+        missing = repeated = 0
+        for record_id, data in records.values_list('id', 'data').iterator(chunk_size=BATCH_SIZE):
+            hash_value = key_hash(data, ordered)
+            if hash_value is None:
+                missing += 1
+            elif hash_value in seen:
+                repeated += 1
+            seen.add(hash_value)
+            updates.append(ImportedDataRecord(id=record_id, key_hash=hash_value))
+        if missing:
+            raise KeyColumnsError(f'{missing} registros sem valor em alguma coluna-chave')
+        if repeated:
+            raise KeyColumnsError(f'{repeated} registros repetem a chave de outro registro')
+
+    with transaction.atomic():
+        if ordered:
+            # Filtered by process so partitioned tables only touch one partition
+            records.bulk_update(updates, ['key_hash'], batch_size=BATCH_SIZE)
+        else:
+            records.update(key_hash=None)
+
+        process.column_structure = {
+            name: {**{k: v for k, v in info.items() if k != 'key'}, **({'key': True} if name in ordered else {})}
+            for name, info in structure.items()
+        }
+        process.save(update_fields=['column_structure', 'updated_at'])
+
+    return ordered
+
+
+def merge_records(process, data, column_structure, delete_missing=False, progress=None, version=1):
+    """
+    Merge `data` into a keyed dataset as version `version` (see module
+    docstring).
+
+    Returns: dictionary with statistics {
+        'inserted', 'updated', 'deleted', 'duplicates', 'errors', 'total'
+    }; rows without a value in some key column count as errors and rows
+    repeating a key of the same append as duplicates (the last one wins).
+    """
+    from .models import ImportedDataRecord
+
+    progress = progress or NULL_PROGRESS
+    columns = key_columns(column_structure)
+    name_mapping = {info['original_name']: name for name, info in column_structure.items()}
+
+    # key_hash -> (id, row_hash) of the live records
+    existing = {
+        hash_value: (record_id, row_hash)
+        for hash_value, record_id, row_hash in
+        ImportedDataRecord.objects.filter(process=process, key_hash__isnull=False)
+        .values_list('key_hash', 'id', 'row_hash').iterator(chunk_size=BATCH_SIZE)
+    }
+
+    incoming = {}
+    errors = duplicates = 0
+    progress.start_stage('hash', total=len(data))
+    for block in iter_hashed_blocks(data, name_mapping):
+        errors += block['errors']
+        for row_hash, normalized_data in block['rows']:
+            hash_value = key_hash(normalized_data, columns)
+            if hash_value is None:
+                errors += 1
+                continue
+            if hash_value in incoming:
+                duplicates += 1
+            incoming[hash_value] = (row_hash, normalized_data)
+        progress.advance(len(block['rows']) + block['errors'])
+
+    # Replaced records are retired and their new data inserted as new records
+    to_create, to_retire = [], []
+    updated = 0
+    for hash_value, (row_hash, normalized_data) in incoming.items():
+        current = existing.get(hash_value)
+        if current is not None and current[1] == row_hash:
+            duplicates += 1
+            continue
+        if current is not None:
+            to_retire.append(current[0])
+            updated += 1
+        to_create.append(ImportedDataRecord(
+            process=process, row_hash=row_hash, key_hash=hash_value, data=normalized_data, version=version
+        ))
+
+    deleted = 0
+    if delete_missing:
+        missing = [record_id for hash_value, (record_id, _) in existing.items() if hash_value not in incoming]
+        to_retire.extend(missing)
+        deleted = len(missing)
+
+    progress.start_stage('insert', total=len(to_create) + len(to_retire))
+    with transaction.atomic():
+        now = timezone.now()
+        for batch in _batches(to_retire):
+            ImportedDataRecord.objects.filter(process=process, id__in=batch).update(
+                deleted_at=now, retired_version=version
+            )
+            progress.advance(len(batch))
+        for batch in _batches(to_create):
+            ImportedDataRecord.objects.bulk_create(batch)
+            progress.advance(len(batch))
+
+    stats = {
+        'inserted': len(to_create) - updated,
+        'updated': updated,
+        'deleted': deleted,
+        'duplicates': duplicates,
+        'errors': errors,
+        'total': len(data),
+    }
+    logger.info(f"Keyed merge into {process.table_name}: {stats}")
+    return stats
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-19 01:40
+
+import data_import.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_import', '0006_asynctask'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='importeddatarecord',
+            name='data',
+            field=data_import.fields.ORJSONField(help_text='Dados do registro em formato JSON', verbose_name='Dados'),
+        ),
+    ]
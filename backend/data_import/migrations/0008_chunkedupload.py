@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-19 01:59
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_import', '0007_importeddatarecord_orjson_data'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChunkedUpload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('upload_id', models.UUIDField(default=uuid.uuid4, editable=False, unique=True, verbose_name='ID do Upload')),
+                ('file_name', models.CharField(max_length=255, verbose_name='Nome do Arquivo')),
+                ('size', models.BigIntegerField(verbose_name='Tamanho Total (bytes)')),
+                ('offset', models.BigIntegerField(default=0, verbose_name='Bytes Recebidos')),
+                ('checksum', models.CharField(blank=True, default='', help_text='Checksum opcional do arquivo completo, verificado na conclusão', max_length=64, verbose_name='SHA-256 do Arquivo')),
+                ('status', models.CharField(choices=[('uploading', 'Enviando'), ('completed', 'Concluído'), ('aborted', 'Cancelado'), ('expired', 'Expirado')], db_index=True, default='uploading', max_length=20, verbose_name='Status')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Data de Criação')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Data de Atualização')),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunked_uploads', to=settings.AUTH_USER_MODEL, verbose_name='Criado por')),
+                ('task', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='uploads', to='data_import.asynctask', verbose_name='Task de Importação')),
+            ],
+            options={
+                'verbose_name': 'Upload em Partes',
+                'verbose_name_plural': 'Uploads em Partes',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'updated_at'], name='data_import_status_b0ab67_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_import', '0008_chunkedupload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importeddatarecord',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, help_text='Preenchida quando o registro some de uma adição com chave (exclusão lógica)', null=True, verbose_name='Data de Exclusão'),
+        ),
+        migrations.AddField(
+            model_name='importeddatarecord',
+            name='key_hash',
+            field=models.CharField(blank=True, help_text='Hash MD5 das colunas-chave do dataset (quando declaradas)', max_length=64, null=True, verbose_name='Hash da Chave'),
+        ),
+        migrations.AddIndex(
+            model_name='importeddatarecord',
+            index=models.Index(fields=['process', 'key_hash'], name='record_process_key_idx'),
+        ),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_initial_versions(apps, schema_editor):
+    """
+    Existing records are stamped as version 1 (field default); give every
+    existing dataset its version 1 row
+    """
+    DataImportProcess = apps.get_model('data_import', 'DataImportProcess')
+    DatasetVersion = apps.get_model('data_import', 'DatasetVersion')
+    DatasetVersion.objects.bulk_create([
+        DatasetVersion(
+            process_id=process.id,
+            number=1,
+            kind='import',
+            record_count=process.record_count,
+            created_by_id=process.created_by_id,
+        )
+        for process in DataImportProcess.objects.all()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_import', '0009_importeddatarecord_key_hash'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DatasetVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField(verbose_name='Número da Versão')),
+                ('kind', models.CharField(choices=[('import', 'Importação'), ('append', 'Adição')], max_length=20, verbose_name='Tipo')),
+                ('status', models.CharField(choices=[('active', 'Ativa'), ('rolled_back', 'Revertida')], default='active', max_length=20, verbose_name='Status')),
+                ('task_id', models.CharField(blank=True, default='', help_text='Task que gerou a versão (reaproveitada entre tentativas)', max_length=255, verbose_name='ID da Task Celery')),
+                ('statistics', models.JSONField(default=dict, help_text='Registros inseridos, atualizados, excluídos e duplicados', verbose_name='Estatísticas')),
+                ('record_count', models.IntegerField(default=0, help_text='Registros do dataset nesta versão', verbose_name='Quantidade de Registros')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Data de Criação')),
+                ('rolled_back_at', models.DateTimeField(blank=True, null=True, verbose_name='Data de Reversão')),
+            ],
+            options={
+                'verbose_name': 'Versão do Dataset',
+                'verbose_name_plural': 'Versões dos Datasets',
+                'ordering': ['-number'],
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='importeddatarecord',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='importeddatarecord',
+            name='retired_version',
+            field=models.PositiveIntegerField(blank=True, help_text='Versão que substituiu ou excluiu o registro (vazio enquanto ativo)', null=True, verbose_name='Versão de Substituição'),
+        ),
+        migrations.AddField(
+            model_name='importeddatarecord',
+            name='version',
+            field=models.PositiveIntegerField(default=1, help_text='Versão do dataset (importação/adição) que criou o registro', verbose_name='Versão'),
+        ),
+        migrations.AddIndex(
+            model_name='importeddatarecord',
+            index=models.Index(fields=['process', 'version', 'retired_version'], name='record_process_version_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='importeddatarecord',
+            constraint=models.UniqueConstraint(condition=models.Q(('deleted_at__isnull', True)), fields=('process', 'row_hash'), name='record_live_row_hash_uniq'),
+        ),
+        migrations.AddField(
+            model_name='datasetversion',
+            name='created_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='dataset_versions', to=settings.AUTH_USER_MODEL, verbose_name='Criado por'),
+        ),
+        migrations.AddField(
+            model_name='datasetversion',
+            name='process',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='versions', to='data_import.dataimportprocess', verbose_name='Processo de Importação'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='datasetversion',
+            unique_together={('process', 'number')},
+        ),
+        migrations.RunPython(create_initial_versions, migrations.RunPython.noop),
+    ]
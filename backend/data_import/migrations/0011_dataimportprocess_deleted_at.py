@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_import', '0010_datasetversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataimportprocess',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, help_text='Preenchida quando o dataset é excluído; os registros são removidos em segundo plano', null=True, verbose_name='Data de Exclusão'),
+        ),
+    ]
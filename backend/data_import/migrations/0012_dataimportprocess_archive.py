@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_import', '0011_dataimportprocess_deleted_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataimportprocess',
+            name='archive_path',
+            field=models.CharField(blank=True, default='', help_text='Caminho do arquivo Parquet com os registros arquivados', max_length=500, verbose_name='Arquivo Parquet'),
+        ),
+        migrations.AddField(
+            model_name='dataimportprocess',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, help_text='Preenchida enquanto os registros do dataset estão arquivados em Parquet', null=True, verbose_name='Data de Arquivamento'),
+        ),
+    ]
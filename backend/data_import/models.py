@@ -1,9 +1,21 @@
+import uuid
 from django.db import models
 from django.contrib.auth import get_user_model
+from .fields import ORJSONField
 
 User = get_user_model()
 
 
+class ActiveProcessManager(models.Manager):
+    """
+    Default manager of DataImportProcess: hides datasets being deleted in the
+    background (see deletion.py)
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class DataImportProcess(models.Model):
     """
     Model to track data import processes from external endpoints
@@ -63,6 +75,28 @@ class DataImportProcess(models.Model):
         auto_now=True,
         verbose_name='Data de Atualização'
     )
+    deleted_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Data de Exclusão',
+        help_text='Preenchida quando o dataset é excluído; os registros são removidos em segundo plano'
+    )
+    archived_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Data de Arquivamento',
+        help_text='Preenchida enquanto os registros do dataset estão arquivados em Parquet'
+    )
+    archive_path = models.CharField(
+        max_length=500,
+        blank=True,
+        default='',
+        verbose_name='Arquivo Parquet',
+        help_text='Caminho do arquivo Parquet com os registros arquivados'
+    )
+
+    objects = ActiveProcessManager()
+    all_objects = models.Manager()
 
     class Meta:
         verbose_name = 'Processo de Importação'
@@ -77,6 +111,15 @@ class DataImportProcess(models.Model):
         return f"{self.table_name} - {self.get_status_display()}"
 
 
+class LiveRecordManager(models.Manager):
+    """
+    Default manager of ImportedDataRecord: hides soft-deleted records
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class ImportedDataRecord(models.Model):
     """
     Model to store imported data records using JSONField
@@ -88,7 +131,7 @@ class ImportedDataRecord(models.Model):
         related_name='records',
         verbose_name='Processo de Importação'
     )
-    data = models.JSONField(
+    data = ORJSONField(
         verbose_name='Dados',
         help_text='Dados do registro em formato JSON'
     )
@@ -98,11 +141,38 @@ class ImportedDataRecord(models.Model):
         verbose_name='Hash do Registro',
         help_text='Hash MD5 dos dados para detecção de duplicatas'
     )
+    version = models.PositiveIntegerField(
+        default=1,
+        verbose_name='Versão',
+        help_text='Versão do dataset (importação/adição) que criou o registro'
+    )
+    retired_version = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='Versão de Substituição',
+        help_text='Versão que substituiu ou excluiu o registro (vazio enquanto ativo)'
+    )
+    key_hash = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True,
+        verbose_name='Hash da Chave',
+        help_text='Hash MD5 das colunas-chave do dataset (quando declaradas)'
+    )
+    deleted_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Data de Exclusão',
+        help_text='Preenchida quando o registro some de uma adição com chave (exclusão lógica)'
+    )
     created_at = models.DateTimeField(
         auto_now_add=True,
         verbose_name='Data de Criação'
     )
 
+    objects = LiveRecordManager()
+    all_objects = models.Manager()
+
     class Meta:
         verbose_name = 'Registro Importado'
         verbose_name_plural = 'Registros Importados'
@@ -110,9 +180,18 @@ class ImportedDataRecord(models.Model):
         indexes = [
             models.Index(fields=['process', 'row_hash']),
             models.Index(fields=['process', 'created_at']),
+            models.Index(fields=['process', 'key_hash'], name='record_process_key_idx'),
+            models.Index(fields=['process', 'version', 'retired_version'], name='record_process_version_idx'),
+        ]
+        constraints = [
+            # Ensure no duplicate live records per process (replaced/deleted
+            # records are kept for previous versions)
+            models.UniqueConstraint(
+                fields=['process', 'row_hash'],
+                condition=models.Q(deleted_at__isnull=True),
+                name='record_live_row_hash_uniq'
+            ),
         ]
-        # Ensure no duplicate records per process
-        unique_together = [['process', 'row_hash']]
 
     def __str__(self):
         return f"Registro {self.id} - {self.process.table_name}"
@@ -122,11 +201,87 @@ class ImportedDataRecord(models.Model):
         """
         Generate MD5 hash of data for duplicate detection
         """
-        import hashlib
-        import json
-        # Sort keys to ensure consistent hashing
-        data_str = json.dumps(data, sort_keys=True, ensure_ascii=False)
-        return hashlib.md5(data_str.encode()).hexdigest()
+        from .hashing import row_hash
+        return row_hash(data)
+
+
+class DatasetVersion(models.Model):
+    """
+    One import or append of a dataset. Records are stamped with the version
+    that created them (and the one that replaced them), see versions.py
+    """
+    KIND_CHOICES = [
+        ('import', 'Importação'),
+        ('append', 'Adição'),
+    ]
+    STATUS_CHOICES = [
+        ('active', 'Ativa'),
+        ('rolled_back', 'Revertida'),
+    ]
+
+    process = models.ForeignKey(
+        DataImportProcess,
+        on_delete=models.CASCADE,
+        related_name='versions',
+        verbose_name='Processo de Importação'
+    )
+    number = models.PositiveIntegerField(
+        verbose_name='Número da Versão'
+    )
+    kind = models.CharField(
+        max_length=20,
+        choices=KIND_CHOICES,
+        verbose_name='Tipo'
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='active',
+        verbose_name='Status'
+    )
+    task_id = models.CharField(
+        max_length=255,
+        blank=True,
+        default='',
+        verbose_name='ID da Task Celery',
+        help_text='Task que gerou a versão (reaproveitada entre tentativas)'
+    )
+    statistics = models.JSONField(
+        default=dict,
+        verbose_name='Estatísticas',
+        help_text='Registros inseridos, atualizados, excluídos e duplicados'
+    )
+    record_count = models.IntegerField(
+        default=0,
+        verbose_name='Quantidade de Registros',
+        help_text='Registros do dataset nesta versão'
+    )
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='dataset_versions',
+        verbose_name='Criado por'
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Data de Criação'
+    )
+    rolled_back_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Data de Reversão'
+    )
+
+    class Meta:
+        verbose_name = 'Versão do Dataset'
+        verbose_name_plural = 'Versões dos Datasets'
+        ordering = ['-number']
+        unique_together = [['process', 'number']]
+
+    def __str__(self):
+        return f"{self.process.table_name} v{self.number}"
 
 
 class AsyncTask(models.Model):
@@ -216,3 +371,80 @@ class AsyncTask(models.Model):
 
     def __str__(self):
         return f"{self.task_name} - {self.get_status_display()}"
+
+
+class ChunkedUpload(models.Model):
+    """
+    Resumable upload of a large file, received in chunks into the upload spool
+    """
+    STATUS_CHOICES = [
+        ('uploading', 'Enviando'),
+        ('completed', 'Concluído'),
+        ('aborted', 'Cancelado'),
+        ('expired', 'Expirado'),
+    ]
+
+    upload_id = models.UUIDField(
+        default=uuid.uuid4,
+        unique=True,
+        editable=False,
+        verbose_name='ID do Upload'
+    )
+    file_name = models.CharField(
+        max_length=255,
+        verbose_name='Nome do Arquivo'
+    )
+    size = models.BigIntegerField(
+        verbose_name='Tamanho Total (bytes)'
+    )
+    offset = models.BigIntegerField(
+        default=0,
+        verbose_name='Bytes Recebidos'
+    )
+    checksum = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        verbose_name='SHA-256 do Arquivo',
+        help_text='Checksum opcional do arquivo completo, verificado na conclusão'
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='uploading',
+        db_index=True,
+        verbose_name='Status'
+    )
+    task = models.ForeignKey(
+        AsyncTask,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='uploads',
+        verbose_name='Task de Importação'
+    )
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='chunked_uploads',
+        verbose_name='Criado por'
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Data de Criação'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Data de Atualização'
+    )
+
+    class Meta:
+        verbose_name = 'Upload em Partes'
+        verbose_name_plural = 'Uploads em Partes'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'updated_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.file_name} ({self.offset}/{self.size})"
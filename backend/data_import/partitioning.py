@@ -0,0 +1,232 @@
+"""
+PostgreSQL LIST partitioning of the records table by process
+
+With RECORD_PARTITIONING enabled on PostgreSQL the ImportedDataRecord table is
+partitioned by process_id, one partition per dataset, so queries filtering by
+process (all of them) only scan the indexes and heap of their own dataset:
+
+    data_import_importeddatarecord            PARTITION BY LIST (process_id)
+      data_import_importeddatarecord_p12      FOR VALUES IN (12)
+      data_import_importeddatarecord_default  DEFAULT
+
+- `manage.py partition_records` converts an existing table (see
+  convert_to_partitioned); the conversion locks the table while the rows are
+  copied, so run it in a maintenance window
+- ensure_partition() is called when a dataset is created, in its own short
+  transaction before any of its rows are written (never inside an import
+  transaction, which would hold the partition locks until it commits). The
+  partition is created as a plain table and then attached, which doesn't
+  block reads and writes of other datasets (CREATE TABLE ... PARTITION OF
+  would). ATTACH scans the default partition under an ACCESS EXCLUSIVE lock;
+  it stays (nearly) empty as partitions exist before their rows, and
+  PARTITION_LOCK_TIMEOUT bounds the wait. Rows that landed in the default
+  partition meanwhile are moved into the new partition.
+- drop_partition() detaches and drops the partition of a deleted dataset
+  instead of deleting its rows (see deletion.py)
+
+The physical primary key becomes (process_id, id), as PostgreSQL requires the
+partition key in unique indexes; Django keeps using `id`, which gets a plain
+index. Identity columns aren't supported on partitioned tables before
+PostgreSQL 17, so `id` takes its values from a sequence owned by the column
+(`<table>_id_seq`, continued from the old maximum). Everything here is a
+no-op on other backends.
+"""
+import logging
+from django.conf import settings
+from django.db import connection, transaction, OperationalError
+
+logger = logging.getLogger(__name__)
+
+# Longest wait for the locks of ATTACH PARTITION before giving up (the rows
+# then stay in the default partition until `manage.py partition_records`)
+PARTITION_LOCK_TIMEOUT = '5s'
+
+
+def _record_table():
+    from .models import ImportedDataRecord
+    return ImportedDataRecord._meta.db_table
+
+
+def partition_name(process_id):
+    return f'{_record_table()}_p{int(process_id)}'
+
+
+def default_partition_name():
+    return f'{_record_table()}_default'
+
+
+def partitioning_enabled():
+    return settings.RECORD_PARTITIONING and connection.vendor == 'postgresql'
+
+
+def is_partitioned(cursor):
+    cursor.execute(
+        'SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)', [_record_table()]
+    )
+    return cursor.fetchone() is not None
+
+
+def _is_attached(cursor, table):
+    cursor.execute(
+        'SELECT 1 FROM pg_inherits WHERE inhrelid = to_regclass(%s) AND inhparent = to_regclass(%s)',
+        [table, _record_table()]
+    )
+    return cursor.fetchone() is not None
+
+
+def _create_partition(cursor, process_id):
+    qn = connection.ops.quote_name
+    parent = qn(_record_table())
+    partition = qn(partition_name(process_id))
+    default = qn(default_partition_name())
+
+    # INCLUDING ALL copies the id default and the indexes, which ATTACH then
+    # adopts instead of building its own
+    cursor.execute(f'CREATE TABLE IF NOT EXISTS {partition} (LIKE {parent} INCLUDING ALL)')
+    # Rows inserted before the partition existed went to the default partition
+    cursor.execute(
+        f'WITH moved AS (DELETE FROM {default} WHERE process_id = %s RETURNING *) '
+        f'INSERT INTO {partition} SELECT * FROM moved',
+        [int(process_id)]
+    )
+    cursor.execute(f'ALTER TABLE {parent} ATTACH PARTITION {partition} FOR VALUES IN ({int(process_id)})')
+
+
+def ensure_partition(process_id):
+    """
+    Create and attach the partition of a dataset (if partitioning is enabled
+    and it doesn't exist yet)
+    """
+    if not partitioning_enabled():
+        return False
+    if connection.in_atomic_block:
+        # The DDL locks would be held until the caller's transaction commits
+        raise RuntimeError('ensure_partition() must run outside of a transaction')
+
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            if not is_partitioned(cursor) or _is_attached(cursor, partition_name(process_id)):
+                return False
+            cursor.execute(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'")
+            _create_partition(cursor, process_id)
+    except OperationalError as e:
+        logger.warning(f"Could not create record partition for process {process_id}, using the default partition: {e}")
+        return False
+
+    logger.info(f"Created record partition for process {process_id}")
+    return True
+
+
+def drop_partition(process_id):
+    """
+    Detach and drop the partition of a dataset. Returns False when there is
+    no partition to drop (the rows must then be deleted).
+    """
+    if not partitioning_enabled():
+        return False
+
+    qn = connection.ops.quote_name
+    with transaction.atomic(), connection.cursor() as cursor:
+        table = partition_name(process_id)
+        if not is_partitioned(cursor) or not _is_attached(cursor, table):
+            return False
+        cursor.execute(f'ALTER TABLE {qn(_record_table())} DETACH PARTITION {qn(table)}')
+        cursor.execute(f'DROP TABLE {qn(table)}')
+
+    logger.info(f"Dropped record partition of process {process_id}")
+    return True
+
+
+def convert_to_partitioned(log=None):
+    """
+    Convert the records table into a table partitioned by process_id, with
+    one partition per existing dataset and a default partition. On a table
+    that is already partitioned, only the missing partitions are created.
+    Returns the number of partitions created.
+    """
+    from .models import DataImportProcess
+
+    log = log or logger.info
+    qn = connection.ops.quote_name
+    table = _record_table()
+    legacy = f'{table}_legacy'
+    process_ids = list(DataImportProcess.all_objects.values_list('id', flat=True))
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        if is_partitioned(cursor):
+            created = 0
+            for process_id in process_ids:
+                if not _is_attached(cursor, partition_name(process_id)):
+                    _create_partition(cursor, process_id)
+                    created += 1
+            log(f'{table} is already partitioned, {created} partitions created')
+            return created
+
+        # Indexes and constraints are recreated on the partitioned table
+        # (which propagates them to every partition) under the same names
+        cursor.execute(
+            'SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexname NOT IN '
+            '(SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s))',
+            [table, table]
+        )
+        index_defs = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = to_regclass(%s) AND contype IN ('f', 'u')",
+            [table]
+        )
+        constraints = cursor.fetchall()
+
+        log(f'Renaming {table} to {legacy}')
+        cursor.execute(f'ALTER TABLE {qn(table)} RENAME TO {qn(legacy)}')
+
+        # `id` is an identity column (Django >= 4.1) or a serial one; either
+        # way the new table gets a sequence owned by its own `id` column
+        cursor.execute(
+            "SELECT attidentity FROM pg_attribute WHERE attrelid = to_regclass(%s) AND attname = 'id'",
+            [legacy]
+        )
+        identity = bool(cursor.fetchone()[0])
+        if identity:
+            # Drops the identity sequence and frees its name
+            cursor.execute(f'ALTER TABLE {qn(legacy)} ALTER COLUMN id DROP IDENTITY')
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [legacy])
+        sequence = cursor.fetchone()[0]
+
+        cursor.execute(
+            f'CREATE TABLE {qn(table)} (LIKE {qn(legacy)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS '
+            f'INCLUDING STORAGE INCLUDING COMMENTS) PARTITION BY LIST (process_id)'
+        )
+        if sequence is None:
+            sequence = qn(f'{table}_id_seq')
+            cursor.execute(f'CREATE SEQUENCE {sequence} OWNED BY {qn(table)}.id')
+            cursor.execute(f"ALTER TABLE {qn(table)} ALTER COLUMN id SET DEFAULT nextval('{sequence}'::regclass)")
+        else:
+            # Serial column: the copied default already uses this sequence;
+            # keep it from being dropped with the legacy table
+            cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY {qn(table)}.id')
+        cursor.execute(f'ALTER TABLE {qn(table)} ADD PRIMARY KEY (process_id, id)')
+        cursor.execute(f'CREATE TABLE {qn(default_partition_name())} PARTITION OF {qn(table)} DEFAULT')
+
+        log(f'Creating {len(process_ids)} partitions')
+        for process_id in process_ids:
+            cursor.execute(
+                f'CREATE TABLE {qn(partition_name(process_id))} PARTITION OF {qn(table)} '
+                f'FOR VALUES IN ({int(process_id)})'
+            )
+
+        log('Copying records')
+        cursor.execute(f'INSERT INTO {qn(table)} SELECT * FROM {qn(legacy)}')
+        cursor.execute(
+            f"SELECT setval('{sequence}'::regclass, COALESCE((SELECT MAX(id) FROM {qn(table)}), 0) + 1, false)"
+        )
+        cursor.execute(f'DROP TABLE {qn(legacy)}')
+
+        log('Recreating indexes and constraints')
+        for index_def in index_defs:
+            cursor.execute(index_def)
+        cursor.execute(f'CREATE INDEX {qn(table + "_id_idx")} ON {qn(table)} (id)')
+        for name, definition in constraints:
+            cursor.execute(f'ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(name)} {definition}')
+
+    return len(process_ids)
@@ -0,0 +1,256 @@
+"""
+Pre-flight scan of import files
+
+Row and column counts are read without parsing the file, so oversized files
+are rejected (or routed to the background import) in milliseconds instead of
+after a full pandas parse:
+- CSV: newlines are counted over a memory map of the file (bytes.count runs
+  in C over large windows) and the columns come from the header line, split
+  with the format detected by dialect.py. Line breaks inside quoted fields
+  make the row count an upper bound.
+- XLSX: the <dimension ref="A1:CV100001"/> element at the top of the
+  worksheet's XML gives both counts; only its first bytes are decompressed.
+- Compressed CSV (see decompress.py): lines are counted on the decompressed
+  stream, in one pass that also enforces the decompressed size limit.
+
+Unknown counts (.xls files, worksheets without a dimension) are None and are
+checked after parsing as before.
+"""
+import csv
+import logging
+import mmap
+import os
+import re
+import zipfile
+from contextlib import contextmanager
+from xml.etree import ElementTree
+from django.conf import settings
+from .dialect import detect_csv_format, SAMPLE_BYTES
+
+logger = logging.getLogger(__name__)
+
+COUNT_WINDOW = 16 * 1024 * 1024
+# The dimension element comes right after the worksheet's root element
+DIMENSION_SEARCH_BYTES = 64 * 1024
+
+DIMENSION_RE = re.compile(rb'<(?:\w+:)?dimension\s+ref="([A-Z]+)(\d+)(?::([A-Z]+)(\d+))?"')
+SPREADSHEET_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+RELATIONSHIP_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+
+
+class FileLimitError(ValueError):
+    """
+    A file exceeds the import row/column limits; the message is user-facing
+    """
+
+
+def _file_name(source):
+    return str(source if isinstance(source, (str, os.PathLike)) else getattr(source, 'name', '')).lower()
+
+
+@contextmanager
+def _mapped(source):
+    """
+    Bytes-like view of a path or an uploaded file: a memory map when the data
+    is on disk, the content itself for in-memory uploads
+    """
+    if not isinstance(source, (str, os.PathLike)) and hasattr(source, 'temporary_file_path'):
+        source = source.temporary_file_path()
+
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as fh:
+            if not os.fstat(fh.fileno()).st_size:
+                yield b''
+                return
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                yield mm
+        return
+
+    source.seek(0)
+    try:
+        yield source.read()
+    finally:
+        source.seek(0)
+
+
+def count_csv_lines(buffer):
+    """
+    Number of lines in a CSV buffer (a last line without newline counts)
+    """
+    lines = 0
+    for start in range(0, len(buffer), COUNT_WINDOW):
+        lines += buffer[start:start + COUNT_WINDOW].count(b'\n')
+    if len(buffer) and buffer[len(buffer) - 1:] != b'\n':
+        lines += 1
+    return lines
+
+
+def _csv_header_columns(buffer, csv_format):
+    lines = bytes(buffer[:SAMPLE_BYTES]).decode(csv_format['encoding'], errors='replace').splitlines()
+    header = lines[csv_format['skiprows']] if len(lines) > csv_format['skiprows'] else ''
+    row = next(csv.reader([header.lstrip('\ufeff')], delimiter=csv_format['sep'],
+                          quotechar=csv_format['quotechar']), [])
+    return len(row)
+
+
+def scan_csv(source):
+    with _mapped(source) as buffer:
+        if not len(buffer):
+            return {'rows': 0, 'columns': 0}
+        csv_format = detect_csv_format(bytes(buffer[:SAMPLE_BYTES]))
+        return {
+            # Header and preamble lines are not rows
+            'rows': max(count_csv_lines(buffer) - 1 - csv_format['skiprows'], 0),
+            'columns': _csv_header_columns(buffer, csv_format),
+        }
+
+
+def _column_index(letters):
+    index = 0
+    for letter in letters:
+        index = index * 26 + (ord(letter) - ord('A') + 1)
+    return index
+
+
+def worksheets(archive):
+    """
+    (name, path) of the worksheets of an open XLSX archive, in workbook order
+    """
+    workbook = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+    relationships = ElementTree.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+    targets = {}
+    for relationship in relationships:
+        target = relationship.get('Target').lstrip('/')
+        targets[relationship.get('Id')] = target if target.startswith('xl/') else f'xl/{target}'
+
+    return [
+        (sheet.get('name'), targets[sheet.get(f'{RELATIONSHIP_NS}id')])
+        for sheet in workbook.iter(f'{SPREADSHEET_NS}sheet')
+        if sheet.get(f'{RELATIONSHIP_NS}id') in targets
+    ]
+
+
+def worksheet_path(archive, sheet=None):
+    """
+    Path of a worksheet by name, or of the first one (pandas reads that one)
+    """
+    try:
+        sheets = worksheets(archive)
+    except (KeyError, AttributeError, ElementTree.ParseError):
+        sheets = []
+
+    if sheet is None:
+        return sheets[0][1] if sheets else 'xl/worksheets/sheet1.xml'
+    for name, path in sheets:
+        if name == sheet:
+            return path
+    raise KeyError(f'Planilha não encontrada: {sheet}')
+
+
+def scan_xlsx(source, sheet=None):
+    if not isinstance(source, (str, os.PathLike)) and hasattr(source, 'temporary_file_path'):
+        source = source.temporary_file_path()
+    if not isinstance(source, (str, os.PathLike)):
+        source.seek(0)
+
+    try:
+        with zipfile.ZipFile(source) as archive:
+            with archive.open(worksheet_path(archive, sheet)) as worksheet:
+                head = worksheet.read(DIMENSION_SEARCH_BYTES)
+    finally:
+        if not isinstance(source, (str, os.PathLike)):
+            source.seek(0)
+
+    match = DIMENSION_RE.search(head)
+    if not match:
+        return {'rows': None, 'columns': None}
+
+    first_col, first_row, last_col, last_row = match.groups()
+    last_col, last_row = last_col or first_col, last_row or first_row
+    return {
+        'rows': max(int(last_row) - int(first_row), 0),  # header row
+        'columns': _column_index(last_col.decode()) - _column_index(first_col.decode()) + 1,
+    }
+
+
+def scan_compressed(source, file_name):
+    """
+    Counts of a compressed CSV, from one streaming pass over the decompressed
+    bytes (which also enforces the decompressed size limit)
+    """
+    from .decompress import open_decompressed
+
+    with open_decompressed(source, file_name) as stream:
+        sample = stream.read(SAMPLE_BYTES)
+        if not sample:
+            return {'rows': 0, 'columns': 0}
+        csv_format = detect_csv_format(sample)
+        lines, last = sample.count(b'\n'), sample[-1:]
+        for block in iter(lambda: stream.read(COUNT_WINDOW), b''):
+            lines += block.count(b'\n')
+            last = block[-1:]
+
+    if last != b'\n':
+        lines += 1
+    return {
+        'rows': max(lines - 1 - csv_format['skiprows'], 0),
+        'columns': _csv_header_columns(sample, csv_format),
+    }
+
+
+def scan_file(source, file_name=None, sheet=None):
+    """
+    Estimate the data rows and columns of a CSV/XLSX file (a path or an
+    uploaded file) without parsing it. The format comes from `file_name`, or
+    from the source's name; XLSX files are scanned on `sheet` (default: the
+    first one). Counts are None when unknown.
+    """
+    from .decompress import is_compressed
+
+    # Uploads are scanned by validation, async dispatch and the import:
+    # the first scan is kept on the file (like its detected CSV format)
+    cached = getattr(source, 'preflight_scan', None)
+    if cached is not None and sheet is None:
+        return cached
+
+    file_name = (file_name or _file_name(source)).lower()
+    try:
+        if is_compressed(file_name):
+            scan = scan_compressed(source, file_name)
+        elif file_name.endswith('.csv'):
+            scan = scan_csv(source)
+        elif file_name.endswith('.xlsx'):
+            scan = scan_xlsx(source, sheet)
+        else:
+            return {'rows': None, 'columns': None}
+        if not isinstance(source, (str, os.PathLike)) and sheet is None:
+            source.preflight_scan = scan
+        return scan
+    except FileLimitError:
+        raise
+    except (OSError, ValueError, zipfile.BadZipFile, KeyError, EOFError) as e:
+        # Unreadable files are reported by the parser with a proper message
+        logger.warning(f"Pre-flight scan of {file_name} failed: {e}")
+    return {'rows': None, 'columns': None}
+
+
+def check_file_limits(scan, check_rows=True):
+    """
+    Raise FileLimitError when a scan (or parsed shape) exceeds the import
+    limits; background imports pass check_rows=False (columns only)
+    """
+    rows, columns = scan.get('rows'), scan.get('columns')
+    max_rows, max_columns = settings.IMPORT_SYNC_MAX_ROWS, settings.IMPORT_MAX_COLUMNS
+
+    if check_rows and rows is not None and rows > max_rows:
+        raise FileLimitError(
+            f'Arquivo contém {rows:,} linhas. '
+            f'Máximo permitido: {max_rows:,} linhas. '
+            f'Por favor, divida o arquivo em partes menores.'
+        )
+
+    if columns is not None and columns > max_columns:
+        raise FileLimitError(
+            f'Arquivo contém {columns} colunas. '
+            f'Máximo permitido: {max_columns} colunas.'
+        )
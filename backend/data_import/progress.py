@@ -0,0 +1,418 @@
+"""
+Progress reporting for asynchronous data_import tasks
+
+Pipeline stages (fetch, parse, infer, hash, insert...) publish fine-grained
+progress and throughput to a hot state kept in the cache (and in the Celery
+result backend via update_state). Writes to the AsyncTask row are throttled,
+so long imports don't issue a full save() per step, and TaskStatusView can
+answer polls from the cache without touching the database.
+"""
+import time
+import logging
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_CACHE_PREFIX = 'task_progress'
+
+TERMINAL_STATUSES = ('success', 'failed')
+
+# Relative weight of each stage in the overall progress percentage
+IMPORT_STAGES = {
+    'fetch': 10,
+    'parse': 15,
+    'infer': 10,
+    'hash': 25,
+    'insert': 40,
+}
+
+# Parallel imports only infer types before fanning out chunks
+PARALLEL_IMPORT_STAGES = {
+    'infer': 5,
+    'chunks': 95,
+}
+
+# Batch imports fan the sheets/files of one upload out to entry tasks
+BATCH_IMPORT_STAGES = {
+    'entries': 100,
+}
+
+EXPORT_STAGES = {
+    'export': 100,
+}
+
+RESTORE_STAGES = {
+    'restore': 100,
+}
+
+# Chunk tasks wait at most this long for the shared state lock
+STATE_LOCK_WAIT = 1.0
+
+
+def progress_cache_key(task_id):
+    return f'{PROGRESS_CACHE_PREFIX}:{task_id}'
+
+
+def get_task_state(task_id):
+    """
+    Return the hot progress state of a task from the cache (or None)
+    """
+    try:
+        return cache.get(progress_cache_key(task_id))
+    except Exception as e:
+        logger.warning(f"Could not read progress state for task {task_id}: {e}")
+        return None
+
+
+def set_task_state(task_id, state):
+    """
+    Store the hot progress state of a task in the cache
+    """
+    try:
+        cache.set(progress_cache_key(task_id), state, settings.TASK_PROGRESS_CACHE_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"Could not store progress state for task {task_id}: {e}")
+
+
+def _process_summary(process):
+    return {
+        'id': process.id,
+        'table_name': process.table_name,
+        'record_count': process.record_count,
+        'status': process.status,
+    }
+
+
+def state_from_async_task(async_task):
+    """
+    Build a progress state from an AsyncTask row (cache miss path)
+    """
+    state = {
+        'task_id': async_task.task_id,
+        'task_name': async_task.task_name,
+        'status': async_task.status,
+        'progress': async_task.progress,
+        'created_by_id': async_task.created_by_id,
+        'process_id': async_task.process_id,
+        'created_at': async_task.created_at.isoformat() if async_task.created_at else None,
+        'updated_at': async_task.updated_at.isoformat() if async_task.updated_at else None,
+        'version': 0,
+    }
+    if async_task.status == 'success':
+        state['result'] = async_task.result
+        state['completed_at'] = async_task.completed_at.isoformat() if async_task.completed_at else None
+    if async_task.status == 'failed':
+        state['error'] = async_task.error
+    if async_task.process_id:
+        state['process'] = _process_summary(async_task.process)
+    return state
+
+
+def load_task_state(task_id):
+    """
+    Return the progress state of a task, reading the cache first.
+
+    On a cache miss the AsyncTask row is loaded once and cached; finished tasks
+    are completed with their process summary the first time they are read.
+    Raises AsyncTask.DoesNotExist for unknown tasks.
+    """
+    from .models import AsyncTask
+
+    state = get_task_state(task_id)
+    if state is None:
+        async_task = AsyncTask.objects.select_related('process').get(task_id=task_id)
+        state = state_from_async_task(async_task)
+        set_task_state(task_id, state)
+    elif state['status'] in TERMINAL_STATUSES and 'process' not in state and state.get('process_id'):
+        from .models import DataImportProcess
+        process = DataImportProcess.objects.filter(id=state['process_id']).first()
+        if process:
+            state['process'] = _process_summary(process)
+            set_task_state(task_id, state)
+    return state
+
+
+def wait_for_task_state(task_id, since=None, timeout=0):
+    """
+    Long-poll helper: block up to `timeout` seconds until the state version of
+    the task moves past `since` (or the task finishes), then return the state
+    """
+    state = load_task_state(task_id)
+    if since is None or timeout <= 0:
+        return state
+
+    deadline = time.monotonic() + timeout
+    while (state.get('version', 0) <= since
+           and state['status'] not in TERMINAL_STATUSES
+           and time.monotonic() < deadline):
+        time.sleep(settings.TASK_PROGRESS_POLL_INTERVAL)
+        state = load_task_state(task_id)
+    return state
+
+
+class ProgressReporter:
+    """
+    Publishes the progress of one AsyncTask through the pipeline stages.
+
+    Usage:
+        progress = ProgressReporter(task_id, celery_task=self, stages=IMPORT_STAGES)
+        progress.start_stage('hash', total=len(data))
+        progress.advance(1000)
+        progress.finish(result)
+    """
+
+    def __init__(self, task_id, celery_task=None, stages=None, task_name=None,
+                 created_by_id=None, process_id=None, resume=False):
+        self.task_id = task_id
+        self.celery_task = celery_task
+        self.stages = stages or IMPORT_STAGES
+        self.stage = None
+        self.stage_total = 0
+        self.stage_done = 0
+        self.stage_started_at = None
+        self.bytes_read = 0
+        self.completed_weight = 0
+        self.version = 0
+        self.state = {
+            'task_id': task_id,
+            'task_name': task_name,
+            'status': 'started',
+            'progress': 0,
+            'created_by_id': created_by_id,
+            'process_id': process_id,
+            'stages': list(self.stages),
+        }
+        self._last_publish = 0.0
+        self._last_db_write = 0.0
+
+        # Versions never go backwards, also across Celery retries: long-poll and
+        # SSE clients wait for a version past the last one they saw
+        previous = get_task_state(task_id) or {}
+        self.version = previous.get('version', 0)
+
+        if resume:
+            # Continue the state published by another task (e.g. a chord callback)
+            self.state.update({
+                key: previous[key] for key in ('task_name', 'created_by_id', 'process_id', 'created_at')
+                if previous.get(key) is not None
+            })
+        else:
+            self._publish(force=True)
+
+    # Stage tracking
+
+    def start_stage(self, stage, total=0):
+        """
+        Begin a pipeline stage; `total` is the number of units (rows) expected
+        """
+        if self.stage and self.stage != stage:
+            self.completed_weight += self.stages.get(self.stage, 0)
+        self.stage = stage
+        self.stage_total = total or 0
+        self.stage_done = 0
+        self.stage_started_at = time.monotonic()
+        self._publish(force=True)
+
+    def advance(self, count=1, bytes_read=0):
+        """
+        Record `count` processed units (and optional bytes) in the current stage
+        """
+        self.stage_done += count
+        self.bytes_read += bytes_read
+        self._publish()
+
+    def set_total(self, total):
+        self.stage_total = total
+        self._publish()
+
+    def add_bytes(self, bytes_read):
+        self.bytes_read += bytes_read
+        self._publish()
+
+    def link_process(self, process_id):
+        self.state['process_id'] = process_id
+        self._publish(force=True)
+
+    # Terminal states
+
+    def finish(self, result=None):
+        """
+        Mark the task as successfully completed
+        """
+        self.state.update({
+            'status': 'success',
+            'progress': 100,
+            'result': result,
+            'completed_at': timezone.now().isoformat(),
+        })
+        self._store(db_fields={
+            'status': 'success',
+            'progress': 100,
+            'result': result,
+            'completed_at': timezone.now(),
+        })
+
+    def fail(self, error, retrying=False):
+        """
+        Mark the task as failed (or retrying)
+        """
+        status = 'retrying' if retrying else 'failed'
+        self.state.update({'status': status, 'error': str(error)})
+        self._store(db_fields={'status': status, 'error': str(error)})
+
+    # Publishing
+
+    def _overall_progress(self):
+        total_weight = sum(self.stages.values()) or 1
+        weight = self.completed_weight
+        if self.stage and self.stage_total:
+            fraction = min(self.stage_done / self.stage_total, 1.0)
+            weight += self.stages.get(self.stage, 0) * fraction
+        # 100 is reserved for the success state
+        return min(int(weight * 100 / total_weight), 99)
+
+    def _snapshot(self):
+        elapsed = time.monotonic() - self.stage_started_at if self.stage_started_at else 0
+        rows_per_sec = round(self.stage_done / elapsed, 1) if elapsed > 0 else 0
+        self.state.update({
+            'status': 'progress' if self.stage else 'started',
+            'progress': self._overall_progress(),
+            'stage': self.stage,
+            'stage_done': self.stage_done,
+            'stage_total': self.stage_total,
+            'rows_per_sec': rows_per_sec,
+            'bytes_read': self.bytes_read,
+        })
+
+    def _publish(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_publish < settings.TASK_PROGRESS_PUBLISH_INTERVAL:
+            return
+        self._last_publish = now
+        self._snapshot()
+
+        db_fields = None
+        if force or now - self._last_db_write >= settings.TASK_PROGRESS_DB_INTERVAL:
+            db_fields = {'status': self.state['status'], 'progress': self.state['progress']}
+            if self.state.get('process_id'):
+                db_fields['process_id'] = self.state['process_id']
+        self._store(db_fields=db_fields)
+
+    def _store(self, db_fields=None):
+        self.version += 1
+        self.state['version'] = self.version
+        self.state['updated_at'] = timezone.now().isoformat()
+        set_task_state(self.task_id, dict(self.state))
+
+        if self.celery_task is not None and not getattr(self.celery_task.request, 'is_eager', False):
+            try:
+                self.celery_task.update_state(
+                    task_id=self.task_id, state='PROGRESS', meta=self.state
+                )
+            except Exception as e:
+                logger.debug(f"Could not publish Celery state for task {self.task_id}: {e}")
+
+        if db_fields:
+            from .models import AsyncTask
+            self._last_db_write = time.monotonic()
+            AsyncTask.objects.filter(task_id=self.task_id).update(
+                updated_at=timezone.now(), **db_fields
+            )
+
+
+@contextmanager
+def _state_lock(task_id):
+    """
+    Best-effort cache lock around a read-modify-write of a task's shared state.
+    Gives up after STATE_LOCK_WAIT seconds; callers still guard on `version`.
+    """
+    key = f'{progress_cache_key(task_id)}:lock'
+    deadline = time.monotonic() + STATE_LOCK_WAIT
+    acquired = False
+    try:
+        while True:
+            acquired = cache.add(key, 1, 10)
+            if acquired or time.monotonic() >= deadline:
+                break
+            time.sleep(0.01)
+    except Exception as e:
+        logger.warning(f"Could not lock progress state for task {task_id}: {e}")
+
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            cache.delete(key)
+
+
+def report_chunk_done(task_id, rows, total_chunks, stage='chunks'):
+    """
+    Record a finished chunk of a parallel import (or entry of a batch import).
+    Chunk tasks run concurrently, so completed chunks/rows are kept in atomic
+    cache counters and the shared state is rebuilt from them; a state already
+    holding a newer version is never overwritten.
+    """
+    chunks_key = f'{progress_cache_key(task_id)}:chunks'
+    rows_key = f'{progress_cache_key(task_id)}:rows'
+    timeout = settings.TASK_PROGRESS_CACHE_TIMEOUT
+
+    try:
+        cache.add(chunks_key, 0, timeout)
+        cache.add(rows_key, 0, timeout)
+        chunks_done = cache.incr(chunks_key)
+        rows_done = cache.incr(rows_key, rows)
+    except Exception as e:
+        logger.warning(f"Could not update chunk progress for task {task_id}: {e}")
+        return
+
+    with _state_lock(task_id):
+        state = get_task_state(task_id) or {'task_id': task_id}
+        if state.get('status') in TERMINAL_STATUSES:
+            return
+
+        base_version = state.get('base_version', state.get('version', 0))
+        version = base_version + chunks_done
+        if state.get('version', 0) >= version:
+            # A chunk that finished later already published newer counters
+            return
+
+        state.update({
+            'status': 'progress',
+            'stage': stage,
+            'stage_done': chunks_done,
+            'stage_total': total_chunks,
+            'rows_done': rows_done,
+            # 100 is reserved for the success state
+            'progress': min(int(chunks_done * 100 / total_chunks), 99) if total_chunks else 0,
+            'base_version': base_version,
+            'version': version,
+            'updated_at': timezone.now().isoformat(),
+        })
+        set_task_state(task_id, state)
+
+
+class NullProgressReporter:
+    """
+    No-op reporter used when a pipeline runs outside of a tracked task
+    """
+
+    def start_stage(self, stage, total=0):
+        pass
+
+    def advance(self, count=1, bytes_read=0):
+        pass
+
+    def set_total(self, total):
+        pass
+
+    def add_bytes(self, bytes_read):
+        pass
+
+    def link_process(self, process_id):
+        pass
+
+
+NULL_PROGRESS = NullProgressReporter()
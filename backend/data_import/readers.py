@@ -0,0 +1,155 @@
+"""
+Lightweight readers for ImportedDataRecord payloads
+
+Read paths only need `record.data`, so these readers skip model
+instantiation entirely: they run the queryset SQL on a raw (server-side
+when available and not disabled with DISABLE_SERVER_SIDE_CURSORS) cursor,
+fetch the JSON text and decode it with orjson.
+Column projection is pushed into SQL with `data -> 'col'`.
+"""
+import json
+import orjson
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+from django.db.models import F, Func, TextField
+
+# Rows fetched per database round-trip
+RECORD_FETCH_SIZE = 5000
+
+
+class JSONKeyText(Func):
+    """
+    Raw JSON text of a top-level key of a JSON column (`data -> 'key'`).
+    Unlike Django's KeyTransform it is not decoded by the field, so strings
+    that look like numbers keep their type on SQLite as well.
+    """
+    output_field = TextField()
+
+    def __init__(self, key, field='data', **extra):
+        super().__init__(F(field), **extra)
+        self.key = key
+
+    def _json_path(self):
+        return '$.' + json.dumps(str(self.key))
+
+    def as_sql(self, compiler, connection, **extra_context):
+        lhs, params = compiler.compile(self.get_source_expressions()[0])
+        return f'JSON_EXTRACT({lhs}, %s)', (*params, self._json_path())
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        lhs, params = compiler.compile(self.get_source_expressions()[0])
+        return f'({lhs} -> %s)', (*params, self._json_path())
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        lhs, params = compiler.compile(self.get_source_expressions()[0])
+        return f'({lhs} -> %s)::text', (*params, str(self.key))
+
+
+def supports_sql_projection(connection):
+    """
+    Check if the backend supports the `->` JSON operator used for projection
+    (SQLite only has it since 3.38)
+    """
+    if connection.vendor == 'sqlite':
+        return connection.Database.sqlite_version_info >= (3, 38, 0)
+    return True
+
+
+def _iter_raw_rows(queryset, chunk_size):
+    """
+    Execute a values_list() queryset on a raw cursor and yield undecoded rows
+    """
+    connection = connections[queryset.db]
+    try:
+        sql, params = queryset.query.get_compiler(using=queryset.db).as_sql()
+    except EmptyResultSet:
+        return
+
+    # chunked_cursor() is a named server-side cursor on PostgreSQL. Django only
+    # honors DISABLE_SERVER_SIDE_CURSORS inside QuerySet.iterator(), so check
+    # it here too: named cursors don't survive PgBouncer transaction pooling
+    if connection.settings_dict.get('DISABLE_SERVER_SIDE_CURSORS'):
+        cursor_cm = connection.cursor()
+    else:
+        cursor_cm = connection.chunked_cursor()
+
+    with cursor_cm as cursor:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield from rows
+
+
+def _decode(raw):
+    if raw is None:
+        return None
+    if isinstance(raw, (bytes, str)):
+        return orjson.loads(raw)
+    # Some drivers already return decoded JSON
+    return raw
+
+
+def iter_record_data(queryset, columns=None, limit=None, chunk_size=RECORD_FETCH_SIZE):
+    """
+    Stream the `data` dicts of a records queryset.
+
+    Args:
+        queryset: ImportedDataRecord queryset (unsliced)
+        columns: Optional list of columns; only these keys are fetched from the
+            database and returned (missing keys come back as None)
+        limit: Optional maximum number of records
+        chunk_size: Rows fetched per database round-trip
+    """
+    if columns is not None and not supports_sql_projection(connections[queryset.db]):
+        for data in iter_record_data(queryset, limit=limit, chunk_size=chunk_size):
+            yield {col: data.get(col) for col in columns}
+        return
+
+    if columns is None:
+        rows_qs = queryset.values_list('data')
+    else:
+        annotations = {f'_col_{i}': JSONKeyText(col) for i, col in enumerate(columns)}
+        rows_qs = queryset.annotate(**annotations).values_list(*annotations)
+
+    if limit is not None:
+        rows_qs = rows_qs[:limit]
+
+    if columns is None:
+        for (raw,) in _iter_raw_rows(rows_qs, chunk_size):
+            yield _decode(raw)
+    else:
+        for row in _iter_raw_rows(rows_qs, chunk_size):
+            yield {col: _decode(raw) for col, raw in zip(columns, row)}
+
+
+def fetch_record_data(queryset, columns=None, limit=None):
+    """
+    Return the `data` dicts of a records queryset as a list
+    """
+    return list(iter_record_data(queryset, columns=columns, limit=limit))
+
+
+def iter_record_json(queryset, columns=None, limit=None, chunk_size=RECORD_FETCH_SIZE):
+    """
+    Stream each record payload as JSON bytes. Full payloads are passed through
+    as stored in the database without being decoded; projected payloads are
+    re-encoded with orjson.
+    """
+    if columns is not None:
+        for data in iter_record_data(queryset, columns=columns, limit=limit, chunk_size=chunk_size):
+            yield orjson.dumps(data)
+        return
+
+    rows_qs = queryset.values_list('data')
+    if limit is not None:
+        rows_qs = rows_qs[:limit]
+
+    for (raw,) in _iter_raw_rows(rows_qs, chunk_size):
+        if isinstance(raw, str):
+            yield raw.encode('utf-8')
+        elif isinstance(raw, bytes):
+            yield raw
+        else:
+            yield orjson.dumps(raw)
@@ -1,6 +1,14 @@
 from rest_framework import serializers
-from .models import DataImportProcess
+from django.conf import settings
+from .models import DataImportProcess, DatasetVersion
+from .preflight import scan_file, check_file_limits, FileLimitError
+from .dialect import detect_csv_format, read_sample_bytes, CSVFormatError, SAMPLE_BYTES
+from .decompress import (
+    COMPRESSED_EXTENSIONS, CompressedFileError, is_compressed, check_signature, open_decompressed
+)
+import json
 import os
+import re
 
 
 class DataImportRequestSerializer(serializers.Serializer):
@@ -26,13 +34,18 @@ class DataImportRequestSerializer(serializers.Serializer):
     file = serializers.FileField(
         required=False,
         allow_empty_file=False,
-        help_text='Arquivo Excel (.xlsx) ou CSV (.csv) para importar'
+        help_text='Arquivo Excel (.xlsx) ou CSV (.csv, também compactado: .csv.gz, .csv.bz2, .csv.zst, .zip)'
     )
     table_name = serializers.CharField(
         required=True,
         max_length=255,
         help_text='Nome da tabela a ser criada'
     )
+    delete_missing = serializers.BooleanField(
+        required=False,
+        default=False,
+        help_text='Em adições a datasets com colunas-chave, excluir os registros ausentes dos novos dados'
+    )
 
     def validate(self, data):
         """
@@ -66,9 +79,29 @@ class DataImportRequestSerializer(serializers.Serializer):
         MAX_FILE_SIZE = 50 * 1024 * 1024  # 50 MB
         if file.size > MAX_FILE_SIZE:
             raise serializers.ValidationError({
-                'file': f'Arquivo muito grande. Tamanho máximo: {MAX_FILE_SIZE // (1024*1024)}MB'
+                'file': f'Arquivo muito grande. Tamanho máximo: {MAX_FILE_SIZE // (1024*1024)}MB. '
+                        'Para arquivos maiores, use o upload em partes (/uploads/)'
             })
 
+        self._validate_file_content(file)
+        self._validate_file_shape(file)
+
+    @staticmethod
+    def _validate_file_shape(file):
+        """
+        Reject files with too many columns from the pre-flight scan, before
+        any parsing (rows are checked where the import runs)
+        """
+        try:
+            check_file_limits(scan_file(file), check_rows=False)
+        except FileLimitError as e:
+            raise serializers.ValidationError({'file': str(e)})
+
+    @staticmethod
+    def _validate_file_content(file):
+        """
+        Validate the name, extension and signature of a file (any size)
+        """
         # 2. Filename sanitization - prevent path traversal
         filename = os.path.basename(file.name)
         if '..' in filename or '/' in filename or '\\' in filename:
@@ -77,7 +110,7 @@ class DataImportRequestSerializer(serializers.Serializer):
             })
 
         # 3. Extension validation
-        allowed_extensions = ['.xlsx', '.xls', '.csv']
+        allowed_extensions = ['.xlsx', '.xls', '.csv', *COMPRESSED_EXTENSIONS]
         file_name_lower = filename.lower()
         if not any(file_name_lower.endswith(ext) for ext in allowed_extensions):
             raise serializers.ValidationError({
@@ -91,7 +124,9 @@ class DataImportRequestSerializer(serializers.Serializer):
 
         # Check for common file signatures
         is_valid = False
-        if file_name_lower.endswith('.xlsx'):
+        if is_compressed(file_name_lower):
+            is_valid = check_signature(file_header, file_name_lower)
+        elif file_name_lower.endswith('.xlsx'):
             # XLSX files start with PK (ZIP signature)
             is_valid = file_header[:2] == b'PK'
         elif file_name_lower.endswith('.xls'):
@@ -106,24 +141,23 @@ class DataImportRequestSerializer(serializers.Serializer):
                 'file': 'Arquivo não corresponde ao formato declarado na extensão'
             })
 
-        # 5. Additional content validation for CSV
-        if file_name_lower.endswith('.csv'):
-            file.seek(0)
+        # 5. Detect the CSV format (on the decompressed content of compressed
+        # files); the result is reused when the file is parsed
+        if file_name_lower.endswith('.csv') or is_compressed(file_name_lower):
             try:
-                # Try to read first line as CSV to validate format
-                import csv
-                first_chunk = file.read(8192).decode('utf-8', errors='ignore')
-                file.seek(0)
-
-                # Check if it looks like CSV
-                sniffer = csv.Sniffer()
-                try:
-                    sniffer.sniff(first_chunk)
-                except csv.Error:
-                    raise serializers.ValidationError({
-                        'file': 'Arquivo CSV inválido ou corrompido'
-                    })
-            except Exception as e:
+                if is_compressed(file_name_lower):
+                    with open_decompressed(file, filename) as stream:
+                        sample = stream.read(SAMPLE_BYTES)
+                else:
+                    sample = read_sample_bytes(file)
+                file.csv_format = detect_csv_format(sample)
+            except CompressedFileError as e:
+                raise serializers.ValidationError({'file': str(e)})
+            except CSVFormatError:
+                raise serializers.ValidationError({
+                    'file': 'Arquivo CSV inválido ou corrompido'
+                })
+            except Exception:
                 raise serializers.ValidationError({
                     'file': 'Não foi possível validar o arquivo CSV'
                 })
@@ -157,6 +191,215 @@ class DataImportRequestSerializer(serializers.Serializer):
         return cleaned_lower
 
 
+def validate_upload_file_name(value):
+    """
+    Validate the name of a resumable upload like the name of a regular upload
+    """
+    filename = os.path.basename(value)
+    if filename != value or '..' in filename or '\\' in filename:
+        raise serializers.ValidationError('Nome de arquivo inválido')
+
+    allowed_extensions = ['.xlsx', '.xls', '.csv', *COMPRESSED_EXTENSIONS]
+    if not any(filename.lower().endswith(ext) for ext in allowed_extensions):
+        raise serializers.ValidationError(
+            f'Formato de arquivo não suportado. Use: {", ".join(allowed_extensions)}'
+        )
+    return filename
+
+
+class ChunkedUploadCreateSerializer(serializers.Serializer):
+    """
+    Serializer for starting a resumable upload
+    """
+    file_name = serializers.CharField(
+        max_length=255,
+        validators=[validate_upload_file_name],
+        help_text='Nome do arquivo Excel (.xlsx) ou CSV (.csv)'
+    )
+    size = serializers.IntegerField(
+        min_value=1,
+        help_text='Tamanho total do arquivo em bytes'
+    )
+    checksum = serializers.CharField(
+        required=False,
+        allow_blank=True,
+        help_text='SHA-256 (hex) do arquivo completo, verificado na conclusão'
+    )
+
+    def validate_size(self, value):
+        if value > settings.UPLOAD_RESUMABLE_MAX_BYTES:
+            raise serializers.ValidationError(
+                f'Arquivo muito grande. Tamanho máximo: {settings.UPLOAD_RESUMABLE_MAX_BYTES // (1024*1024)}MB'
+            )
+        return value
+
+    def validate_checksum(self, value):
+        if value and not re.fullmatch(r'[0-9a-fA-F]{64}', value):
+            raise serializers.ValidationError('Checksum deve ser um SHA-256 em hexadecimal')
+        return value.lower()
+
+
+class ChunkedUploadCompleteSerializer(serializers.Serializer):
+    """
+    Serializer for completing a resumable upload: import into a new dataset
+    (table_name) or append to an existing one (process_id)
+    """
+    table_name = serializers.CharField(
+        required=False,
+        max_length=255,
+        help_text='Nome da tabela a ser criada'
+    )
+    process_id = serializers.IntegerField(
+        required=False,
+        help_text='ID do dataset ao qual os dados serão adicionados'
+    )
+    delete_missing = serializers.BooleanField(
+        required=False,
+        default=False,
+        help_text='Em adições a datasets com colunas-chave, excluir os registros ausentes dos novos dados'
+    )
+
+    def validate_table_name(self, value):
+        return DataImportRequestSerializer().validate_table_name(value)
+
+    def validate(self, data):
+        if bool(data.get('table_name')) == bool(data.get('process_id')):
+            raise serializers.ValidationError(
+                'Informe table_name (novo dataset) ou process_id (adicionar dados), não ambos'
+            )
+        return data
+
+
+class KeyColumnsSerializer(serializers.Serializer):
+    """
+    Serializer for declaring the key columns of a dataset (see merge.py)
+    """
+    columns = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        allow_empty=True,
+        help_text='Colunas que identificam um registro; lista vazia remove a chave'
+    )
+
+
+class BatchImportRequestSerializer(serializers.Serializer):
+    """
+    Serializer for batch imports of a workbook (one dataset per sheet) or a
+    zip of CSV/XLSX files (one dataset per file), see batch.py
+    """
+    file = serializers.FileField(
+        required=False,
+        allow_empty_file=False,
+        help_text='Planilha Excel (.xlsx) com várias abas ou arquivo .zip com arquivos CSV/XLSX'
+    )
+    upload_id = serializers.UUIDField(
+        required=False,
+        help_text='ID de um upload em partes já enviado por completo (em vez de file)'
+    )
+    mapping = serializers.JSONField(
+        required=False,
+        help_text='Destino de cada aba/arquivo: {"nome": "tabela" | {"process_id": id} | null}'
+    )
+    table_prefix = serializers.CharField(
+        required=False,
+        allow_blank=True,
+        default='',
+        max_length=100,
+        help_text='Prefixo dos nomes das tabelas criadas para entradas fora do mapeamento'
+    )
+
+    def validate_mapping(self, value):
+        # Multipart requests send the mapping as a JSON string
+        if isinstance(value, str):
+            try:
+                value = json.loads(value) if value.strip() else {}
+            except ValueError:
+                raise serializers.ValidationError('Mapeamento deve ser um objeto JSON')
+        if value is None:
+            return {}
+        if not isinstance(value, dict):
+            raise serializers.ValidationError('Mapeamento deve ser um objeto JSON')
+        return value
+
+    def validate_file(self, file):
+        MAX_FILE_SIZE = 50 * 1024 * 1024  # 50 MB, like single file imports
+        if file.size > MAX_FILE_SIZE:
+            raise serializers.ValidationError(
+                f'Arquivo muito grande. Tamanho máximo: {MAX_FILE_SIZE // (1024*1024)}MB. '
+                'Para arquivos maiores, use o upload em partes (/uploads/) e informe upload_id'
+            )
+
+        filename = os.path.basename(file.name)
+        if '..' in filename or '/' in filename or '\\' in filename:
+            raise serializers.ValidationError('Nome de arquivo inválido')
+        if not filename.lower().endswith(('.xlsx', '.zip')):
+            raise serializers.ValidationError('Formato de arquivo não suportado. Use: .xlsx, .zip')
+
+        # Both formats are zip archives
+        file.seek(0)
+        signature = file.read(2)
+        file.seek(0)
+        if signature != b'PK':
+            raise serializers.ValidationError('Arquivo não corresponde ao formato declarado na extensão')
+        return file
+
+    def validate(self, data):
+        if bool(data.get('file')) == bool(data.get('upload_id')):
+            raise serializers.ValidationError('Informe file ou upload_id, não ambos')
+        data['mapping'] = data.get('mapping') or {}
+        return data
+
+
+class DataExportRequestSerializer(serializers.Serializer):
+    """
+    Serializer for export job requests
+    Columns and filters are validated against the dataset column structure
+    """
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('xlsx', 'Excel (.xlsx)'),
+    ]
+
+    format = serializers.ChoiceField(
+        choices=FORMAT_CHOICES,
+        default='csv',
+        help_text='Formato do arquivo exportado: csv ou xlsx'
+    )
+    columns = serializers.ListField(
+        child=serializers.CharField(),
+        required=False,
+        allow_empty=True,
+        help_text='Colunas a exportar (padrão: todas)'
+    )
+    filters = serializers.DictField(
+        required=False,
+        help_text='Filtros de igualdade no formato {"coluna": valor}'
+    )
+
+    def validate(self, data):
+        """
+        Resolve columns and validate filters against the process columns
+        """
+        all_columns = list(self.context['process'].column_structure.keys())
+
+        requested = data.get('columns') or all_columns
+        columns = [col for col in requested if col in all_columns]
+        if not columns:
+            raise serializers.ValidationError({
+                'columns': 'Nenhuma coluna válida selecionada'
+            })
+
+        filters = data.get('filters') or {}
+        invalid = [col for col in filters if col not in all_columns]
+        if invalid:
+            raise serializers.ValidationError({
+                'filters': f'Colunas de filtro inválidas: {", ".join(invalid)}'
+            })
+
+        data['columns'] = columns
+        data['filters'] = filters
+        return data
+
+
 class DataImportProcessSerializer(serializers.ModelSerializer):
     """
     Serializer for DataImportProcess model
@@ -179,8 +422,9 @@ class DataImportProcessSerializer(serializers.ModelSerializer):
             'created_by_name',
             'created_at',
             'updated_at',
+            'archived_at',
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'created_at', 'updated_at', 'archived_at']
 
     def get_created_by_name(self, obj):
         """
@@ -189,3 +433,27 @@ class DataImportProcessSerializer(serializers.ModelSerializer):
         if obj.created_by:
             return obj.created_by.get_full_name() or obj.created_by.email
         return None
+
+
+class DatasetVersionSerializer(serializers.ModelSerializer):
+    """
+    Serializer for DatasetVersion model
+    """
+    kind_display = serializers.CharField(source='get_kind_display', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+
+    class Meta:
+        model = DatasetVersion
+        fields = [
+            'number',
+            'kind',
+            'kind_display',
+            'status',
+            'status_display',
+            'statistics',
+            'record_count',
+            'created_by',
+            'created_at',
+            'rolled_back_at',
+        ]
+        read_only_fields = fields
@@ -1,6 +1,7 @@
 import logging
 import requests
 import re
+import time
 import warnings
 import pandas as pd
 from datetime import datetime
@@ -8,6 +9,16 @@ from typing import Dict, List, Any, Tuple, Optional
 from django.core.files.uploadedfile import UploadedFile
 from django.db import connection, transaction
 from .models import DataImportProcess
+from .progress import NULL_PROGRESS
+from .hashing import iter_hashed_blocks
+from .preflight import scan_file, check_file_limits, FileLimitError
+from .dialect import read_csv
+from .arrow_csv import read_csv_records
+from .xlsx_reader import read_xlsx_records
+from .decompress import is_compressed, open_decompressed
+from .merge import key_columns, merge_records
+from .versions import start_version, finish_version
+from .partitioning import ensure_partition, drop_partition
 
 logger = logging.getLogger(__name__)
 
@@ -109,27 +120,13 @@ class DataImportService:
             file.seek(0)
 
             if file_name.endswith('.csv'):
-                # Try different encodings for CSV
-                try:
-                    df = pd.read_csv(file, encoding='utf-8')
-                except UnicodeDecodeError:
-                    file.seek(0)  # Reset file pointer
-                    try:
-                        df = pd.read_csv(file, encoding='latin-1')
-                    except UnicodeDecodeError:
-                        file.seek(0)
-                        df = pd.read_csv(file, encoding='cp1252')
+                # Encoding, delimiter and number format are detected on a sample
+                # (or reused from the upload validation) and parsed in one pass
+                df = read_csv(file, getattr(file, 'csv_format', None))
 
             elif file_name.endswith('.xlsx'):
-                # For .xlsx files, use openpyxl engine
-                try:
-                    df = pd.read_excel(file, engine='openpyxl')
-                except Exception as e:
-                    # If direct reading fails, try reading as BytesIO
-                    import io
-                    file.seek(0)
-                    file_content = file.read()
-                    df = pd.read_excel(io.BytesIO(file_content), engine='openpyxl')
+                # Rows are streamed from the worksheet (see xlsx_reader.py)
+                df = pd.DataFrame(read_xlsx_records(file))
 
             elif file_name.endswith('.xls'):
                 # For .xls files, use xlrd engine
@@ -158,14 +155,33 @@ class DataImportService:
             logger.error(error_details)
             raise Exception(f'Erro ao ler arquivo {file_name}: {str(e)}')
 
+    @staticmethod
+    def read_file_records(file: UploadedFile) -> List[Dict]:
+        """
+        Read an uploaded CSV or XLSX file into a list of row dicts
+        (see arrow_csv.py and xlsx_reader.py)
+        """
+        try:
+            if file.name.lower().endswith('.xlsx'):
+                return read_xlsx_records(file)
+            if is_compressed(file.name):
+                # Decompressed as a stream while parsing (see decompress.py)
+                with open_decompressed(file) as stream:
+                    return read_csv_records(stream, getattr(file, 'csv_format', None))
+            return read_csv_records(file, getattr(file, 'csv_format', None))
+        except Exception as e:
+            logger.error(f'Erro detalhado ao ler arquivo {file.name}:', exc_info=True)
+            raise Exception(f'Erro ao ler arquivo {file.name.lower()}: {str(e)}')
+
     @staticmethod
     def dataframe_to_dict_list(df: pd.DataFrame) -> List[Dict]:
         """
         Convert pandas DataFrame to list of dictionaries
         Handles NaN values and data type conversions
         """
-        # Replace NaN with None
-        df = df.where(pd.notna(df), None)
+        # Replace NaN with None (object dtype first: pandas 3 puts NaN back
+        # into float and string columns)
+        df = df.astype(object).where(pd.notna(df), None)
 
         # Convert to list of dictionaries
         data = df.to_dict('records')
@@ -173,84 +189,96 @@ class DataImportService:
         return data
 
     @staticmethod
-    def process_file_data(file: UploadedFile) -> Tuple[List[Dict], Dict]:
+    def process_file_data(file: UploadedFile, scan: Optional[Dict] = None) -> Tuple[List[Dict], Dict]:
         """
-        Process uploaded file and return data in the same format as endpoint data
+        Process uploaded file and return data in the same format as endpoint data.
+        `scan` is the pre-flight scan the caller already checked the limits on
+        (the file is scanned and checked here otherwise).
         Returns: (data, column_structure)
         """
-        # Resource limits to prevent abuse
-        MAX_ROWS = 100000  # Maximum 100k rows
-        MAX_COLUMNS = 100  # Maximum 100 columns
-
         try:
-            # Read file into DataFrame
-            df = DataImportService.read_file_to_dataframe(file)
+            if scan is None:
+                # Reject oversized files before parsing them (resource limits)
+                check_file_limits(scan_file(file))
+
+            if file.name.lower().endswith(('.csv', '.xlsx')) or is_compressed(file.name):
+                # CSV and XLSX rows come straight from the streaming readers
+                data = DataImportService.read_file_records(file)
+                row_count, col_count = len(data), len(data[0]) if data else 0
+            else:
+                # Read file into DataFrame
+                df = DataImportService.read_file_to_dataframe(file)
+                row_count, col_count = df.shape
+                # Convert DataFrame to list of dictionaries
+                data = DataImportService.dataframe_to_dict_list(df)
 
-            # Check if DataFrame is empty
-            if df.empty:
+            # Check if the file is empty
+            if not data:
                 raise ValueError('O arquivo está vazio ou não contém dados válidos')
 
-            # Validate resource limits
-            row_count, col_count = df.shape
-
-            if row_count > MAX_ROWS:
-                raise ValueError(
-                    f'Arquivo contém {row_count:,} linhas. '
-                    f'Máximo permitido: {MAX_ROWS:,} linhas. '
-                    f'Por favor, divida o arquivo em partes menores.'
-                )
-
-            if col_count > MAX_COLUMNS:
-                raise ValueError(
-                    f'Arquivo contém {col_count} colunas. '
-                    f'Máximo permitido: {MAX_COLUMNS} colunas.'
-                )
+            # Validate resource limits (counts the scan could not estimate)
+            check_file_limits({'rows': row_count, 'columns': col_count})
 
             # Log dataset size for monitoring
             logger.info(f"Processing file with {row_count:,} rows and {col_count} columns")
 
-            # Convert DataFrame to list of dictionaries
-            data = DataImportService.dataframe_to_dict_list(df)
-
             # Analyze column structure (same as endpoint)
             column_structure = DataImportService.analyze_column_structure(data)
 
             return data, column_structure
 
+        except FileLimitError:
+            raise
         except Exception as e:
             raise Exception(f'Erro ao processar arquivo: {str(e)}')
 
     @staticmethod
-    def process_file_data_from_path(file_path: str) -> Tuple[List[Dict], Dict]:
+    def process_file_data_from_path(file_path: str, progress=None, sheet: Optional[str] = None) -> Tuple[List[Dict], Dict]:
         """
         Process file from filesystem path (for use with Celery tasks)
+        XLSX files are read from `sheet` (default: the first worksheet)
         Returns: (data, column_structure)
         """
+        progress = progress or NULL_PROGRESS
         try:
             import os
             if not os.path.exists(file_path):
                 raise FileNotFoundError(f'Arquivo não encontrado: {file_path}')
 
+            # Background imports have no row limit, but the column limit still applies
+            # (compressed files are checked once parsed: scanning them means
+            # decompressing them one more time)
+            compressed = is_compressed(file_path)
+            if not compressed:
+                check_file_limits(scan_file(file_path, sheet=sheet), check_rows=False)
+
+            progress.start_stage('parse')
+            progress.add_bytes(os.path.getsize(file_path))
+
             # Determine file extension
             file_extension = os.path.splitext(file_path)[1].lower()
 
             # Read file based on extension
-            if file_extension in ['.xlsx', '.xls']:
-                df = pd.read_excel(file_path)
+            if compressed:
+                with open_decompressed(file_path) as stream:
+                    data = read_csv_records(stream)
+                check_file_limits({'columns': len(data[0]) if data else 0}, check_rows=False)
+            elif file_extension == '.xlsx':
+                data = read_xlsx_records(file_path, sheet=sheet)
+            elif file_extension == '.xls':
+                data = DataImportService.dataframe_to_dict_list(pd.read_excel(file_path))
             elif file_extension == '.csv':
-                df = pd.read_csv(file_path, encoding='utf-8')
+                data = read_csv_records(file_path)
             else:
                 raise ValueError(f'Formato de arquivo não suportado: {file_extension}')
 
-            # Check if DataFrame is empty
-            if df.empty:
+            # Check if the file is empty
+            if not data:
                 raise ValueError('O arquivo está vazio ou não contém dados válidos')
-
-            # Convert DataFrame to list of dictionaries
-            data = DataImportService.dataframe_to_dict_list(df)
+            progress.advance(len(data))
 
             # Analyze column structure
-            column_structure = DataImportService.analyze_column_structure(data)
+            column_structure = DataImportService.analyze_column_structure(data, progress=progress)
 
             return data, column_structure
 
@@ -258,12 +286,15 @@ class DataImportService:
             raise Exception(f'Erro ao processar arquivo: {str(e)}')
 
     @staticmethod
-    def fetch_data_from_endpoint(url: str) -> Tuple[List[Dict], Dict]:
+    def fetch_data_from_endpoint(url: str, progress=None) -> Tuple[List[Dict], Dict]:
         """
         Fetch data from external endpoint
         Returns: (data, column_structure)
         """
+        progress = progress or NULL_PROGRESS
         try:
+            progress.start_stage('fetch')
+
             # Add proper headers to avoid connection issues
             headers = {
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -287,6 +318,7 @@ class DataImportService:
                         verify=True  # SSL verification enabled
                     )
                     response.raise_for_status()
+                    progress.add_bytes(len(response.content))
                     data = response.json()
                     break  # Success, exit retry loop
 
@@ -309,6 +341,7 @@ class DataImportService:
                         verify=False  # Disable SSL verification
                     )
                     response.raise_for_status()
+                    progress.add_bytes(len(response.content))
                     data = response.json()
                     break
 
@@ -347,8 +380,9 @@ class DataImportService:
                     )
 
             logger.info(f"Processing endpoint data with {row_count:,} rows")
+            progress.advance(row_count)
 
-            column_structure = DataImportService.analyze_column_structure(data)
+            column_structure = DataImportService.analyze_column_structure(data, progress=progress)
 
             return data, column_structure
 
@@ -362,7 +396,7 @@ class DataImportService:
             raise Exception(f'Erro inesperado ao buscar dados: {str(e)}')
 
     @staticmethod
-    def analyze_column_structure(data: List[Dict]) -> Dict[str, str]:
+    def analyze_column_structure(data: List[Dict], progress=None) -> Dict[str, str]:
         """
         Analyze data structure and determine column types
         """
@@ -374,6 +408,9 @@ class DataImportService:
             if isinstance(item, dict):
                 all_keys.update(item.keys())
 
+        progress = progress or NULL_PROGRESS
+        progress.start_stage('infer', total=len(all_keys))
+
         column_structure = {}
 
         for key in all_keys:
@@ -385,6 +422,7 @@ class DataImportService:
                 'original_name': key,
                 'type': column_type
             }
+            progress.advance()
 
         return column_structure
 
@@ -399,9 +437,14 @@ class DataImportService:
         logger.info(f"Skipping dynamic table creation for {table_name} - using ORM model instead")
 
     @staticmethod
-    def insert_data_orm(process, data: List[Dict], column_structure: Dict[str, Dict]) -> Dict[str, int]:
+    def insert_data_orm(process, data: List[Dict], column_structure: Dict[str, Dict], progress=None,
+                        lookup_existing: bool = True, version: int = 1) -> Dict[str, int]:
         """
         Insert data using Django ORM with bulk operations for performance.
+        Records are stamped with the dataset `version` (see versions.py).
+        With lookup_existing=False the hashes already stored for the process are
+        not loaded and duplicates are only skipped by the unique constraint
+        (used by parallel import chunks, which don't count them here).
         Returns: dictionary with statistics {
             'inserted': number of records inserted,
             'duplicates': number of duplicates skipped,
@@ -411,6 +454,8 @@ class DataImportService:
         """
         from .models import ImportedDataRecord
 
+        progress = progress or NULL_PROGRESS
+
         if not data:
             logger.warning(f"insert_data_orm: data is empty!")
             return {'inserted': 0, 'duplicates': 0, 'errors': 0, 'total': 0}
@@ -442,67 +487,57 @@ class DataImportService:
         existing_hashes = set(
             ImportedDataRecord.objects.filter(process=process)
             .values_list('row_hash', flat=True)
-        )
+        ) if lookup_existing else set()
 
         records_to_create = []
         duplicates_skipped = 0
         errors = 0
         empty_normalized_data_count = 0
 
-        for idx, item in enumerate(data):
-            if not isinstance(item, dict):
-                errors += 1
-                logger.warning(f"[DEBUG] Record {idx} is not a dict, skipping")
-                continue
-
-            # Create normalized data dict with sanitized column names
-            normalized_data = {}
-            for original_name, value in item.items():
-                safe_name = name_mapping.get(original_name)
-                if safe_name:
-                    normalized_data[safe_name] = value
-
-            if not normalized_data:
-                errors += 1
-                empty_normalized_data_count += 1
-                if empty_normalized_data_count == 1:
-                    # Log first occurrence with details
-                    logger.error(f"[DEBUG] Record {idx} resulted in empty normalized_data!")
-                    logger.error(f"[DEBUG] Original keys: {list(item.keys())[:5]}")
-                    logger.error(f"[DEBUG] Available mappings: {list(name_mapping.keys())[:5]}")
-                continue
+        progress.start_stage('hash', total=len(data))
 
-            try:
-                # Generate hash for duplicate detection
-                row_hash = ImportedDataRecord.generate_row_hash(normalized_data)
+        # Normalization + hashing runs in blocks (in a process pool for large
+        # imports); this loop only does duplicate detection and model building
+        for block in iter_hashed_blocks(data, name_mapping):
+            errors += block['errors']
+
+            if block['not_dict'] is not None:
+                logger.warning(f"[DEBUG] Record {block['not_dict']} is not a dict, skipping")
+
+            if block['empty'] is not None and not empty_normalized_data_count:
+                # Log first occurrence with details
+                idx = block['empty']
+                logger.error(f"[DEBUG] Record {idx} resulted in empty normalized_data!")
+                logger.error(f"[DEBUG] Original keys: {list(data[idx].keys())[:5]}")
+                logger.error(f"[DEBUG] Available mappings: {list(name_mapping.keys())[:5]}")
+            empty_normalized_data_count += block['empty_count']
 
+            for row_hash, normalized_data in block['rows']:
                 # Check if duplicate
                 if row_hash in existing_hashes:
                     duplicates_skipped += 1
-                    logger.debug(f'Duplicate record skipped (hash: {row_hash})')
                     continue
 
                 # Prepare record for bulk insert
                 records_to_create.append(ImportedDataRecord(
                     process=process,
                     row_hash=row_hash,
-                    data=normalized_data
+                    data=normalized_data,
+                    version=version
                 ))
 
                 # Add to existing hashes to detect duplicates within the same batch
                 existing_hashes.add(row_hash)
 
-            except Exception as e:
-                errors += 1
-                logger.error(f'Error preparing record: {e}')
-                logger.error(f'Data: {normalized_data}')
-                continue
+            progress.advance(len(block['rows']) + block['errors'])
 
         # Bulk insert all records at once (1000 per batch)
         records_inserted = 0
         logger.info(f"[DEBUG] Prepared {len(records_to_create)} records for insertion")
         logger.info(f"[DEBUG] Errors so far: {errors}, Duplicates: {duplicates_skipped}")
 
+        progress.start_stage('insert', total=len(records_to_create))
+
         if records_to_create:
             try:
                 BATCH_SIZE = 1000
@@ -513,6 +548,7 @@ class DataImportService:
                         ignore_conflicts=True  # Ignore any duplicate key errors
                     )
                     records_inserted += len(batch)
+                    progress.advance(len(batch))
                     logger.info(f"[OK] Inserted batch {i // BATCH_SIZE + 1}: {len(batch)} records")
 
             except Exception as e:
@@ -537,6 +573,28 @@ class DataImportService:
             'total': total
         }
 
+    @staticmethod
+    def append_data(process, data: List[Dict], column_structure: Optional[Dict[str, Dict]] = None,
+                    delete_missing: bool = False, progress=None, version: int = 1) -> Dict[str, int]:
+        """
+        Append data to an existing dataset as `version` and update
+        process.record_count (the caller saves the process).
+
+        Datasets with key columns are merged by key (see merge.py); the others
+        only get the rows whose full-row hash is new. delete_missing only
+        applies to keyed datasets.
+        """
+        column_structure = process.column_structure or column_structure
+        if key_columns(column_structure):
+            stats = merge_records(process, data, column_structure, delete_missing, progress=progress, version=version)
+            process.record_count += stats['inserted'] - stats['deleted']
+        else:
+            stats = DataImportService.insert_data_orm(
+                process, data, column_structure, progress=progress, version=version
+            )
+            process.record_count += stats['inserted']
+        return stats
+
     @staticmethod
     def insert_data(table_name: str, data: List[Dict], column_structure: Dict[str, Dict], process=None) -> Dict[str, int]:
         """
@@ -554,7 +612,6 @@ class DataImportService:
         return DataImportService.insert_data_orm(process, data, column_structure)
 
     @staticmethod
-    @transaction.atomic
     def import_data(
         table_name: str,
         user=None,
@@ -566,6 +623,11 @@ class DataImportService:
         Main method to import data from an endpoint or file with transaction safety.
         If any step fails, all database changes are rolled back.
 
+        The process row and its record partition (see partitioning.py) are
+        created before the import transaction, so the partition DDL doesn't
+        hold its locks while the rows are inserted; a failed import removes
+        both again.
+
         Args:
             table_name: Name of the table to create
             user: User who initiated the import
@@ -573,13 +635,39 @@ class DataImportService:
             file: Uploaded file (for file import)
             import_type: Type of import ('endpoint' or 'file')
         """
-        # Create process record
+        scan = None
+        if import_type == 'file' and file:
+            # Oversized files are rejected before a process is created
+            scan = scan_file(file)
+            check_file_limits(scan)
+
+        # Create process record (inactive until its records are committed)
         process = DataImportProcess.objects.create(
             endpoint_url=endpoint_url or f'file:{file.name if file else "unknown"}',
             table_name=table_name,
-            status='active',
+            status='inactive',
             created_by=user
         )
+        ensure_partition(process.id)
+
+        try:
+            with transaction.atomic():
+                return DataImportService._import_into_process(
+                    process, user, endpoint_url, file, import_type, scan
+                )
+        except Exception:
+            drop_partition(process.id)
+            DataImportProcess.all_objects.filter(pk=process.pk).delete()
+            raise
+
+    @staticmethod
+    def _import_into_process(process, user, endpoint_url, file, import_type, scan=None) -> DataImportProcess:
+        """
+        Fetch the data of a new dataset and insert its records (runs inside
+        the transaction of import_data)
+        """
+        table_name = process.table_name
+        version = start_version(process, 'import', created_by_id=user.id if user else None)
 
         try:
             # Fetch data based on import type
@@ -590,7 +678,7 @@ class DataImportService:
             elif import_type == 'file':
                 if not file:
                     raise ValueError('Arquivo é obrigatório para importação via arquivo')
-                data, column_structure = DataImportService.process_file_data(file)
+                data, column_structure = DataImportService.process_file_data(file, scan=scan)
             else:
                 raise ValueError(f'Tipo de importação inválido: {import_type}')
 
@@ -599,7 +687,9 @@ class DataImportService:
             logger.info(f"Data contains {len(data)} records")
 
             # Use ORM-based insertion
-            insert_stats = DataImportService.insert_data_orm(process, data, column_structure)
+            insert_stats = DataImportService.insert_data_orm(
+                process, data, column_structure, version=version.number
+            )
 
             logger.info(f"Insert stats: {insert_stats}")
 
@@ -608,6 +698,7 @@ class DataImportService:
             process.record_count = insert_stats['inserted']
             process.column_structure = column_structure
             process.save()
+            finish_version(version, insert_stats, process.record_count)
 
             logger.info(f"Process updated with record_count={insert_stats['inserted']}")
 
@@ -622,4 +713,6 @@ class DataImportService:
             process.error_message = str(e)
             process.save()
 
+            if isinstance(e, FileLimitError):
+                raise
             raise Exception(f'Erro na importação: {str(e)}')
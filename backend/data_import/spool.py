@@ -0,0 +1,261 @@
+"""
+Upload spool shared between the web and Celery workers
+
+Uploads handed to background imports are stored once per content in
+IMPORT_SPOOL_DIR/blobs/<sha256><ext>; the SHA-256 is computed while the chunks
+are written, so identical uploads are deduplicated without a second pass.
+Each task gets a hard link IMPORT_SPOOL_DIR/tasks/<task_id>--<sha256><ext> to the blob:
+releasing a task removes its link, and the blob goes away with the last one.
+Uploads Django already wrote to a temporary file on the same filesystem are
+hard-linked into the spool instead of copied. Resumable uploads are received in
+IMPORT_SPOOL_DIR/uploads/<upload_id>.part and moved into the spool once complete.
+
+Links of tasks that never released them (crashed workers) and orphan blobs are
+removed by cleanup_spool() after IMPORT_SPOOL_TTL seconds.
+"""
+import errno
+import hashlib
+import logging
+import mmap
+import os
+import time
+import uuid
+from django.conf import settings
+from .decompress import compressed_extension
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def _spool_dir(*parts):
+    path = os.path.join(str(settings.IMPORT_SPOOL_DIR), *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _extension(file_name):
+    # Compressed CSVs keep both extensions ('.csv.gz')
+    return compressed_extension(file_name) or os.path.splitext(file_name)[1].lower()
+
+
+def is_spooled(path):
+    """
+    Check if a path is a task link inside the spool directory
+    """
+    if not path:
+        return False
+    tasks_dir = os.path.realpath(os.path.join(str(settings.IMPORT_SPOOL_DIR), 'tasks'))
+    return os.path.dirname(os.path.realpath(path)) == tasks_dir
+
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_part(uploaded_file, part_path):
+    """
+    Write an upload to `part_path`, hashing it on the fly. Uploads already on
+    disk (TemporaryUploadedFile) are hard-linked when possible.
+    """
+    temporary_path = getattr(uploaded_file, 'temporary_file_path', None)
+    if temporary_path:
+        try:
+            os.link(temporary_path(), part_path)
+            return _hash_file(part_path)
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+                raise
+            # Different filesystem: fall back to copying
+
+    digest = hashlib.sha256()
+    with open(part_path, 'wb') as fh:
+        for chunk in uploaded_file.chunks():
+            digest.update(chunk)
+            fh.write(chunk)
+    return digest.hexdigest()
+
+
+def spool_upload(uploaded_file, task_id=None):
+    """
+    Store an upload in the spool and return the path of the task's link to it
+    """
+    task_id = task_id or uuid.uuid4().hex
+    extension = _extension(uploaded_file.name)
+    blobs_dir = _spool_dir('blobs')
+
+    part_path = os.path.join(blobs_dir, f'.{uuid.uuid4().hex}.part')
+    try:
+        digest = _write_part(uploaded_file, part_path)
+        blob_path = os.path.join(blobs_dir, f'{digest}{extension}')
+
+        if os.path.exists(blob_path):
+            logger.info(f"Upload {uploaded_file.name} deduplicated onto spool blob {digest}")
+        else:
+            os.replace(part_path, blob_path)
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+
+    task_path = os.path.join(_spool_dir('tasks'), f'{task_id}--{digest}{extension}')
+    try:
+        os.link(blob_path, task_path)
+    except FileExistsError:
+        pass
+    except FileNotFoundError:
+        # Blob swept between the dedup check and the link: store it again
+        uploaded_file.seek(0)
+        return spool_upload(uploaded_file, task_id)
+    # Keep reused blobs out of the expiry sweep
+    os.utime(blob_path)
+    return task_path
+
+
+def upload_part_path(upload_id):
+    """
+    Path of the file a resumable upload is written to while it is in progress
+    """
+    return os.path.join(_spool_dir('uploads'), f'{upload_id}.part')
+
+
+def spool_file(path, file_name, task_id=None, digest=None):
+    """
+    Move a file already written next to the spool (e.g. a completed resumable
+    upload) into it and return the path of the task's link
+    """
+    task_id = task_id or uuid.uuid4().hex
+    digest = digest or _hash_file(path)
+    extension = _extension(file_name)
+    blob_path = os.path.join(_spool_dir('blobs'), f'{digest}{extension}')
+    task_path = os.path.join(_spool_dir('tasks'), f'{task_id}--{digest}{extension}')
+
+    try:
+        os.link(blob_path, task_path)
+    except FileNotFoundError:
+        os.replace(path, blob_path)
+        os.link(blob_path, task_path)
+    else:
+        logger.info(f"File {file_name} deduplicated onto spool blob {digest}")
+        os.remove(path)
+    # Keep reused blobs out of the expiry sweep
+    os.utime(blob_path)
+    return task_path
+
+
+def release_spool_file(path):
+    """
+    Remove a task's spool link, and its blob when no other task uses it
+    """
+    if not is_spooled(path):
+        return
+
+    blob_name = os.path.basename(path).split('--', 1)[-1]
+    blob_path = os.path.join(_spool_dir('blobs'), blob_name)
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        return
+
+    try:
+        if os.stat(blob_path).st_nlink == 1:
+            os.remove(blob_path)
+    except FileNotFoundError:
+        pass
+
+
+def cleanup_spool(ttl=None):
+    """
+    Remove task links older than `ttl` seconds and blobs no task links to.
+    Returns the number of files removed.
+    """
+    ttl = settings.IMPORT_SPOOL_TTL if ttl is None else ttl
+    cutoff = time.time() - ttl
+    removed = 0
+
+    for directory in ('tasks', 'blobs'):
+        for entry in os.scandir(_spool_dir(directory)):
+            try:
+                stat = entry.stat()
+                expired = stat.st_mtime < cutoff
+                if directory == 'blobs':
+                    # Orphan blobs (and abandoned .part files) only
+                    expired = expired and (stat.st_nlink == 1 or entry.name.endswith('.part'))
+                if expired:
+                    os.remove(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                continue
+
+    return removed
+
+
+class MappedRange:
+    """
+    Read-only file-like view over a byte range of a memory-mapped file,
+    optionally preceded by a prefix (e.g. a CSV header). Parsers pull the data
+    in small reads straight from the page cache instead of a full copy.
+    """
+
+    def __init__(self, path, start=0, end=None, prefix=b''):
+        self._fh = open(path, 'rb')
+        size = os.fstat(self._fh.fileno()).st_size
+        self._mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        self._prefix = prefix
+        self._pos = 0
+        self._start = start
+        self._end = size if end is None else min(end, size)
+        self._length = len(prefix) + max(self._end - start, 0)
+
+    def read(self, size=-1):
+        if size is None or size < 0 or self._pos + size > self._length:
+            size = self._length - self._pos
+        if size <= 0:
+            return b''
+
+        parts = []
+        pos = self._pos
+        if pos < len(self._prefix):
+            piece = self._prefix[pos:pos + size]
+            parts.append(piece)
+            pos += len(piece)
+            size -= len(piece)
+        if size > 0:
+            offset = self._start + pos - len(self._prefix)
+            parts.append(self._mm[offset:offset + size])
+            pos += size
+
+        self._pos = pos
+        return parts[0] if len(parts) == 1 else b''.join(parts)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        base = {os.SEEK_SET: 0, os.SEEK_CUR: self._pos, os.SEEK_END: self._length}[whence]
+        self._pos = min(max(base + offset, 0), self._length)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def close(self):
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+        self._fh.close()
+
+    @property
+    def closed(self):
+        return self._fh.closed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -1,12 +1,26 @@
 """
 Celery tasks for asynchronous data import processing
 """
-from celery import shared_task
+from celery import shared_task, chord, group
 from django.utils import timezone
+from core.db_routing import pin_to_primary
 from .services import DataImportService
 from .models import DataImportProcess, AsyncTask
 from .cache import invalidate_process_caches
+from .progress import (
+    ProgressReporter, IMPORT_STAGES, EXPORT_STAGES, PARALLEL_IMPORT_STAGES, BATCH_IMPORT_STAGES, RESTORE_STAGES,
+    report_chunk_done
+)
+from .spool import release_spool_file, cleanup_spool
+from .uploads import expire_stale_uploads
+from .chunking import should_import_in_parallel, plan_chunks, read_chunk, read_sample, sample_dtypes
+from .batch import read_batch_entry
+from .versions import start_version, finish_version, get_version
+from .deletion import purge_process, purge_records
+from .partitioning import ensure_partition
+from .archive import archival_available, archive_process, restore_process, stale_datasets
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
@@ -23,11 +37,16 @@ def process_data_import_async(self, table_name, user_id, endpoint_url=None, file
         file_path: Path to uploaded file (for file imports)
         import_type: 'endpoint' or 'file'
 
+    Large files (settings.IMPORT_PARALLEL_MIN_BYTES) are split into chunks
+    imported by a chord of import_chunk_async tasks; this task then only
+    dispatches them and finalize_parallel_import completes the AsyncTask.
+
     Returns:
         dict: Import result with process ID and statistics
     """
     task_id = self.request.id
-    async_task = None
+    progress = None
+    parallel = import_type == 'file' and bool(file_path) and should_import_in_parallel(file_path)
 
     try:
         logger.info(f"Starting async import for table: {table_name}")
@@ -36,12 +55,14 @@ def process_data_import_async(self, table_name, user_id, endpoint_url=None, file
         User = get_user_model()
         user = User.objects.get(id=user_id)
 
-        # Create AsyncTask record for tracking
-        async_task = AsyncTask.objects.create(
+        # Create AsyncTask record for tracking (reused across retries)
+        AsyncTask.objects.update_or_create(
             task_id=task_id,
-            task_name='Data Import',
-            status='started',
-            created_by=user
+            defaults={'task_name': 'Data Import', 'status': 'started', 'created_by': user}
+        )
+        progress = ProgressReporter(
+            task_id, celery_task=self, stages=PARALLEL_IMPORT_STAGES if parallel else IMPORT_STAGES,
+            task_name='Data Import', created_by_id=user.id
         )
 
         # Create or get process
@@ -54,47 +75,49 @@ def process_data_import_async(self, table_name, user_id, endpoint_url=None, file
             }
         )
 
+        progress.link_process(process.id)
+        if created:
+            ensure_partition(process.id)
+        version = start_version(process, 'import', created_by_id=user.id, task_id=task_id)
+
+        if parallel:
+            return _dispatch_parallel_import(self, process, file_path, progress, version.number)
+
         if import_type == 'endpoint' and endpoint_url:
             # Fetch data from endpoint
-            data, column_structure = DataImportService.fetch_data_from_endpoint(endpoint_url)
+            data, column_structure = DataImportService.fetch_data_from_endpoint(endpoint_url, progress=progress)
             process.endpoint_url = endpoint_url
         elif import_type == 'file' and file_path:
             # Read data from file
-            import pandas as pd
-            data, column_structure = DataImportService.process_file_data_from_path(file_path)
+            data, column_structure = DataImportService.process_file_data_from_path(file_path, progress=progress)
         else:
             raise ValueError('Invalid import type or missing data source')
 
         # Update column structure
         process.column_structure = column_structure
-        process.save()
+        process.save(update_fields=['endpoint_url', 'column_structure', 'updated_at'])
 
         # Insert data using ORM
         insert_stats = DataImportService.insert_data_orm(
             process,
             data,
-            column_structure
+            column_structure,
+            progress=progress,
+            version=version.number
         )
 
-        # Update AsyncTask with process link
-        async_task.process = process
-        async_task.progress = 50
-        async_task.save()
-
         # Update process with record count
         process.record_count = insert_stats['inserted']
         process.error_message = None
-        process.save()
+        process.save(update_fields=['record_count', 'error_message', 'updated_at'])
+        finish_version(version, insert_stats, process.record_count)
 
         # Invalidate related caches
         invalidate_process_caches(process.id)
 
         # Mark task as success
-        async_task.status = 'success'
-        async_task.progress = 100
-        async_task.result = insert_stats
-        async_task.completed_at = timezone.now()
-        async_task.save()
+        progress.finish(insert_stats)
+        release_spool_file(file_path)
 
         logger.info(f"Async import completed for {table_name}: {insert_stats}")
 
@@ -110,25 +133,345 @@ def process_data_import_async(self, table_name, user_id, endpoint_url=None, file
         logger.error(f"Error in async import for {table_name}: {str(e)}", exc_info=True)
 
         # Update AsyncTask with error
-        if async_task:
-            async_task.status = 'failed' if self.request.retries >= self.max_retries else 'retrying'
-            async_task.error = str(e)
-            async_task.save()
+        if progress:
+            progress.fail(e, retrying=self.request.retries < self.max_retries)
 
         # Update process with error
-        try:
-            process = DataImportProcess.objects.get(table_name=table_name)
-            process.error_message = str(e)
-            process.save()
-        except:
-            pass
+        DataImportProcess.objects.filter(table_name=table_name).update(error_message=str(e))
+
+        if self.request.retries >= self.max_retries:
+            release_spool_file(file_path)
 
         # Retry with exponential backoff
         raise self.retry(exc=e, countdown=60 * (2 ** self.request.retries))
 
 
+def _dispatch_parallel_import(task, process, file_path, progress, version=1):
+    """
+    Infer the column structure on a sample of the file and fan the chunks out
+    to a chord (import_chunk_async tasks -> finalize_parallel_import)
+    """
+    from .models import ImportedDataRecord
+
+    task_id = task.request.id
+
+    sample_df = read_sample(file_path)
+    # Every chunk is read with the dtypes of the sample, so a column keeps one
+    # type (and one hash per value) across chunks
+    dtypes = sample_dtypes(sample_df)
+    sample = DataImportService.dataframe_to_dict_list(sample_df)
+    column_structure = DataImportService.analyze_column_structure(sample, progress=progress)
+    process.column_structure = column_structure
+    process.save(update_fields=['column_structure', 'updated_at'])
+
+    chunks = plan_chunks(file_path)
+    records_before = ImportedDataRecord.objects.filter(process=process).count()
+    progress.start_stage('chunks', total=len(chunks))
+
+    header = group(
+        import_chunk_async.s(
+            process.id, file_path, chunk, column_structure, task_id, len(chunks), version=version, dtypes=dtypes
+        )
+        for chunk in chunks
+    )
+    callback = finalize_parallel_import.s(process.id, task_id, records_before, file_path, version=version).on_error(
+        fail_parallel_import.si(task_id, process.id, file_path, version=version)
+    )
+
+    if task.request.is_eager:
+        # Eager mode (tests, CELERY_TASK_ALWAYS_EAGER) runs the chord inline
+        chord(header, callback).apply()
+    else:
+        chord(header)(callback)
+
+    logger.info(f"Parallel import for {process.table_name} dispatched in {len(chunks)} chunks")
+
+    return {
+        'success': True,
+        'parallel': True,
+        'process_id': process.id,
+        'task_id': task_id,
+        'table_name': process.table_name,
+        'chunks': len(chunks),
+    }
+
+
+@shared_task(bind=True, max_retries=3)
+def import_chunk_async(self, process_id, file_path, chunk, column_structure, parent_task_id, total_chunks,
+                       version=1, dtypes=None):
+    """
+    Parse, hash and insert one chunk of a parallel import
+
+    Args:
+        process_id: ID of the DataImportProcess
+        file_path: Path to the uploaded file (shared with the other workers)
+        chunk: Chunk spec from chunking.plan_chunks()
+        column_structure: Column structure inferred by the dispatcher
+        parent_task_id: Task id of the import whose progress is reported
+        total_chunks: Number of chunks of the import
+        version: Dataset version stamped on the records
+        dtypes: Column dtypes inferred on the sample (chunking.sample_dtypes)
+
+    Returns:
+        dict: Chunk statistics
+    """
+    try:
+        process = DataImportProcess.objects.get(id=process_id)
+        data = DataImportService.dataframe_to_dict_list(read_chunk(file_path, chunk, dtypes))
+
+        # Duplicates are resolved by the (process, row_hash) unique constraint;
+        # finalize_parallel_import counts them from the final record count
+        stats = DataImportService.insert_data_orm(
+            process, data, column_structure, lookup_existing=False, version=version
+        )
+        report_chunk_done(parent_task_id, stats['total'], total_chunks)
+        return stats
+
+    except Exception as e:
+        logger.error(f"Error importing chunk {chunk} of process {process_id}: {str(e)}", exc_info=True)
+        raise self.retry(exc=e, countdown=10 * (2 ** self.request.retries))
+
+
+@shared_task(bind=True)
+def finalize_parallel_import(self, chunk_results, process_id, parent_task_id, records_before=0, file_path=None,
+                             version=1):
+    """
+    Chord callback of a parallel import: merge chunk statistics, update the
+    record count, invalidate caches and complete the AsyncTask
+    """
+    from .models import ImportedDataRecord
+
+    process = DataImportProcess.objects.get(id=process_id)
+    record_count = ImportedDataRecord.objects.filter(process=process).count()
+
+    total = sum(result['total'] for result in chunk_results)
+    errors = sum(result['errors'] for result in chunk_results)
+    inserted = record_count - records_before
+    insert_stats = {
+        'inserted': inserted,
+        'duplicates': max(total - errors - inserted, 0),
+        'errors': errors,
+        'total': total,
+        'chunks': len(chunk_results),
+    }
+
+    process.record_count = record_count
+    process.error_message = None
+    process.save(update_fields=['record_count', 'error_message', 'updated_at'])
+    finish_version(get_version(process, version), insert_stats, record_count)
+
+    invalidate_process_caches(process.id)
+    ProgressReporter(parent_task_id, celery_task=self, resume=True).finish(insert_stats)
+    release_spool_file(file_path)
+
+    logger.info(f"Parallel import completed for {process.table_name}: {insert_stats}")
+
+    return {
+        'success': True,
+        'process_id': process.id,
+        'task_id': parent_task_id,
+        'table_name': process.table_name,
+        'statistics': insert_stats
+    }
+
+
+@shared_task
+def fail_parallel_import(parent_task_id, process_id, file_path=None, version=None):
+    """
+    Error callback of a parallel import chord: a chunk failed after all its
+    retries. The records the other chunks inserted for this version are
+    deleted, so the dataset is never left partly imported.
+    """
+    from .models import ImportedDataRecord, DatasetVersion
+
+    error = 'Falha ao importar um dos blocos do arquivo'
+    ProgressReporter(parent_task_id, resume=True).fail(error)
+
+    if version is not None:
+        deleted = purge_records(process_id, version=version)
+        DatasetVersion.objects.filter(process_id=process_id, number=version).update(
+            status='rolled_back', rolled_back_at=timezone.now()
+        )
+        logger.info(f"Parallel import of process {process_id} failed, {deleted} records of version {version} removed")
+
+    record_count = ImportedDataRecord.objects.filter(process_id=process_id).count()
+    updates = {'error_message': error, 'record_count': record_count, 'updated_at': timezone.now()}
+    if not record_count:
+        # A new dataset without any record is marked as failed
+        updates['status'] = 'inactive'
+    DataImportProcess.objects.filter(id=process_id).update(**updates)
+    invalidate_process_caches(process_id)
+    release_spool_file(file_path)
+
+
+@shared_task(bind=True, max_retries=3)
+def process_batch_import_async(self, file_path, user_id, plan):
+    """
+    Import the sheets/files of a workbook or zip bundle (see batch.py)
+
+    Args:
+        file_path: Path to the spooled batch file
+        user_id: ID of the user who initiated the import
+        plan: Entries and their targets from batch.plan_batch()
+
+    The entries are fanned out to a chord of import_batch_entry_async tasks;
+    finalize_batch_import merges their results and completes the AsyncTask.
+
+    Returns:
+        dict: Dispatch information
+    """
+    task_id = self.request.id
+    progress = None
+
+    try:
+        logger.info(f"Starting batch import of {len(plan)} entries")
+
+        AsyncTask.objects.update_or_create(
+            task_id=task_id,
+            defaults={'task_name': 'Batch Import', 'status': 'started', 'created_by_id': user_id}
+        )
+        progress = ProgressReporter(
+            task_id, celery_task=self, stages=BATCH_IMPORT_STAGES,
+            task_name='Batch Import', created_by_id=user_id
+        )
+        progress.start_stage('entries', total=len(plan))
+
+        header = group(
+            import_batch_entry_async.s(file_path, target, user_id, task_id, len(plan))
+            for target in plan
+        )
+        callback = finalize_batch_import.s(task_id, file_path).on_error(
+            fail_batch_import.si(task_id, file_path)
+        )
+
+        if self.request.is_eager:
+            # Eager mode (tests, CELERY_TASK_ALWAYS_EAGER) runs the chord inline
+            chord(header, callback).apply()
+        else:
+            chord(header)(callback)
+
+        logger.info(f"Batch import dispatched in {len(plan)} entries (task {task_id})")
+        return {'success': True, 'batch': True, 'task_id': task_id, 'entries': len(plan)}
+
+    except Exception as e:
+        logger.error(f"Error in batch import {task_id}: {str(e)}", exc_info=True)
+        if progress:
+            progress.fail(e, retrying=self.request.retries < self.max_retries)
+        if self.request.retries >= self.max_retries:
+            release_spool_file(file_path)
+        raise self.retry(exc=e, countdown=60 * (2 ** self.request.retries))
+
+
+@shared_task
+def import_batch_entry_async(file_path, target, user_id, parent_task_id, total_entries):
+    """
+    Import one sheet/file of a batch into a new dataset (target['table_name'])
+    or append it to an existing one (target['process_id'])
+
+    Failures are returned in the entry result instead of raised, so one bad
+    sheet doesn't stop the rest of the batch.
+
+    Returns:
+        dict: Entry result with process and statistics, or the error
+    """
+    entry = target['entry']
+    process = None
+    rows = 0
+
+    try:
+        data, column_structure = read_batch_entry(file_path, entry)
+        rows = len(data)
+
+        created = False
+        if target.get('process_id'):
+            process = DataImportProcess.objects.get(id=target['process_id'])
+        else:
+            process, created = DataImportProcess.objects.get_or_create(
+                table_name=target['table_name'],
+                defaults={
+                    'endpoint_url': '',
+                    'created_by_id': user_id,
+                    'status': 'active',
+                    'column_structure': column_structure,
+                }
+            )
+            if created:
+                ensure_partition(process.id)
+
+        version = start_version(
+            process, 'import' if created else 'append', created_by_id=user_id, task_id=parent_task_id
+        )
+        insert_stats = DataImportService.append_data(
+            process, data, column_structure, delete_missing=target.get('delete_missing', False),
+            version=version.number
+        )
+
+        process.error_message = None
+        process.save(update_fields=['record_count', 'error_message', 'updated_at'])
+        finish_version(version, insert_stats, process.record_count)
+        invalidate_process_caches(process.id)
+
+        result = {
+            'entry': entry,
+            'process_id': process.id,
+            'table_name': process.table_name,
+            'statistics': insert_stats,
+        }
+
+    except Exception as e:
+        logger.error(f"Error importing batch entry {entry}: {str(e)}", exc_info=True)
+        if process is not None:
+            DataImportProcess.objects.filter(id=process.id).update(error_message=str(e))
+        result = {'entry': entry, 'error': str(e)}
+
+    report_chunk_done(parent_task_id, rows, total_entries, stage='entries')
+    return result
+
+
+@shared_task(bind=True)
+def finalize_batch_import(self, entry_results, parent_task_id, file_path=None):
+    """
+    Chord callback of a batch import: merge the entry results and complete
+    the AsyncTask (failed when no entry could be imported)
+    """
+    imported = [result for result in entry_results if 'error' not in result]
+    failed = [result for result in entry_results if 'error' in result]
+
+    progress = ProgressReporter(parent_task_id, celery_task=self, resume=True)
+    if imported:
+        totals = {
+            key: sum(result['statistics'][key] for result in imported)
+            for key in ('inserted', 'duplicates', 'errors', 'total')
+        }
+        progress.finish({
+            **totals,
+            'entries': len(entry_results),
+            'imported_entries': len(imported),
+            'failed_entries': len(failed),
+            'results': entry_results,
+        })
+    else:
+        progress.fail('Nenhuma entrada do lote pôde ser importada: ' + '; '.join(
+            f"{result['entry']}: {result['error']}" for result in failed
+        ))
+    release_spool_file(file_path)
+
+    logger.info(f"Batch import {parent_task_id} completed: {len(imported)} imported, {len(failed)} failed")
+    return {'success': bool(imported), 'task_id': parent_task_id, 'results': entry_results}
+
+
+@shared_task
+def fail_batch_import(parent_task_id, file_path=None):
+    """
+    Error callback of a batch import chord
+    """
+    ProgressReporter(parent_task_id, resume=True).fail('Falha ao importar o lote de arquivos')
+    release_spool_file(file_path)
+
+
 @shared_task(bind=True)
-def append_data_async(self, process_id, file_path=None, endpoint_url=None, import_type='file'):
+def append_data_async(self, process_id, file_path=None, endpoint_url=None, import_type='file', user_id=None,
+                      delete_missing=False):
     """
     Asynchronously append data to existing dataset
 
@@ -137,32 +480,54 @@ def append_data_async(self, process_id, file_path=None, endpoint_url=None, impor
         file_path: Path to uploaded file
         endpoint_url: URL to fetch data from
         import_type: 'endpoint' or 'file'
+        user_id: ID of the user who initiated the append
+        delete_missing: Soft-delete records missing from the data (keyed datasets)
 
     Returns:
         dict: Append result with statistics
     """
+    task_id = self.request.id
+    progress = None
+
     try:
         logger.info(f"Starting async append for process: {process_id}")
 
         process = DataImportProcess.objects.get(id=process_id)
 
+        AsyncTask.objects.update_or_create(
+            task_id=task_id,
+            defaults={
+                'task_name': 'Data Append',
+                'status': 'started',
+                'process': process,
+                'created_by_id': user_id or process.created_by_id,
+            }
+        )
+        progress = ProgressReporter(
+            task_id, celery_task=self, stages=IMPORT_STAGES, task_name='Data Append',
+            created_by_id=user_id or process.created_by_id, process_id=process.id
+        )
+
         if import_type == 'endpoint' and endpoint_url:
-            data, column_structure = DataImportService.fetch_data_from_endpoint(endpoint_url)
+            data, column_structure = DataImportService.fetch_data_from_endpoint(endpoint_url, progress=progress)
         elif import_type == 'file' and file_path:
-            data, column_structure = DataImportService.process_file_data_from_path(file_path)
+            data, column_structure = DataImportService.process_file_data_from_path(file_path, progress=progress)
         else:
             raise ValueError('Invalid import type or missing data source')
 
-        # Insert new data
-        insert_stats = DataImportService.insert_data_orm(
-            process,
-            data,
-            process.column_structure
+        # Insert new data (merged by key on keyed datasets) and update record count
+        version = start_version(
+            process, 'append', created_by_id=user_id or process.created_by_id, task_id=task_id
+        )
+        insert_stats = DataImportService.append_data(
+            process, data, delete_missing=delete_missing, progress=progress, version=version.number
         )
+        process.save(update_fields=['record_count', 'updated_at'])
+        finish_version(version, insert_stats, process.record_count)
 
-        # Update record count
-        process.record_count += insert_stats['inserted']
-        process.save()
+        invalidate_process_caches(process.id)
+        progress.finish(insert_stats)
+        release_spool_file(file_path)
 
         logger.info(f"Async append completed for process {process_id}: {insert_stats}")
 
@@ -174,4 +539,217 @@ def append_data_async(self, process_id, file_path=None, endpoint_url=None, impor
 
     except Exception as e:
         logger.error(f"Error in async append for process {process_id}: {str(e)}", exc_info=True)
+        if progress:
+            progress.fail(e, retrying=self.request.retries < self.max_retries)
+        if self.request.retries >= self.max_retries:
+            release_spool_file(file_path)
+        raise self.retry(exc=e, countdown=60 * (2 ** self.request.retries))
+
+
+@shared_task(bind=True)
+def export_data_async(self, process_id, file_format, columns, filters=None, export_key=None):
+    """
+    Asynchronously materialize a dataset export into an artifact on disk
+
+    Args:
+        process_id: ID of the DataImportProcess
+        file_format: 'csv' or 'xlsx'
+        columns: List of columns to export (in order)
+        filters: Optional dict of {column: value} equality filters
+        export_key: Deterministic key shared by identical export requests
+
+    Returns:
+        dict: Export result with artifact information
+    """
+    from .exports import export_artifact_path, write_export_artifact
+
+    task_id = self.request.id
+    progress = None
+
+    try:
+        logger.info(f"Starting async export for process {process_id} ({file_format})")
+
+        process = DataImportProcess.objects.get(id=process_id)
+        requested_by_id = (
+            AsyncTask.objects.filter(task_id=task_id).values_list('created_by_id', flat=True).first()
+        )
+        AsyncTask.objects.filter(task_id=task_id).update(error=None)
+        progress = ProgressReporter(
+            task_id, celery_task=self, stages=EXPORT_STAGES, task_name='Data Export',
+            created_by_id=requested_by_id, process_id=process.id
+        )
+        progress.start_stage('export', total=process.record_count)
+
+        def report_progress(done, total):
+            progress.set_total(total)
+            progress.advance(done - progress.stage_done)
+
+        path = export_artifact_path(export_key, file_format)
+        rows = write_export_artifact(process, file_format, columns, filters, path, report_progress)
+
+        result = {
+            'process_id': process.id,
+            'table_name': process.table_name,
+            'format': file_format,
+            'columns': columns,
+            'filters': filters or {},
+            'rows': rows,
+            'size_bytes': os.path.getsize(path),
+            'export_key': export_key,
+        }
+
+        progress.finish(result)
+
+        logger.info(f"Async export completed for process {process_id}: {rows} rows")
+
+        return {'success': True, 'task_id': task_id, **result}
+
+    except Exception as e:
+        logger.error(f"Error in async export for process {process_id}: {str(e)}", exc_info=True)
+        if progress:
+            progress.fail(e)
+        else:
+            AsyncTask.objects.filter(task_id=task_id).update(
+                status='failed',
+                error=str(e),
+                updated_at=timezone.now()
+            )
+        raise
+
+
+@shared_task
+def cleanup_spool_async():
+    """
+    Periodically remove expired upload spool files (see spool.cleanup_spool)
+    and stale resumable uploads
+    """
+    expire_stale_uploads()
+    removed = cleanup_spool()
+    if removed:
+        logger.info(f"Upload spool cleanup removed {removed} files")
+    return removed
+
+
+@shared_task
+def cleanup_exports_async():
+    """
+    Periodically remove expired export artifacts (see exports.cleanup_export_artifacts)
+    """
+    from .exports import cleanup_export_artifacts
+
+    removed = cleanup_export_artifacts()
+    if removed:
+        logger.info(f"Export cleanup removed {removed} artifacts")
+    return removed
+
+
+@shared_task(bind=True, max_retries=3)
+def purge_dataset_async(self, process_id):
+    """
+    Delete the records of a dataset marked deleted (see deletion.py)
+    """
+    try:
+        return purge_process(process_id)
+    except Exception as e:
+        logger.error(f"Error purging dataset {process_id}: {str(e)}", exc_info=True)
+        raise self.retry(exc=e, countdown=60 * (2 ** self.request.retries))
+
+
+@shared_task
+def purge_deleted_datasets_async():
+    """
+    Periodically purge datasets marked deleted whose purge task never ran
+    (e.g. the broker was down when they were deleted)
+    """
+    from datetime import timedelta
+
+    stale = DataImportProcess.all_objects.filter(
+        deleted_at__lt=timezone.now() - timedelta(hours=1)
+    ).values_list('id', flat=True)
+    purged = 0
+    for process_id in stale:
+        purge_process(process_id)
+        purged += 1
+    if purged:
+        logger.info(f"Purged {purged} deleted datasets")
+    return purged
+
+
+@shared_task
+def archive_inactive_datasets_async():
+    """
+    Periodically move the records of inactive datasets untouched for
+    ARCHIVE_AFTER_DAYS days to Parquet (see archive.py)
+    """
+    from django.conf import settings
+
+    if not settings.ARCHIVE_AFTER_DAYS or not archival_available():
+        return 0
+
+    archived = 0
+    for process in stale_datasets():
+        try:
+            archive_process(process)
+            invalidate_process_caches(process.id)
+            archived += 1
+        except Exception as e:
+            logger.error(f"Error archiving dataset {process.id}: {str(e)}", exc_info=True)
+    if archived:
+        logger.info(f"Archived {archived} inactive datasets")
+    return archived
+
+
+@shared_task(bind=True, max_retries=3)
+def restore_dataset_async(self, process_id, user_id=None):
+    """
+    Load an archived dataset back from Parquet and mark it active
+
+    Args:
+        process_id: ID of the DataImportProcess
+        user_id: ID of the user who reactivated the dataset
+
+    Returns:
+        dict: Restore result with the number of records restored
+    """
+    task_id = self.request.id
+    progress = None
+
+    try:
+        process = DataImportProcess.objects.get(id=process_id)
+
+        AsyncTask.objects.update_or_create(
+            task_id=task_id,
+            defaults={
+                'task_name': 'Dataset Restore',
+                'status': 'started',
+                'process': process,
+                'created_by_id': user_id or process.created_by_id,
+            }
+        )
+        progress = ProgressReporter(
+            task_id, celery_task=self, stages=RESTORE_STAGES, task_name='Dataset Restore',
+            created_by_id=user_id or process.created_by_id, process_id=process.id
+        )
+
+        # A retry after a successful restore only has to reactivate
+        restored = restore_process(process, progress=progress) if process.archived_at else 0
+        process.status = 'active'
+        process.save(update_fields=['status', 'updated_at'])
+        pin_to_primary(user_id)
+
+        invalidate_process_caches(process.id)
+        result = {'records_restored': restored}
+        progress.finish(result)
+        logger.info(f"Restored dataset {process.table_name}: {restored} records")
+
+        return {
+            'success': True,
+            'process_id': process_id,
+            'statistics': result
+        }
+
+    except Exception as e:
+        logger.error(f"Error restoring dataset {process_id}: {str(e)}", exc_info=True)
+        if progress:
+            progress.fail(e, retrying=self.request.retries < self.max_retries)
         raise self.retry(exc=e, countdown=60 * (2 ** self.request.retries))
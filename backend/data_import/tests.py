@@ -0,0 +1,1979 @@
+"""
+Test suite for data_import application
+Testing export jobs, record readers and import pipeline helpers
+"""
+import importlib.util
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock, skipIf, skipUnless
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, RequestFactory, override_settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework import status
+from .models import DataImportProcess, ImportedDataRecord, AsyncTask, ChunkedUpload
+from .exports import (
+    build_export_key, export_artifact_path, ranged_file_response, write_export_artifact,
+    encode_csv, gzip_chunks
+)
+from .readers import fetch_record_data
+from .serializers import DataImportRequestSerializer
+from .services import DataImportService
+
+User = get_user_model()
+
+
+def create_process_with_records(user, table_name='portos', rows=None):
+    """Helper to create a dataset with a few records"""
+    rows = rows if rows is not None else [
+        {'porto': 'Santos', 'carga': 10},
+        {'porto': 'Itajai', 'carga': 20},
+        {'porto': 'Suape', 'carga': 30},
+    ]
+    process = DataImportProcess.objects.create(
+        table_name=table_name,
+        endpoint_url='file:portos.csv',
+        created_by=user,
+        record_count=len(rows),
+        column_structure={
+            'porto': {'original_name': 'porto', 'type': 'TEXT'},
+            'carga': {'original_name': 'carga', 'type': 'INTEGER'},
+        }
+    )
+    ImportedDataRecord.objects.bulk_create([
+        ImportedDataRecord(process=process, data=row, row_hash=ImportedDataRecord.generate_row_hash(row))
+        for row in rows
+    ])
+    return process
+
+
+class ExportArtifactTest(TestCase):
+    """Tests for export artifact generation and ranged responses"""
+
+    def setUp(self):
+        self.export_root = tempfile.mkdtemp()
+        self.user = User.objects.create_user(username='exporter', email='exp@test.com', password='testpass123')
+        self.process = create_process_with_records(self.user)
+
+    def tearDown(self):
+        shutil.rmtree(self.export_root, ignore_errors=True)
+
+    def test_export_key_is_deterministic(self):
+        """Test identical export requests produce the same key"""
+        key1 = build_export_key(self.process, 'csv', ['porto'], {'carga': 10})
+        key2 = build_export_key(self.process, 'csv', ['porto'], {'carga': 10})
+        key3 = build_export_key(self.process, 'xlsx', ['porto'], {'carga': 10})
+        self.assertEqual(key1, key2)
+        self.assertNotEqual(key1, key3)
+
+    def test_write_csv_artifact_with_filters(self):
+        """Test CSV artifact honors columns and filters"""
+        path = os.path.join(self.export_root, 'out.csv')
+        rows = write_export_artifact(self.process, 'csv', ['porto'], {'carga': 20}, path)
+
+        self.assertEqual(rows, 1)
+        with open(path, encoding='utf-8-sig') as fh:
+            self.assertEqual(fh.read().splitlines(), ['porto', 'Itajai'])
+
+    def test_ranged_response(self):
+        """Test partial content is served for a Range request"""
+        path = os.path.join(self.export_root, 'out.csv')
+        with open(path, 'wb') as fh:
+            fh.write(b'0123456789')
+
+        request = RequestFactory().get('/', HTTP_RANGE='bytes=4-')
+        response = ranged_file_response(request, path, 'csv', 'out.csv')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 4-9/10')
+        self.assertEqual(b''.join(response.streaming_content), b'456789')
+
+    def test_unsatisfiable_range(self):
+        """Test out of bounds Range returns 416"""
+        path = os.path.join(self.export_root, 'out.csv')
+        with open(path, 'wb') as fh:
+            fh.write(b'0123456789')
+
+        request = RequestFactory().get('/', HTTP_RANGE='bytes=20-')
+        response = ranged_file_response(request, path, 'csv', 'out.csv')
+
+        self.assertEqual(response.status_code, 416)
+
+
+class RecordReaderTest(TestCase):
+    """Tests for the values-based record readers"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', email='reader@test.com', password='testpass123')
+        self.process = create_process_with_records(self.user, rows=[
+            {'porto': 'Santos', 'carga': 10, 'codigo': '007'},
+            {'porto': 'Itajai', 'carga': None},
+        ])
+        self.records = ImportedDataRecord.objects.filter(process=self.process)
+
+    def test_full_payload(self):
+        """Test readers return the same dicts as model instances"""
+        expected = [record.data for record in self.records]
+        self.assertEqual(fetch_record_data(self.records), expected)
+
+    def test_column_projection_keeps_types(self):
+        """Test projected columns keep JSON types (numeric strings stay strings)"""
+        data = fetch_record_data(self.records, columns=['codigo', 'carga'])
+        self.assertEqual(data, [
+            {'codigo': '007', 'carga': 10},
+            {'codigo': None, 'carga': None},
+        ])
+
+    def test_limit(self):
+        """Test limit is applied in SQL"""
+        self.assertEqual(len(fetch_record_data(self.records, limit=1)), 1)
+        self.assertEqual(fetch_record_data(self.records.none()), [])
+
+    def test_server_side_cursors_disabled(self):
+        """Test DISABLE_SERVER_SIDE_CURSORS reads through a plain cursor"""
+        expected = [record.data for record in self.records]
+        with mock.patch.dict(connection.settings_dict, {'DISABLE_SERVER_SIDE_CURSORS': True}), \
+                mock.patch.object(connection, 'chunked_cursor', side_effect=AssertionError('named cursor opened')):
+            self.assertEqual(fetch_record_data(self.records), expected)
+            self.assertEqual(fetch_record_data(self.records, columns=['porto'], limit=1), [{'porto': 'Santos'}])
+
+
+class ORJSONTest(TestCase):
+    """Tests for orjson rendering, parsing and JSONField decoding"""
+
+    def test_renderer_matches_drf(self):
+        """Test orjson renderer output decodes to the same data as DRF's"""
+        import json
+        from decimal import Decimal
+        from rest_framework.renderers import JSONRenderer
+        from core.renderers import ORJSONRenderer
+
+        data = {'porto': 'São Sebastião\u2028', 'valor': Decimal('1.5'), 'itens': [1, None, 2.5], 1: 'x'}
+        rendered = ORJSONRenderer().render(data)
+
+        self.assertEqual(json.loads(rendered), json.loads(JSONRenderer().render(data)))
+        self.assertIn(b'\\u2028', rendered)
+
+    def test_parser_rejects_invalid_json(self):
+        """Test invalid bodies raise ParseError"""
+        import io
+        from rest_framework.exceptions import ParseError
+        from core.parsers import ORJSONParser
+
+        parser = ORJSONParser()
+        self.assertEqual(parser.parse(io.BytesIO(b'{"a": [1, 2]}')), {'a': [1, 2]})
+        with self.assertRaises(ParseError):
+            parser.parse(io.BytesIO(b'{invalid'))
+
+    def test_field_decodes_payload(self):
+        """Test ORJSONField round-trips record payloads"""
+        user = User.objects.create_user(username='json', email='json@test.com', password='testpass123')
+        process = create_process_with_records(user, rows=[{'porto': 'Santos', 'lista': [1, {'a': None}]}])
+        record = ImportedDataRecord.objects.get(process=process)
+        self.assertEqual(record.data, {'porto': 'Santos', 'lista': [1, {'a': None}]})
+        self.assertEqual(
+            list(ImportedDataRecord.objects.filter(process=process).values_list('data__porto', flat=True)),
+            ['Santos']
+        )
+
+
+class CsvEncoderTest(TestCase):
+    """Tests for the chunked CSV export encoder"""
+
+    def test_matches_per_row_writer(self):
+        """Test chunked output is byte-identical to a per-row csv.writer"""
+        import csv
+        import io
+        columns = ['a', 'b', 'c']
+        rows = [{'a': i, 'b': f'x;"{i}"', 'c': None} for i in range(5000)] + [{'a': 1}]
+
+        expected = io.StringIO()
+        writer = csv.writer(expected, delimiter=';')
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow([row.get(col, '') for col in columns])
+
+        chunks = list(encode_csv(rows, columns, delimiter=';', buffer_size=4096))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(b''.join(chunks), expected.getvalue().encode('utf-8'))
+
+    def test_gzip_roundtrip(self):
+        """Test gzip stream decompresses to the plain CSV"""
+        import gzip
+        rows = [{'a': i} for i in range(1000)]
+        plain = b''.join(encode_csv(rows, ['a']))
+        compressed = b''.join(gzip_chunks(encode_csv(rows, ['a'])))
+        self.assertEqual(gzip.decompress(compressed), plain)
+
+
+class ExportJobAPITest(APITestCase):
+    """Tests for export job creation and deduplication"""
+
+    def setUp(self):
+        self.export_root = tempfile.mkdtemp()
+        self.user = User.objects.create_user(username='exporter', email='exp@test.com', password='testpass123')
+        self.process = create_process_with_records(self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        shutil.rmtree(self.export_root, ignore_errors=True)
+
+    @mock.patch('data_import.tasks.export_data_async.apply_async')
+    def test_identical_requests_share_job(self, apply_async):
+        """Test identical export requests are deduplicated onto one job"""
+        url = f'/api/v1/data-import/processes/{self.process.id}/export/'
+        payload = {'format': 'csv', 'columns': ['porto']}
+
+        first = self.client.post(url, payload, format='json')
+        second = self.client.post(url, payload, format='json')
+
+        self.assertEqual(first.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(first.data['task_id'], second.data['task_id'])
+        self.assertEqual(apply_async.call_count, 1)
+        self.assertEqual(AsyncTask.objects.filter(task_name='Data Export').count(), 1)
+
+    def test_invalid_filter_column(self):
+        """Test filters on unknown columns are rejected"""
+        url = f'/api/v1/data-import/processes/{self.process.id}/export/'
+        response = self.client.post(url, {'filters': {'nope': 1}}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_download_finished_artifact(self):
+        """Test finished artifact is downloadable with Range support"""
+        from .tasks import export_data_async
+
+        with override_settings(EXPORT_ROOT=self.export_root):
+            key = build_export_key(self.process, 'csv', ['porto'])
+            task = AsyncTask.objects.create(
+                task_id=f'export-{key}', task_name='Data Export', process=self.process
+            )
+            export_data_async.apply(
+                args=[self.process.id, 'csv', ['porto'], {}, key], task_id=task.task_id
+            )
+            task.refresh_from_db()
+            self.assertEqual(task.status, 'success')
+            self.assertTrue(os.path.exists(export_artifact_path(key, 'csv')))
+
+            response = self.client.get(
+                f'/api/v1/data-import/tasks/{task.task_id}/download/', HTTP_RANGE='bytes=0-2'
+            )
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(b''.join(response.streaming_content), '\ufeff'.encode('utf-8'))
+
+    def test_expired_artifact_is_gone(self):
+        """Test the export cleanup removes old artifacts and their download answers 410"""
+        from .exports import cleanup_export_artifacts
+        from .tasks import export_data_async
+
+        with override_settings(EXPORT_ROOT=self.export_root):
+            key = build_export_key(self.process, 'csv', ['porto'])
+            task = AsyncTask.objects.create(
+                task_id=f'export-{key}', task_name='Data Export', process=self.process
+            )
+            export_data_async.apply(
+                args=[self.process.id, 'csv', ['porto'], {}, key], task_id=task.task_id
+            )
+            path = export_artifact_path(key, 'csv')
+
+            self.assertEqual(cleanup_export_artifacts(ttl=3600), 0)
+            old = os.path.getmtime(path) - 7200
+            os.utime(path, (old, old))
+            self.assertEqual(cleanup_export_artifacts(ttl=3600), 1)
+            self.assertFalse(os.path.exists(path))
+
+            response = self.client.get(f'/api/v1/data-import/tasks/{task.task_id}/download/')
+            self.assertEqual(response.status_code, status.HTTP_410_GONE)
+
+    def test_csv_download_gzip(self):
+        """Test streamed CSV download honors Accept-Encoding: gzip"""
+        import gzip
+        response = self.client.get(
+            f'/api/v1/data-import/processes/{self.process.id}/download/', HTTP_ACCEPT_ENCODING='gzip'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        body = gzip.decompress(b''.join(response.streaming_content)).decode('utf-8')
+        self.assertIn('Santos', body)
+
+    def test_accept_encoding_qvalues(self):
+        """Test gzip is only used when the client gives it a non-zero q-value"""
+        from .exports import accepts_gzip
+
+        def accepts(header):
+            return accepts_gzip(RequestFactory().get('/', HTTP_ACCEPT_ENCODING=header))
+
+        self.assertTrue(accepts('gzip, deflate, br'))
+        self.assertTrue(accepts('br;q=1.0, gzip;q=0.8'))
+        self.assertTrue(accepts('*'))
+        self.assertFalse(accepts('gzip;q=0'))
+        self.assertFalse(accepts('gzip;q=0.000, *'))
+        self.assertFalse(accepts('*;q=0'))
+        self.assertFalse(accepts('identity'))
+
+
+class PublicDatasetAPITest(APITestCase):
+    """Tests for public dataset read endpoints"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', email='owner@test.com', password='testpass123')
+        self.process = create_process_with_records(self.user)
+
+    def test_public_data_with_column_projection(self):
+        """Test public data endpoint returns only requested columns"""
+        response = self.client.get(f'/api/v1/data-import/public-data/{self.process.id}/?columns=porto')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['columns'], ['porto'])
+        self.assertEqual(response.data['data'][0], {'porto': 'Santos'})
+        self.assertEqual(response.data['count'], 3)
+
+    def test_public_search(self):
+        """Test public search finds matching records"""
+        response = self.client.get('/api/v1/data-import/public-search/?q=itaj')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_tables'], 1)
+        self.assertEqual(response.data['results'][0]['data'], [{'porto': 'Itajai', 'carga': 20}])
+
+    @mock.patch('data_import.tasks.export_data_async.apply_async')
+    def test_public_large_xlsx_asks_to_retry(self, apply_async):
+        """Test a pending public xlsx export answers 503 + Retry-After instead of a 2xx JSON body"""
+        with override_settings(EXPORT_SYNC_MAX_ROWS=1):
+            response = self.client.get(
+                f'/api/v1/data-import/public-download/{self.process.id}/', {'file_format': 'xlsx'}
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '10')
+        self.assertNotIn('task_id', response.data)
+        self.assertEqual(apply_async.call_count, 1)
+
+    @mock.patch('data_import.tasks.export_data_async.apply_async')
+    def test_public_xlsx_retries_are_not_rate_limited(self, apply_async):
+        """Test retries for a public xlsx export that already has a job don't count against the rate limit"""
+        from django.test import RequestFactory
+        from django.urls import resolve
+        from .views import _public_download_rate
+
+        url = f'/api/v1/data-import/public-download/{self.process.id}/'
+        request = RequestFactory().get(url, {'file_format': 'xlsx'})
+        request.resolver_match = resolve(url)
+
+        with override_settings(EXPORT_SYNC_MAX_ROWS=1):
+            self.assertEqual(_public_download_rate('download', request), '50/h')
+            self.client.get(url, {'file_format': 'xlsx'})
+            self.assertIsNone(_public_download_rate('download', request))
+
+    def test_public_data_streaming_json(self):
+        """Test streamed JSON document matches the regular response"""
+        import json
+        url = f'/api/v1/data-import/public-data/{self.process.id}/'
+        regular = self.client.get(url)
+        streamed = self.client.get(url, {'stream': 'json'})
+
+        self.assertEqual(streamed['Content-Type'], 'application/json')
+        document = json.loads(b''.join(streamed.streaming_content))
+        self.assertEqual(document, json.loads(regular.content))
+
+    def test_public_data_streaming_ndjson(self):
+        """Test NDJSON streaming emits one record per line"""
+        import json
+        response = self.client.get(
+            f'/api/v1/data-import/public-data/{self.process.id}/', {'stream': 'ndjson', 'columns': 'porto'}
+        )
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual([json.loads(line) for line in lines], [
+            {'porto': 'Santos'}, {'porto': 'Itajai'}, {'porto': 'Suape'}
+        ])
+
+
+class ProgressReporterTest(TestCase):
+    """Tests for stage-based progress reporting"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user(username='reporter', email='rep@test.com', password='testpass123')
+        AsyncTask.objects.create(task_id='import-1', task_name='Data Import', created_by=self.user)
+
+    def test_stages_publish_to_cache(self):
+        """Test progress is weighted by stage and published to the cache"""
+        from .progress import ProgressReporter, get_task_state
+
+        progress = ProgressReporter('import-1', stages={'parse': 50, 'insert': 50}, created_by_id=self.user.id)
+        progress.start_stage('parse', total=10)
+        progress.start_stage('insert', total=100)
+        with override_settings(TASK_PROGRESS_PUBLISH_INTERVAL=0):
+            progress.advance(50, bytes_read=2048)
+
+        state = get_task_state('import-1')
+        self.assertEqual(state['stage'], 'insert')
+        self.assertEqual(state['progress'], 75)
+        self.assertEqual(state['bytes_read'], 2048)
+
+        progress.finish({'inserted': 100})
+        self.assertEqual(get_task_state('import-1')['status'], 'success')
+        task = AsyncTask.objects.get(task_id='import-1')
+        self.assertEqual(task.progress, 100)
+        self.assertEqual(task.result, {'inserted': 100})
+
+    def test_retry_keeps_version_increasing(self):
+        """Test a reporter created for a retry continues the published version"""
+        from .progress import ProgressReporter, get_task_state
+
+        first = ProgressReporter('import-1', stages={'insert': 100})
+        first.start_stage('insert', total=10)
+        seen = get_task_state('import-1')['version']
+
+        ProgressReporter('import-1', stages={'insert': 100})
+        self.assertGreater(get_task_state('import-1')['version'], seen)
+
+    def test_late_chunk_does_not_move_version_back(self):
+        """Test a chunk writing after a later one does not overwrite its newer state"""
+        from django.core.cache import cache
+        from .progress import progress_cache_key, report_chunk_done, get_task_state
+
+        report_chunk_done('import-1', 10, total_chunks=4)
+        report_chunk_done('import-1', 10, total_chunks=4)
+        published = get_task_state('import-1')
+
+        # A chunk that read its counters before the second one finished
+        cache.set(f"{progress_cache_key('import-1')}:chunks", 0)
+        report_chunk_done('import-1', 10, total_chunks=4)
+
+        state = get_task_state('import-1')
+        self.assertEqual(state['version'], published['version'])
+        self.assertEqual(state['stage_done'], 2)
+
+    def test_database_writes_are_throttled(self):
+        """Test AsyncTask is not written on every advance"""
+        from .progress import ProgressReporter
+
+        with override_settings(TASK_PROGRESS_PUBLISH_INTERVAL=0, TASK_PROGRESS_DB_INTERVAL=60):
+            progress = ProgressReporter('import-1', stages={'insert': 100})
+            progress.start_stage('insert', total=100)
+            with self.assertNumQueries(0):
+                for _ in range(10):
+                    progress.advance(5)
+
+    def test_import_task_reports_stages(self):
+        """Test the import task runs through all stages and links the process"""
+        from .tasks import process_data_import_async
+
+        path = os.path.join(tempfile.mkdtemp(), 'portos.csv')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('porto,carga\nSantos,10\nItajai,20\n')
+
+        process_data_import_async.apply(
+            args=['portos_async', self.user.id], kwargs={'file_path': path, 'import_type': 'file'},
+            task_id='import-2'
+        )
+
+        task = AsyncTask.objects.get(task_id='import-2')
+        self.assertEqual(task.status, 'success')
+        self.assertEqual(task.process.record_count, 2)
+        shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+
+class TaskStatusAPITest(APITestCase):
+    """Tests for cached, long-poll and SSE task status"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user(username='poller', email='poll@test.com', password='testpass123')
+        self.other = User.objects.create_user(username='other', email='other@test.com', password='testpass123')
+        AsyncTask.objects.create(task_id='import-1', task_name='Data Import', created_by=self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def test_status_served_from_cache(self):
+        """Test repeated polls don't hit AsyncTask"""
+        url = '/api/v1/data-import/tasks/import-1/status/'
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.data['status'], 'pending')
+
+    def test_status_forbidden_for_other_user(self):
+        """Test users cannot read tasks they don't own"""
+        self.client.force_authenticate(user=self.other)
+        response = self.client.get('/api/v1/data-import/tasks/import-1/status/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_long_poll_returns_on_finish(self):
+        """Test long-poll returns as soon as the task state changes"""
+        from .progress import ProgressReporter
+
+        progress = ProgressReporter('import-1', created_by_id=self.user.id)
+        version = progress.version
+        progress.finish({'inserted': 3})
+
+        response = self.client.get(
+            '/api/v1/data-import/tasks/import-1/status/', {'since': version, 'wait': 5}
+        )
+        self.assertEqual(response.data['status'], 'success')
+        self.assertGreater(response.data['version'], version)
+
+    def test_event_stream(self):
+        """Test SSE stream emits the state and ends on a terminal status"""
+        from .progress import ProgressReporter
+
+        ProgressReporter('import-1', created_by_id=self.user.id).finish({'inserted': 3})
+        response = self.client.get(
+            '/api/v1/data-import/tasks/import-1/events/', HTTP_ACCEPT='text/event-stream'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join(response.streaming_content).decode('utf-8')
+        self.assertIn('event: progress', body)
+        self.assertIn('"status":"success"', body)
+        self.assertIn('event: end', body)
+
+
+class ParallelImportTest(TestCase):
+    """Tests for chunked parallel imports"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.tmpdir = tempfile.mkdtemp()
+        self.user = User.objects.create_user(username='parallel', email='par@test.com', password='testpass123')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def write_csv(self, rows):
+        path = os.path.join(self.tmpdir, 'portos.csv')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('porto,carga\n')
+            for i in range(rows):
+                f.write(f'Porto {i},{i}\n')
+        return path
+
+    def test_csv_byte_ranges_align_on_lines(self):
+        """Test CSV chunks cover the body and end on line boundaries"""
+        from .chunking import csv_byte_ranges, read_chunk
+
+        path = self.write_csv(50)
+        ranges = csv_byte_ranges(path, 64)
+
+        self.assertGreater(len(ranges), 1)
+        self.assertEqual(ranges[0][0], len('porto,carga\n'))
+        self.assertEqual(ranges[-1][1], os.path.getsize(path))
+        rows = sum(len(read_chunk(path, {'kind': 'csv', 'start': s, 'end': e})) for s, e in ranges)
+        self.assertEqual(rows, 50)
+
+    def test_xlsx_row_ranges(self):
+        """Test XLSX chunks are row ranges that skip the header"""
+        import pandas as pd
+        from .chunking import xlsx_row_ranges, read_chunk
+
+        path = os.path.join(self.tmpdir, 'portos.xlsx')
+        pd.DataFrame({'porto': [f'P{i}' for i in range(25)], 'carga': range(25)}).to_excel(path, index=False)
+
+        ranges = xlsx_row_ranges(path, 10)
+        self.assertEqual(ranges, [(2, 11), (12, 21), (22, 26)])
+        df = read_chunk(path, {'kind': 'xlsx', 'min_row': 22, 'max_row': 26})
+        self.assertEqual(list(df.columns), ['porto', 'carga'])
+        self.assertEqual(df['porto'].tolist(), ['P20', 'P21', 'P22', 'P23', 'P24'])
+
+    @override_settings(IMPORT_PARALLEL_MIN_BYTES=1, IMPORT_CHUNK_BYTES=100)
+    def test_parallel_import_merges_chunks(self):
+        """Test the chord imports every chunk and completes the AsyncTask"""
+        from .tasks import process_data_import_async
+
+        path = self.write_csv(40)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write('Porto 1,1\n')  # duplicate row in another chunk
+
+        result = process_data_import_async.apply(
+            args=['portos_parallel', self.user.id], kwargs={'file_path': path, 'import_type': 'file'},
+            task_id='import-parallel'
+        ).get()
+
+        self.assertTrue(result['parallel'])
+        self.assertGreater(result['chunks'], 1)
+        task = AsyncTask.objects.get(task_id='import-parallel')
+        self.assertEqual(task.status, 'success')
+        self.assertEqual(task.result['inserted'], 40)
+        self.assertEqual(task.result['duplicates'], 1)
+        self.assertEqual(task.process.record_count, 40)
+
+
+    def test_chunks_use_sample_dtypes(self):
+        """Test every chunk gets the column types inferred on the sample"""
+        from .chunking import csv_byte_ranges, read_chunk, read_sample, sample_dtypes
+
+        path = os.path.join(self.tmpdir, 'codigos.csv')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('codigo,carga\n')
+            for i in range(40):
+                # Codes only look numeric past the sample; one load is missing
+                f.write(f'{"A" if i < 5 else "0"}{i},{"" if i == 30 else i}\n')
+
+        dtypes = sample_dtypes(read_sample(path, rows=5))
+        self.assertEqual(dtypes, {'codigo': 'str', 'carga': 'Int64'})
+
+        rows = []
+        for start, end in csv_byte_ranges(path, 64):
+            chunk = read_chunk(path, {'kind': 'csv', 'start': start, 'end': end}, dtypes)
+            rows.extend(DataImportService.dataframe_to_dict_list(chunk))
+        self.assertEqual(len(rows), 40)
+        self.assertEqual(rows[10]['codigo'], '010')
+        self.assertTrue(all(isinstance(row['codigo'], str) for row in rows))
+        self.assertEqual({type(row['carga']) for row in rows}, {int, type(None)})
+
+    def test_failed_chunk_removes_the_imported_version(self):
+        """Test a permanently failed chunk removes the rows of its version and marks new datasets failed"""
+        from .tasks import fail_parallel_import
+        from .versions import start_version
+
+        process = create_process_with_records(self.user, table_name='portos_existente')
+        start_version(process, 'import')  # version 1: the existing records
+        version = start_version(process, 'append')
+        ImportedDataRecord.objects.create(
+            process=process, data={'porto': 'Rio'}, row_hash='novo', version=version.number
+        )
+        fail_parallel_import.apply(args=['import-failed', process.id], kwargs={'version': version.number})
+
+        process.refresh_from_db()
+        version.refresh_from_db()
+        self.assertEqual(ImportedDataRecord.objects.filter(process=process).count(), 3)
+        self.assertEqual((process.status, process.record_count), ('active', 3))
+        self.assertEqual(version.status, 'rolled_back')
+
+        fresh = create_process_with_records(self.user, table_name='portos_novo')
+        fail_parallel_import.apply(args=['import-failed-2', fresh.id], kwargs={'version': 1})
+        fresh.refresh_from_db()
+        self.assertEqual((fresh.status, fresh.record_count), ('inactive', 0))
+        self.assertIsNotNone(fresh.error_message)
+
+
+class HashingPoolTest(TestCase):
+    """Tests for block normalization/hashing of imports"""
+
+    def setUp(self):
+        self.name_mapping = {'Porto': 'porto', 'Carga': 'carga'}
+        self.data = [{'Porto': f'Porto {i}', 'Carga': i, 'Extra': 'x'} for i in range(30)]
+        self.data[3] = 'not a dict'
+        self.data[5] = {'Extra': 'only unknown columns'}
+
+    def test_block_matches_model_hash(self):
+        """Test blocks normalize rows and hash them like generate_row_hash"""
+        from .hashing import normalize_and_hash_block
+
+        result = normalize_and_hash_block(self.data, self.name_mapping)
+        self.assertEqual(result['errors'], 2)
+        self.assertEqual((result['not_dict'], result['empty']), (3, 5))
+        row_hash, normalized = result['rows'][0]
+        self.assertEqual(normalized, {'porto': 'Porto 0', 'carga': 0})
+        self.assertEqual(row_hash, ImportedDataRecord.generate_row_hash(normalized))
+
+    def test_pool_matches_inline(self):
+        """Test the process pool yields the same blocks as inline hashing"""
+        from .hashing import iter_hashed_blocks, shutdown_executor
+
+        # A row with its columns out of mapping order comes back as a dict
+        self.data[7] = {'Carga': 7, 'Porto': 'Porto 7'}
+        with override_settings(IMPORT_HASH_BLOCK_ROWS=8, IMPORT_HASH_POOL_MIN_ROWS=0):
+            inline = list(iter_hashed_blocks(self.data, self.name_mapping))
+            with override_settings(IMPORT_HASH_POOL_ENABLED=True, IMPORT_HASH_WORKERS=2):
+                pooled = list(iter_hashed_blocks(self.data, self.name_mapping))
+        shutdown_executor()
+
+        self.assertEqual(len(inline), 4)
+        self.assertEqual(inline, pooled)
+        self.assertEqual(list(pooled[0]['rows'][5][1]), ['carga', 'porto'])
+
+    def test_daemonic_process_hashes_inline(self):
+        """Test daemonic processes (Celery prefork) hash inline without starting a pool"""
+        from . import hashing
+
+        self.addCleanup(setattr, hashing, '_daemonic', None)
+        hashing._daemonic = True
+        with override_settings(IMPORT_HASH_BLOCK_ROWS=8, IMPORT_HASH_POOL_MIN_ROWS=0,
+                               IMPORT_HASH_POOL_ENABLED=True, IMPORT_HASH_WORKERS=2), \
+                mock.patch.object(hashing, 'get_executor') as get_executor:
+            blocks = list(hashing.iter_hashed_blocks(self.data, self.name_mapping))
+
+        get_executor.assert_not_called()
+        self.assertEqual(sum(len(block['rows']) for block in blocks), 28)
+
+
+class ImportDispatchTest(APITestCase):
+    """Tests for size-aware sync/async dispatch of imports"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.spool_dir = tempfile.mkdtemp()
+        self.user = User.objects.create_user(username='importer', email='imp@test.com', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        shutil.rmtree(self.spool_dir, ignore_errors=True)
+
+    def csv_upload(self, rows=3):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        content = 'porto,carga\n' + ''.join(f'Porto {i},{i}\n' for i in range(rows))
+        return SimpleUploadedFile('portos.csv', content.encode('utf-8'), content_type='text/csv')
+
+    def test_small_upload_stays_synchronous(self):
+        """Test small files are imported inside the request"""
+        response = self.client.post('/api/v1/data-import/', {
+            'import_type': 'file', 'table_name': 'portos_sync', 'file': self.csv_upload()
+        }, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(DataImportProcess.objects.get(table_name='portos_sync').record_count, 3)
+
+    @mock.patch('data_import.tasks.process_data_import_async.apply_async')
+    def test_large_upload_is_spooled_and_enqueued(self, apply_async):
+        """Test uploads above the row threshold return 202 with the AsyncTask id"""
+        with override_settings(IMPORT_ASYNC_MIN_ROWS=10, IMPORT_SPOOL_DIR=self.spool_dir):
+            response = self.client.post('/api/v1/data-import/', {
+                'import_type': 'file', 'table_name': 'portos_async', 'file': self.csv_upload(rows=20)
+            }, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        task = AsyncTask.objects.get(task_id=response.data['task_id'])
+        self.assertEqual((task.status, task.created_by), ('pending', self.user))
+        self.assertFalse(DataImportProcess.objects.filter(table_name='portos_async').exists())
+
+        kwargs = apply_async.call_args.kwargs
+        self.assertEqual(kwargs['task_id'], task.task_id)
+        self.assertEqual(kwargs['args'], ['portos_async', self.user.id])
+        file_path = kwargs['kwargs']['file_path']
+        self.assertTrue(file_path.startswith(self.spool_dir))
+        with open(file_path, encoding='utf-8') as f:
+            self.assertEqual(len(f.read().splitlines()), 21)
+
+        status_response = self.client.get(response.data['status_url'])
+        self.assertEqual(status_response.data['status'], 'pending')
+
+    @mock.patch('data_import.tasks.append_data_async.apply_async')
+    def test_large_append_is_enqueued(self, apply_async):
+        """Test appends above the byte threshold are handed to append_data_async"""
+        process = create_process_with_records(self.user)
+
+        with override_settings(IMPORT_ASYNC_MIN_BYTES=10, IMPORT_SPOOL_DIR=self.spool_dir):
+            response = self.client.post(f'/api/v1/data-import/processes/{process.id}/append/', {
+                'import_type': 'file', 'table_name': 'portos_append', 'file': self.csv_upload()
+            }, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        task = AsyncTask.objects.get(task_id=response.data['task_id'])
+        self.assertEqual((task.task_name, task.process_id), ('Data Append', process.id))
+        self.assertEqual(apply_async.call_args.kwargs['kwargs']['user_id'], self.user.id)
+
+    def test_endpoint_without_content_length_stays_synchronous(self):
+        """Test only endpoints advertising a large Content-Length are imported in the background"""
+        import requests
+        from .dispatch import should_import_async
+
+        with mock.patch('data_import.dispatch.requests.head', side_effect=requests.exceptions.ConnectionError):
+            self.assertFalse(should_import_async('endpoint', endpoint_url='https://example.com/data.json'))
+
+        head = mock.Mock(ok=True, headers={})
+        with mock.patch('data_import.dispatch.requests.head', return_value=head):
+            self.assertFalse(should_import_async('endpoint', endpoint_url='https://example.com/data.json'))
+
+        head = mock.Mock(ok=True, headers={'Content-Length': '1024'})
+        with mock.patch('data_import.dispatch.requests.head', return_value=head):
+            self.assertFalse(should_import_async('endpoint', endpoint_url='https://example.com/data.json'))
+            with override_settings(IMPORT_ASYNC_MIN_BYTES=1000):
+                self.assertTrue(should_import_async('endpoint', endpoint_url='https://example.com/data.json'))
+
+
+class UploadSpoolTest(TestCase):
+    """Tests for the content-addressed upload spool"""
+
+    def setUp(self):
+        self.spool_dir = tempfile.mkdtemp()
+        self.override = override_settings(IMPORT_SPOOL_DIR=self.spool_dir)
+        self.override.enable()
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.spool_dir, ignore_errors=True)
+
+    def upload(self, content=b'porto,carga\nSantos,10\n'):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        return SimpleUploadedFile('portos.csv', content, content_type='text/csv')
+
+    def test_identical_uploads_share_blob(self):
+        """Test identical uploads are stored once and released with the last task"""
+        from .spool import spool_upload, release_spool_file
+
+        first = spool_upload(self.upload(), 'task-1')
+        second = spool_upload(self.upload(), 'task-2')
+
+        self.assertNotEqual(first, second)
+        self.assertTrue(os.path.samefile(first, second))
+        blobs = os.listdir(os.path.join(self.spool_dir, 'blobs'))
+        self.assertEqual(len(blobs), 1)
+
+        release_spool_file(first)
+        self.assertFalse(os.path.exists(first))
+        self.assertEqual(len(os.listdir(os.path.join(self.spool_dir, 'blobs'))), 1)
+
+        release_spool_file(second)
+        self.assertEqual(os.listdir(os.path.join(self.spool_dir, 'blobs')), [])
+
+    def test_release_ignores_paths_outside_spool(self):
+        """Test only spool task links are ever removed"""
+        from .spool import release_spool_file
+
+        path = os.path.join(self.spool_dir, 'keep.csv')
+        with open(path, 'wb') as f:
+            f.write(b'x')
+        release_spool_file(path)
+        self.assertTrue(os.path.exists(path))
+
+    def test_cleanup_removes_expired_files(self):
+        """Test the sweeper removes abandoned task links and orphan blobs"""
+        from .spool import spool_upload, cleanup_spool
+
+        path = spool_upload(self.upload(), 'task-1')
+        self.assertEqual(cleanup_spool(ttl=3600), 0)
+
+        old = os.stat(path).st_mtime - 7200
+        os.utime(path, (old, old))
+        self.assertEqual(cleanup_spool(ttl=3600), 2)
+        self.assertFalse(os.path.exists(path))
+
+    def test_mapped_range_with_prefix(self):
+        """Test a memory-mapped byte range parses like the original bytes"""
+        import pandas as pd
+        from .spool import MappedRange
+
+        path = os.path.join(self.spool_dir, 'portos.csv')
+        with open(path, 'wb') as f:
+            f.write(b'porto,carga\nSantos,10\nItajai,20\nSuape,30\n')
+
+        with MappedRange(path, 22, 32, prefix=b'porto,carga\n') as source:
+            df = pd.read_csv(source)
+        self.assertEqual(df.to_dict('records'), [{'porto': 'Itajai', 'carga': 20}])
+
+
+class ChunkedUploadTest(APITestCase):
+    """Tests for resumable chunked uploads"""
+
+    CONTENT = ('porto,carga\n' + ''.join(f'Porto {i},{i}\n' for i in range(50))).encode('utf-8')
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.spool_dir = tempfile.mkdtemp()
+        self.override = override_settings(IMPORT_SPOOL_DIR=self.spool_dir)
+        self.override.enable()
+        self.user = User.objects.create_user(username='uploader', email='up@test.com', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.spool_dir, ignore_errors=True)
+
+    def create_upload(self, **extra):
+        response = self.client.post('/api/v1/data-import/uploads/', {
+            'file_name': 'portos.csv', 'size': len(self.CONTENT), **extra
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data
+
+    def put_chunk(self, upload, offset, data, **headers):
+        return self.client.put(
+            upload['upload_url'], data=data, content_type='application/offset+octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset), **headers
+        )
+
+    def test_chunks_resume_from_current_offset(self):
+        """Test chunks are appended in order and a wrong offset returns 409 with the current one"""
+        upload = self.create_upload()
+        self.assertEqual(upload['offset'], 0)
+
+        response = self.put_chunk(upload, 0, self.CONTENT[:100])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Upload-Offset'], '100')
+
+        # A client that lost the response resends the first chunk
+        response = self.put_chunk(upload, 0, self.CONTENT[:100])
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['offset'], 100)
+
+        self.assertEqual(self.client.get(upload['upload_url']).data['offset'], 100)
+        response = self.put_chunk(upload, 100, self.CONTENT[100:])
+        self.assertEqual(response.data['offset'], len(self.CONTENT))
+
+        with open(os.path.join(self.spool_dir, 'uploads', f"{upload['upload_id']}.part"), 'rb') as f:
+            self.assertEqual(f.read(), self.CONTENT)
+
+    def test_chunk_with_bad_checksum_is_discarded(self):
+        """Test a chunk failing Upload-Checksum does not advance the offset"""
+        import base64
+        import hashlib
+
+        upload = self.create_upload()
+        good = 'sha256 ' + base64.b64encode(hashlib.sha256(self.CONTENT[:100]).digest()).decode()
+
+        response = self.put_chunk(upload, 0, b'x' * 100, HTTP_UPLOAD_CHECKSUM=good)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(ChunkedUpload.objects.get(upload_id=upload['upload_id']).offset, 0)
+
+        response = self.put_chunk(upload, 0, self.CONTENT[:100], HTTP_UPLOAD_CHECKSUM=good)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['offset'], 100)
+
+    def test_stale_writer_does_not_overwrite_committed_chunk(self):
+        """Test a writer whose offset was already taken gets None and leaves the part file alone"""
+        import io
+        from .uploads import store_chunk
+
+        upload = self.create_upload()
+        stale = ChunkedUpload.objects.get(upload_id=upload['upload_id'])
+        self.assertEqual(self.put_chunk(upload, 0, self.CONTENT[:100]).status_code, status.HTTP_200_OK)
+
+        self.assertIsNone(store_chunk(stale, io.BytesIO(b'x' * 100), 100))
+        self.assertEqual(stale.offset, 0)
+        with open(os.path.join(self.spool_dir, 'uploads', f"{upload['upload_id']}.part"), 'rb') as f:
+            self.assertEqual(f.read(), self.CONTENT[:100])
+
+    def test_chunk_is_rolled_back_when_offset_swap_fails(self):
+        """Test a chunk is truncated away and 409 returned when the upload changes during the write"""
+        from . import uploads
+
+        upload = self.create_upload()
+        write_chunk = uploads.write_chunk
+
+        def cancel_during_write(*args, **kwargs):
+            new_offset = write_chunk(*args, **kwargs)
+            ChunkedUpload.objects.filter(upload_id=upload['upload_id']).update(status='aborted')
+            return new_offset
+
+        with mock.patch.object(uploads, 'write_chunk', side_effect=cancel_during_write):
+            response = self.put_chunk(upload, 0, self.CONTENT[:100])
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['offset'], 0)
+        self.assertEqual(
+            os.path.getsize(os.path.join(self.spool_dir, 'uploads', f"{upload['upload_id']}.part")), 0
+        )
+
+    def test_other_users_cannot_write_chunks(self):
+        """Test uploads are only accessible to their owner"""
+        upload = self.create_upload()
+        other = User.objects.create_user(username='other', email='other@test.com', password='testpass123')
+        self.client.force_authenticate(user=other)
+
+        response = self.put_chunk(upload, 0, self.CONTENT)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    @mock.patch('data_import.tasks.process_data_import_async.apply_async')
+    def test_complete_spools_file_and_enqueues_import(self, apply_async):
+        """Test completing an upload moves it into the spool and starts a background import"""
+        import hashlib
+
+        upload = self.create_upload(checksum=hashlib.sha256(self.CONTENT).hexdigest())
+        incomplete = self.client.post(upload['complete_url'], {'table_name': 'portos_upload'}, format='json')
+        self.assertEqual(incomplete.status_code, status.HTTP_409_CONFLICT)
+
+        self.put_chunk(upload, 0, self.CONTENT)
+        response = self.client.post(upload['complete_url'], {'table_name': 'portos_upload'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        chunked = ChunkedUpload.objects.get(upload_id=upload['upload_id'])
+        self.assertEqual((chunked.status, chunked.task.task_id), ('completed', response.data['task_id']))
+
+        kwargs = apply_async.call_args.kwargs
+        self.assertEqual(kwargs['args'], ['portos_upload', self.user.id])
+        with open(kwargs['kwargs']['file_path'], 'rb') as f:
+            self.assertEqual(f.read(), self.CONTENT)
+        self.assertFalse(os.path.exists(os.path.join(self.spool_dir, 'uploads', f"{upload['upload_id']}.part")))
+
+        again = self.client.post(upload['complete_url'], {'table_name': 'portos_upload'}, format='json')
+        self.assertEqual(again.status_code, status.HTTP_409_CONFLICT)
+
+    def test_complete_rejects_file_checksum_mismatch(self):
+        """Test the whole-file SHA-256 sent on creation is verified on completion"""
+        upload = self.create_upload(checksum='0' * 64)
+        self.put_chunk(upload, 0, self.CONTENT)
+
+        response = self.client.post(upload['complete_url'], {'table_name': 'portos_upload'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(ChunkedUpload.objects.get(upload_id=upload['upload_id']).status, 'aborted')
+        self.assertFalse(AsyncTask.objects.exists())
+
+    def test_stale_uploads_expire(self):
+        """Test uploads without activity are expired by the spool cleanup"""
+        from .uploads import expire_stale_uploads
+
+        upload = self.create_upload()
+        self.put_chunk(upload, 0, self.CONTENT[:10])
+
+        self.assertEqual(expire_stale_uploads(ttl=3600), 0)
+        self.assertEqual(expire_stale_uploads(ttl=-1), 1)
+        self.assertEqual(ChunkedUpload.objects.get(upload_id=upload['upload_id']).status, 'expired')
+        self.assertEqual(os.listdir(os.path.join(self.spool_dir, 'uploads')), [])
+
+
+class PreflightScanTest(APITestCase):
+    """Tests for the pre-flight row/column scan of import files"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.user = User.objects.create_user(username='scanner', email='scan@test.com', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_csv_counts_lines_and_header_columns(self):
+        """Test CSV rows come from the newline count and columns from the header"""
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from .preflight import scan_file
+
+        path = os.path.join(self.tmpdir, 'portos.csv')
+        with open(path, 'wb') as f:
+            f.write(b'porto,"carga, total",pais\nSantos,10,BR\nItajai,5,BR')
+
+        self.assertEqual(scan_file(path), {'rows': 2, 'columns': 3})
+        upload = SimpleUploadedFile('portos.csv', b'porto,carga\nSantos,10\n')
+        self.assertEqual(scan_file(upload), {'rows': 1, 'columns': 2})
+        self.assertEqual(upload.tell(), 0)
+
+    def test_xlsx_reads_sheet_dimension(self):
+        """Test XLSX counts come from the worksheet dimension"""
+        import pandas as pd
+        from .preflight import scan_file
+
+        path = os.path.join(self.tmpdir, 'portos.xlsx')
+        pd.DataFrame({'porto': ['Santos'] * 30, 'carga': range(30), 'pais': ['BR'] * 30}).to_excel(path, index=False)
+
+        self.assertEqual(scan_file(path), {'rows': 30, 'columns': 3})
+
+    def test_oversized_file_is_rejected_before_parsing(self):
+        """Test files above the row limit are rejected without being parsed"""
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        content = b'porto,carga\n' + b'Santos,1\n' * 30
+        with override_settings(IMPORT_ASYNC_ENABLED=False, IMPORT_SYNC_MAX_ROWS=10), \
+                mock.patch('data_import.services.DataImportService.read_file_to_dataframe') as read:
+            response = self.client.post('/api/v1/data-import/', {
+                'import_type': 'file', 'table_name': 'portos_grande',
+                'file': SimpleUploadedFile('portos.csv', content, content_type='text/csv')
+            }, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('30 linhas', response.data['error'])
+        read.assert_not_called()
+
+    def test_sync_import_scans_once(self):
+        """Test the synchronous import scans the upload once and passes the scan down"""
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from .preflight import scan_file
+
+        upload = SimpleUploadedFile('portos.csv', b'porto,carga\nSantos,10\n', content_type='text/csv')
+        with mock.patch('data_import.services.scan_file', wraps=scan_file) as scan:
+            process = DataImportService.import_data('portos_scan', user=self.user, file=upload, import_type='file')
+
+        self.assertEqual(process.record_count, 1)
+        self.assertEqual(scan.call_count, 1)
+
+    def test_too_many_columns_fail_validation(self):
+        """Test the column limit is checked when the upload is validated"""
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        header = ','.join(f'col{i}' for i in range(150)).encode()
+        response = self.client.post('/api/v1/data-import/', {
+            'import_type': 'file', 'table_name': 'portos_largo',
+            'file': SimpleUploadedFile('portos.csv', header + b'\n' + b'1,' * 149 + b'1\n', content_type='text/csv')
+        }, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('150 colunas', str(response.data['details']['file']))
+
+
+class DialectDetectionTest(TestCase):
+    """Tests for CSV encoding/dialect detection on a sample"""
+
+    PT_BR = (
+        'Relatório de movimentação portuária\n'
+        'porto;carga;valor\n'
+        'São Luís;1.234,5;10,25\n'
+        'Santos;987,0;3,5\n'
+    ).encode('cp1252')
+
+    def test_detects_pt_br_format(self):
+        """Test encoding, delimiter, number format and preamble come from the sample"""
+        from .dialect import detect_csv_format
+
+        csv_format = detect_csv_format(self.PT_BR)
+
+        self.assertEqual(csv_format, {
+            'encoding': 'cp1252', 'sep': ';', 'quotechar': '"',
+            'decimal': ',', 'thousands': '.', 'skiprows': 1,
+        })
+
+    def test_plain_csv_keeps_defaults(self):
+        """Test a comma-separated UTF-8 file is read with the default options"""
+        from .dialect import detect_csv_format
+
+        csv_format = detect_csv_format('porto,carga\n"Itajaí, SC",10.5\n'.encode('utf-8'))
+
+        self.assertEqual((csv_format['encoding'], csv_format['sep'], csv_format['decimal']), ('utf-8', ',', '.'))
+        self.assertEqual(csv_format['skiprows'], 0)
+
+    def test_upload_is_parsed_once_with_detected_format(self):
+        """Test the format detected during validation is reused for a single parse"""
+        import pandas as pd
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        upload = SimpleUploadedFile('portos.csv', self.PT_BR, content_type='text/csv')
+        serializer = DataImportRequestSerializer(data={
+            'import_type': 'file', 'table_name': 'portos_br', 'file': upload
+        })
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+
+        with mock.patch('data_import.dialect.pd.read_csv', wraps=pd.read_csv) as read_csv:
+            df = DataImportService.read_file_to_dataframe(serializer.validated_data['file'])
+
+        self.assertEqual(read_csv.call_count, 1)
+        self.assertEqual(list(df.columns), ['porto', 'carga', 'valor'])
+        self.assertEqual(df['porto'].tolist(), ['São Luís', 'Santos'])
+        self.assertEqual(df['carga'].tolist(), [1234.5, 987.0])
+
+
+@skipUnless(importlib.util.find_spec('pyarrow'), 'pyarrow não instalado')
+class ArrowCSVReaderTest(TestCase):
+    """Tests for the Arrow CSV reader and its pandas fallback"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def write(self, content, encoding='utf-8'):
+        path = os.path.join(self.tmpdir, 'portos.csv')
+        with open(path, 'w', encoding=encoding, newline='') as f:
+            f.write(content)
+        return path
+
+    def read_both(self, path):
+        from .arrow_csv import read_csv_records
+        from .hashing import row_hash
+
+        with override_settings(IMPORT_CSV_ENGINE='pandas'):
+            pandas_rows = read_csv_records(path)
+        arrow_rows = read_csv_records(path)
+        self.assertEqual([row_hash(r) for r in arrow_rows], [row_hash(r) for r in pandas_rows])
+        return arrow_rows
+
+    def test_rows_match_pandas(self):
+        """Test Arrow rows hash like pandas rows: dates as text, blanks, int columns with gaps"""
+        path = self.write(
+            'porto;data;teus;calado;ativo;obs\n'
+            'São Luís;2024-01-02;10;12,5;True;\n'
+            'Santos;2024-01-03;;;False;NA\n'
+            'Suape;2024-01-04;3;9,0;True;sem carga\n',
+            encoding='cp1252'
+        )
+
+        rows = self.read_both(path)
+
+        self.assertEqual(rows[0]['porto'], 'São Luís')
+        self.assertEqual(rows[0]['data'], '2024-01-02')
+        self.assertEqual((rows[0]['teus'], rows[0]['calado']), (10.0, 12.5))
+        self.assertEqual((rows[1]['ativo'], rows[1]['teus'], rows[1]['obs']), (False, None, None))
+
+    def test_type_change_after_first_block_falls_back_to_pandas(self):
+        """Test a column that stops being numeric past the first block is still read"""
+        path = self.write('porto,carga\n' + 'Santos,1\n' * 200 + 'Itajaí,n/d\n')
+
+        with override_settings(IMPORT_ARROW_BLOCK_SIZE=256):
+            rows = self.read_both(path)
+
+        self.assertEqual(len(rows), 201)
+        self.assertEqual(rows[-1]['carga'], 'n/d')
+
+    def test_duplicate_header_names_use_pandas(self):
+        """Test repeated column names keep pandas' renaming"""
+        rows = self.read_both(self.write('porto,porto\nSantos,Itajaí\n'))
+
+        self.assertEqual(rows, [{'porto': 'Santos', 'porto.1': 'Itajaí'}])
+
+
+class XlsxReaderTest(TestCase):
+    """Tests for the streaming XLSX reader"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def write(self, rows):
+        from openpyxl import Workbook
+
+        path = os.path.join(self.tmpdir, 'portos.xlsx')
+        workbook = Workbook()
+        for row in rows:
+            workbook.active.append(row)
+        workbook.save(path)
+        return path
+
+    def test_dates_are_read_as_text_and_rows_hash(self):
+        """Test date cells become strings, so the rows can be hashed and imported"""
+        from datetime import date, datetime
+        from .hashing import normalize_and_hash_block
+        from .xlsx_reader import read_xlsx_records
+
+        path = self.write([
+            ['porto', 'atracacao', 'saida', 'teus', 'perigosa'],
+            ['Santos', date(2024, 1, 5), datetime(2024, 1, 5, 10, 30), 10, True],
+            [],
+            ['Itajaí', date(2024, 2, 1), datetime(2024, 2, 1), None, False],
+        ])
+
+        with override_settings(IMPORT_XLSX_ENGINE='stream'):
+            rows = read_xlsx_records(path)
+
+        self.assertEqual(rows, [
+            {'porto': 'Santos', 'atracacao': '2024-01-05', 'saida': '2024-01-05 10:30:00',
+             'teus': 10.0, 'perigosa': True},
+            {'porto': 'Itajaí', 'atracacao': '2024-02-01', 'saida': '2024-02-01',
+             'teus': None, 'perigosa': False},
+        ])
+        block = normalize_and_hash_block(rows, {name: name for name in rows[0]})
+        self.assertEqual((block['errors'], len(block['rows'])), (0, 2))
+
+    def test_excel_shared_strings_and_date_styles(self):
+        """Test a file laid out like Excel writes it: shared strings, rich text, date styles"""
+        import zipfile
+        from .xlsx_reader import read_xlsx_records
+
+        ns = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+        path = os.path.join(self.tmpdir, 'portos.xlsx')
+        with zipfile.ZipFile(path, 'w') as archive:
+            archive.writestr('xl/sharedStrings.xml', (
+                f'<sst {ns}><si><t>porto</t></si><si><t>data</t></si>'
+                f'<si><r><t>São </t></r><r><t>Luís</t></r></si><si><t>carga</t></si></sst>'
+            ))
+            archive.writestr('xl/styles.xml', (
+                f'<styleSheet {ns}><numFmts><numFmt numFmtId="164" formatCode="dd/mm/yyyy hh:mm"/></numFmts>'
+                f'<cellXfs><xf numFmtId="0"/><xf numFmtId="14"/><xf numFmtId="164"/><xf numFmtId="4"/></cellXfs>'
+                f'</styleSheet>'
+            ))
+            archive.writestr('xl/worksheets/sheet1.xml', (
+                f'<worksheet {ns}><sheetData>'
+                f'<row r="1"><c r="A1" t="s"><v>0</v></c><c r="B1" t="s"><v>1</v></c>'
+                f'<c r="C1" t="s"><v>3</v></c><c r="D1" t="s"><v>1</v></c></row>'
+                f'<row r="2"><c r="A2" t="s"><v>2</v></c><c r="B2" s="1"><v>45296</v></c>'
+                f'<c r="C2" s="3"><v>1234.5</v></c><c r="D2" s="2"><v>45296.4375</v></c></row>'
+                f'<row r="4"><c r="A4" t="s"><v>2</v></c><c r="C4" s="3"><v>7</v></c></row>'
+                f'</sheetData></worksheet>'
+            ))
+
+        with override_settings(IMPORT_XLSX_ENGINE='stream'):
+            rows = read_xlsx_records(path)
+
+        self.assertEqual(rows, [
+            {'porto': 'São Luís', 'data': '2024-01-05', 'carga': 1234.5, 'data.1': '2024-01-05 10:30:00'},
+            {'porto': 'São Luís', 'data': None, 'carga': 7.0, 'data.1': None},
+        ])
+
+    @skipUnless(importlib.util.find_spec('python_calamine'), 'python-calamine not installed')
+    def test_calamine_matches_streaming_reader(self):
+        """Test both engines produce the same rows"""
+        from datetime import date
+        from .xlsx_reader import read_xlsx_records
+
+        path = self.write([
+            ['porto', 'porto', None, 'data', 'carga'],
+            ['Santos', 'A', None, date(2024, 1, 5), 1.5],
+            ['Suape', None, 'x', None, 2],
+        ])
+
+        with override_settings(IMPORT_XLSX_ENGINE='stream'):
+            streamed = read_xlsx_records(path)
+        self.assertEqual(read_xlsx_records(path), streamed)
+        self.assertEqual(list(streamed[0]), ['porto', 'porto.1', 'Unnamed: 2', 'data', 'carga'])
+        self.assertEqual(streamed[1]['carga'], 2.0)
+
+
+class BatchImportTest(APITestCase):
+    """Tests for batch imports of workbooks and zip bundles"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.spool_dir = tempfile.mkdtemp()
+        self.override = override_settings(IMPORT_SPOOL_DIR=self.spool_dir)
+        self.override.enable()
+        self.user = User.objects.create_user(username='batcher', email='batch@test.com', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.spool_dir, ignore_errors=True)
+
+    def workbook_upload(self):
+        import io
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from openpyxl import Workbook
+
+        workbook = Workbook()
+        workbook.active.title = 'Janeiro'
+        for row in [['porto', 'carga'], ['Santos', 10], ['Suape', 20]]:
+            workbook.active.append(row)
+        fevereiro = workbook.create_sheet('Fevereiro')
+        for row in [['porto', 'carga'], ['Itajai', 40], ['Santos', 10]]:
+            fevereiro.append(row)
+        workbook.create_sheet('Notas').append(['Fonte: ANTAQ'])
+
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+        return SimpleUploadedFile('movimentacao.xlsx', buffer.getvalue())
+
+    def run_batch(self, response, apply_async):
+        from .tasks import process_batch_import_async
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED, response.data)
+        process_batch_import_async.apply(
+            args=apply_async.call_args.kwargs['args'], task_id=response.data['task_id']
+        ).get()
+        return AsyncTask.objects.get(task_id=response.data['task_id'])
+
+    @mock.patch('data_import.tasks.process_batch_import_async.apply_async')
+    def test_workbook_sheets_are_created_or_appended(self, apply_async):
+        """Test each sheet goes to its mapped dataset and one AsyncTask aggregates them"""
+        import json
+
+        existing = create_process_with_records(self.user)
+        response = self.client.post('/api/v1/data-import/batch/', {
+            'file': self.workbook_upload(),
+            'mapping': json.dumps({'Janeiro': 'mov_janeiro', 'Fevereiro': {'process_id': existing.id}, 'Notas': None}),
+        }, format='multipart')
+
+        self.assertEqual(response.data['entries'], [
+            {'entry': 'Janeiro', 'table_name': 'mov_janeiro'},
+            {'entry': 'Fevereiro', 'process_id': existing.id},
+        ])
+        task = self.run_batch(response, apply_async)
+
+        self.assertEqual((task.task_name, task.status), ('Batch Import', 'success'))
+        self.assertEqual((task.result['imported_entries'], task.result['inserted']), (2, 3))
+        self.assertEqual(task.result['duplicates'], 1)
+        self.assertEqual(DataImportProcess.objects.get(table_name='mov_janeiro').record_count, 2)
+        existing.refresh_from_db()
+        self.assertEqual(existing.record_count, 4)
+        self.assertEqual(os.listdir(os.path.join(self.spool_dir, 'tasks')), [])
+
+    @mock.patch('data_import.tasks.process_batch_import_async.apply_async')
+    def test_zip_members_use_default_names_and_failures_are_reported(self, apply_async):
+        """Test unmapped zip members get prefixed table names and a bad member doesn't stop the rest"""
+        import io
+        import zipfile
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as archive:
+            archive.writestr('2024/santos.csv', 'porto,carga\nSantos,1\nSantos,2\n')
+            archive.writestr('2024/suape.csv', '')
+            archive.writestr('__MACOSX/2024/._santos.csv', 'x')
+            archive.writestr('leiame.txt', 'x')
+
+        response = self.client.post('/api/v1/data-import/batch/', {
+            'file': SimpleUploadedFile('portos.zip', buffer.getvalue()), 'table_prefix': 'portos_',
+        }, format='multipart')
+        task = self.run_batch(response, apply_async)
+
+        self.assertEqual(task.status, 'success')
+        self.assertEqual((task.result['imported_entries'], task.result['failed_entries']), (1, 1))
+        self.assertEqual(DataImportProcess.objects.get(table_name='portos_santos').record_count, 2)
+        failed = [result for result in task.result['results'] if 'error' in result]
+        self.assertEqual(failed[0]['entry'], '2024/suape.csv')
+
+    def test_invalid_mapping_is_rejected(self):
+        """Test unknown sheets and datasets of other users are refused before anything is spooled"""
+        import json
+
+        response = self.client.post('/api/v1/data-import/batch/', {
+            'file': self.workbook_upload(), 'mapping': json.dumps({'Março': 'mov_marco'}),
+        }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Março', response.data['error'])
+
+        other = User.objects.create_user(username='other', email='other@test.com', password='testpass123')
+        foreign = create_process_with_records(other, table_name='alheio')
+        response = self.client.post('/api/v1/data-import/batch/', {
+            'file': self.workbook_upload(), 'mapping': json.dumps({'Janeiro': {'process_id': foreign.id}}),
+        }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(AsyncTask.objects.exists())
+
+
+class CompressedImportTest(APITestCase):
+    """Tests for compressed CSV imports"""
+
+    CSV = 'porto;carga;calado\nSantos;10;12,5\nSuape;20;9,0\nItajaí;30;11,2\n'.encode('cp1252')
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.spool_dir = tempfile.mkdtemp()
+        self.override = override_settings(IMPORT_SPOOL_DIR=self.spool_dir, IMPORT_ASYNC_ENABLED=False)
+        self.override.enable()
+        self.user = User.objects.create_user(username='gzip', email='gzip@test.com', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.spool_dir, ignore_errors=True)
+
+    def upload(self, name, content, table_name='portos_gz'):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        return self.client.post('/api/v1/data-import/', {
+            'import_type': 'file', 'table_name': table_name, 'file': SimpleUploadedFile(name, content)
+        }, format='multipart')
+
+    def zip_bytes(self, members):
+        import io
+        import zipfile
+
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for name, content in members.items():
+                archive.writestr(name, content)
+        return buffer.getvalue()
+
+    def test_gzip_and_zip_uploads_are_imported(self):
+        """Test .csv.gz and single-CSV .zip uploads are parsed with the detected pt-BR format"""
+        import gzip
+
+        for name, content in (('portos.csv.gz', gzip.compress(self.CSV)),
+                              ('portos.zip', self.zip_bytes({'portos.csv': self.CSV}))):
+            table_name = name.replace('.', '_')
+            response = self.upload(name, content, table_name)
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+
+            process = DataImportProcess.objects.get(table_name=table_name)
+            self.assertEqual(process.record_count, 3)
+            self.assertEqual(process.column_structure['calado']['type'], 'REAL')
+            record = process.records.get(data__porto='Itajaí')
+            self.assertEqual(record.data['calado'], 11.2)
+
+    def test_background_import_reads_spooled_bz2(self):
+        """Test spooled compressed files keep both extensions and are read as a stream"""
+        import bz2
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from .spool import spool_upload
+
+        path = spool_upload(SimpleUploadedFile('portos.csv.bz2', bz2.compress(self.CSV)), 'task-bz2')
+        self.assertTrue(path.endswith('.csv.bz2'))
+
+        data, column_structure = DataImportService.process_file_data_from_path(path)
+        self.assertEqual([row['porto'] for row in data], ['Santos', 'Suape', 'Itajaí'])
+        self.assertEqual(column_structure['carga']['type'], 'INTEGER')
+
+    def test_decompressed_size_is_limited(self):
+        """Test a small file expanding past the limit is rejected before it is parsed"""
+        import gzip
+
+        bomb = gzip.compress(b'porto;carga\n' + b'Santos;1\n' * 200000)
+        with override_settings(IMPORT_DECOMPRESSED_MAX_BYTES=100 * 1024):
+            response = self.upload('portos.csv.gz', bomb)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('descompactado', str(response.data['details']['file']))
+        self.assertFalse(DataImportProcess.objects.exists())
+
+    def test_zip_with_several_files_points_to_batch_import(self):
+        """Test a .zip import needs exactly one CSV"""
+        response = self.upload('portos.zip', self.zip_bytes({'a.csv': self.CSV, 'b.csv': self.CSV}))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('/batch/', str(response.data['details']['file']))
+
+    @skipUnless(importlib.util.find_spec('zstandard'), 'zstandard not installed')
+    def test_zstd_upload_is_imported(self):
+        """Test .csv.zst uploads are decompressed with zstandard"""
+        import zstandard
+
+        response = self.upload('portos.csv.zst', zstandard.ZstdCompressor().compress(self.CSV))
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(DataImportProcess.objects.get(table_name='portos_gz').record_count, 3)
+
+
+class KeyedAppendTest(APITestCase):
+    """Tests for key columns and keyed upserts on append"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user(username='keyed', email='keyed@test.com', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.process = create_process_with_records(self.user)
+
+    def set_keys(self, columns):
+        return self.client.put(
+            f'/api/v1/data-import/processes/{self.process.id}/key-columns/', {'columns': columns}, format='json'
+        )
+
+    def append(self, csv_text, **extra):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        return self.client.post(f'/api/v1/data-import/processes/{self.process.id}/append/', {
+            'import_type': 'file', 'table_name': 'portos_append',
+            'file': SimpleUploadedFile('portos.csv', csv_text.encode()), **extra
+        }, format='multipart')
+
+    def test_key_columns_are_validated_and_indexed(self):
+        """Test unknown columns and repeated keys are rejected and existing records get a key hash"""
+        self.assertEqual(self.set_keys(['cnpj']).status_code, status.HTTP_400_BAD_REQUEST)
+
+        ImportedDataRecord.objects.create(
+            process=self.process, data={'porto': 'Santos', 'carga': 99},
+            row_hash=ImportedDataRecord.generate_row_hash({'porto': 'Santos', 'carga': 99})
+        )
+        response = self.set_keys(['porto'])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('repetem a chave', response.data['error'])
+
+        ImportedDataRecord.objects.filter(data__carga=99).delete()
+        response = self.set_keys(['porto'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(response.data['key_columns'], ['porto'])
+        self.process.refresh_from_db()
+        self.assertTrue(self.process.column_structure['porto']['key'])
+        self.assertFalse(self.process.records.filter(key_hash__isnull=True).exists())
+
+    def test_append_merges_rows_by_key(self):
+        """Test appends to a keyed dataset insert new keys, update changed rows and skip unchanged ones"""
+        self.set_keys(['porto'])
+
+        response = self.append('porto,carga\nSantos,10\nItajai,25\nRecife,40\n')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        stats = response.data['statistics']
+        self.assertEqual((stats['inserted'], stats['updated'], stats['duplicates'], stats['deleted']), (1, 1, 1, 0))
+        self.assertEqual(
+            dict(self.process.records.values_list('data__porto', 'data__carga')),
+            {'Santos': 10, 'Itajai': 25, 'Suape': 30, 'Recife': 40}
+        )
+        self.process.refresh_from_db()
+        self.assertEqual(self.process.record_count, 4)
+
+    def test_delete_missing_soft_deletes(self):
+        """Test delete_missing hides records absent from the append until their key comes back"""
+        self.set_keys(['porto'])
+
+        response = self.append('porto,carga\nSantos,10\n', delete_missing='true')
+        self.assertEqual(response.data['statistics']['deleted'], 2)
+        self.assertEqual(list(self.process.records.values_list('data__porto', flat=True)), ['Santos'])
+        self.assertEqual(ImportedDataRecord.all_objects.filter(process=self.process).count(), 3)
+        self.process.refresh_from_db()
+        self.assertEqual(self.process.record_count, 1)
+
+        response = self.append('porto,carga\nSuape,30\n')
+        self.assertEqual(response.data['statistics']['inserted'], 1)
+        self.process.refresh_from_db()
+        self.assertEqual(self.process.record_count, 2)
+
+
+class DatasetVersionTest(APITestCase):
+    """Tests for dataset versions, as-of reads and rollback"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user(username='versions', email='versions@test.com', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+
+    def post_csv(self, url, csv_text, **extra):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        return self.client.post(url, {
+            'import_type': 'file', 'table_name': extra.pop('table_name', 'portos_v'),
+            'file': SimpleUploadedFile('portos.csv', csv_text.encode()), **extra
+        }, format='multipart')
+
+    def test_appends_are_versions_readable_as_of_and_rolled_back(self):
+        """Test each import/append stamps a version that can be read as of and rolled back"""
+        response = self.post_csv('/api/v1/data-import/', 'porto,carga\nSantos,10\nItajai,20\n')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        process = DataImportProcess.objects.get(table_name='portos_v')
+        base = f'/api/v1/data-import/processes/{process.id}'
+
+        self.client.put(f'{base}/key-columns/', {'columns': ['porto']}, format='json')
+        response = self.post_csv(f'{base}/append/', 'porto,carga\nSantos,15\nRecife,30\n',
+                                 table_name='portos_append', delete_missing='true')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+
+        versions = self.client.get(f'{base}/versions/').data['versions']
+        self.assertEqual([(v['number'], v['kind'], v['record_count']) for v in versions],
+                         [(2, 'append', 2), (1, 'import', 2)])
+        self.assertEqual(versions[0]['statistics']['updated'], 1)
+
+        as_of = self.client.get(f'{base}/preview/', {'version': 1})
+        self.assertEqual(sorted((row['porto'], row['carga']) for row in as_of.data['data']),
+                         [('Itajai', 20), ('Santos', 10)])
+        current = self.client.get(f'{base}/preview/')
+        self.assertEqual(sorted((row['porto'], row['carga']) for row in current.data['data']),
+                         [('Recife', 30), ('Santos', 15)])
+        self.assertEqual(self.client.get(f'{base}/preview/', {'version': 9}).status_code,
+                         status.HTTP_404_NOT_FOUND)
+
+        self.assertEqual(self.client.post(f'{base}/versions/1/rollback/').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(f'{base}/versions/2/rollback/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(response.data['process']['record_count'], 2)
+        self.assertEqual(sorted(process.records.values_list('data__porto', 'data__carga')),
+                         [('Itajai', 20), ('Santos', 10)])
+        self.assertEqual(ImportedDataRecord.all_objects.filter(process=process).count(), 2)
+
+        response = self.post_csv(f'{base}/append/', 'porto,carga\nSuape,40\n', table_name='portos_append')
+        self.assertEqual(process.versions.get(number=3).statistics['inserted'], 1)
+
+
+class DatasetDeletionTest(APITestCase):
+    """Tests for immediate dataset deletion with background record purge"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user(username='deleter', email='deleter@test.com', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.process = create_process_with_records(
+            self.user, rows=[{'porto': f'Porto {i}', 'carga': i} for i in range(25)]
+        )
+
+    @mock.patch('data_import.tasks.purge_dataset_async.delay')
+    def test_delete_hides_dataset_and_queues_purge(self, delay):
+        """Test the dataset is hidden and renamed at once and its records are left to the purge task"""
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f'/api/v1/data-import/processes/{self.process.id}/delete/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        delay.assert_called_once_with(self.process.id)
+        self.assertFalse(DataImportProcess.objects.filter(pk=self.process.id).exists())
+        self.assertEqual(self.client.get('/api/v1/data-import/processes/').data['count'], 0)
+        self.assertEqual(
+            self.client.get(f'/api/v1/data-import/processes/{self.process.id}/preview/').status_code,
+            status.HTTP_404_NOT_FOUND
+        )
+        self.assertEqual(ImportedDataRecord.all_objects.filter(process_id=self.process.id).count(), 25)
+
+        # The table name is free again
+        create_process_with_records(self.user, rows=[])
+
+    def test_purge_deletes_records_in_batches(self):
+        """Test records are deleted in DELETE batches and the process row goes last"""
+        from .deletion import mark_process_deleted, purge_process, purge_records
+        from .models import DatasetVersion
+
+        other = create_process_with_records(self.user, table_name='outro')
+        DatasetVersion.objects.create(process=self.process, number=1, kind='import')
+        mark_process_deleted(self.process)
+
+        with override_settings(DATASET_PURGE_BATCH_SIZE=10):
+            self.assertEqual(purge_process(self.process.id), 25)
+
+        self.assertFalse(DataImportProcess.all_objects.filter(pk=self.process.id).exists())
+        self.assertFalse(DatasetVersion.objects.filter(process_id=self.process.id).exists())
+        self.assertEqual(other.records.count(), 3)
+        # Live datasets are never purged
+        self.assertEqual(purge_process(other.id), 0)
+        self.assertEqual(purge_records(self.process.id, batch_size=10), 0)
+
+
+@skipUnless(importlib.util.find_spec('pyarrow'), 'pyarrow não instalado')
+class DatasetArchiveTest(APITestCase):
+    """Tests for the cold-tier archival of inactive datasets"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.archive_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_root, ignore_errors=True)
+        override = override_settings(ARCHIVE_ROOT=self.archive_root, ARCHIVE_AFTER_DAYS=30)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = User.objects.create_user(username='archiver', email='archiver@test.com', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.process = create_process_with_records(self.user)
+        # A record replaced by version 2 must survive the round trip
+        ImportedDataRecord.objects.filter(process=self.process, data__porto='Suape').update(
+            deleted_at=timezone.now(), retired_version=2
+        )
+        self.recent = create_process_with_records(self.user, table_name='recente')
+        DataImportProcess.objects.filter(pk__in=[self.process.pk, self.recent.pk]).update(status='inactive')
+        DataImportProcess.objects.filter(pk=self.process.pk).update(updated_at=timezone.now() - timedelta(days=31))
+
+    def test_archive_and_restore_round_trip(self):
+        """Test stale inactive datasets go to Parquet and come back with their retired records"""
+        from .tasks import archive_inactive_datasets_async, restore_dataset_async
+
+        self.assertEqual(archive_inactive_datasets_async(), 1)
+
+        self.process.refresh_from_db()
+        self.assertIsNotNone(self.process.archived_at)
+        self.assertTrue(os.path.exists(self.process.archive_path))
+        self.assertFalse(ImportedDataRecord.all_objects.filter(process=self.process).exists())
+        self.assertEqual(self.recent.records.count(), 3)
+
+        with mock.patch('data_import.tasks.restore_dataset_async.apply_async') as apply_async:
+            response = self.client.post(f'/api/v1/data-import/processes/{self.process.id}/toggle-status/')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        apply_async.assert_called_once()
+
+        restore_dataset_async.apply(kwargs={'process_id': self.process.id, 'user_id': self.user.id})
+
+        self.process.refresh_from_db()
+        self.assertEqual(self.process.status, 'active')
+        self.assertIsNone(self.process.archived_at)
+        self.assertEqual(
+            sorted(record.data['porto'] for record in self.process.records.all()), ['Itajai', 'Santos']
+        )
+        retired = ImportedDataRecord.all_objects.get(process=self.process, data__porto='Suape')
+        self.assertEqual(retired.retired_version, 2)
+        self.assertFalse(os.listdir(self.archive_root))
+
+    def test_archived_dataset_rejects_changes(self):
+        """Test appends and key changes are refused while the records are archived"""
+        from .archive import archive_process
+
+        archive_process(self.process)
+
+        response = self.client.post(
+            f'/api/v1/data-import/processes/{self.process.id}/append/',
+            {'import_type': 'endpoint', 'endpoint_url': 'https://example.com/data.json'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('arquivado', response.data['error'])
+
+        response = self.client.put(
+            f'/api/v1/data-import/processes/{self.process.id}/key-columns/', {'columns': ['porto']}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class DatabaseConfigTest(TestCase):
+    """Tests for the DATABASE_URL configuration"""
+
+    def test_pgbouncer_mode_opens_no_named_cursor(self):
+        """Test PgBouncer mode disables server-side cursors for the record readers and exports"""
+        from core.database import database_config
+        from .readers import iter_record_json
+
+        config = database_config('postgresql://u:p@pgbouncer:6432/dataport', '/tmp', pgbouncer=True)
+        self.assertTrue(config['DISABLE_SERVER_SIDE_CURSORS'])
+        self.assertFalse(database_config('postgresql://u:p@db/dataport', '/tmp')['DISABLE_SERVER_SIDE_CURSORS'])
+
+        user = User.objects.create_user(username='bouncer', email='bouncer@test.com', password='testpass123')
+        records = ImportedDataRecord.objects.filter(process=create_process_with_records(user))
+        flags = {'DISABLE_SERVER_SIDE_CURSORS': config['DISABLE_SERVER_SIDE_CURSORS']}
+        with mock.patch.dict(connection.settings_dict, flags), \
+                mock.patch.object(connection, 'chunked_cursor', side_effect=AssertionError('named cursor opened')):
+            self.assertEqual(len(fetch_record_data(records)), 3)
+            self.assertEqual(len(list(iter_record_json(records))), 3)
+            path = os.path.join(tempfile.mkdtemp(), 'out.csv')
+            self.addCleanup(shutil.rmtree, os.path.dirname(path), True)
+            self.assertEqual(write_export_artifact(records[0].process, 'csv', ['porto', 'carga'], None, path), 3)
+
+
+@override_settings(READ_REPLICAS=['replica_1'])
+class ReplicaRoutingTest(APITestCase):
+    """Tests for read-replica routing of the public endpoints"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user(username='leitor', email='leitor@test.com', password='testpass123')
+        self.process = create_process_with_records(self.user)
+
+    def test_router_only_sends_opted_in_reads_to_replicas(self):
+        """Test reads go to a replica only inside opted-in views and writes always go to the primary"""
+        from core.db_routing import ReplicaRouter, use_replica_reads
+
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(DataImportProcess))
+        use_replica_reads(True)
+        try:
+            self.assertEqual(router.db_for_read(DataImportProcess), 'replica_1')
+            self.assertEqual(router.db_for_read(ImportedDataRecord, instance=self.process), 'default')
+            self.assertEqual(router.db_for_write(DataImportProcess), 'default')
+        finally:
+            use_replica_reads(False)
+        self.assertFalse(router.allow_migrate('replica_1', 'data_import'))
+
+    @mock.patch('core.db_routing.use_replica_reads')
+    def test_user_who_changed_data_reads_from_primary(self, use_replica_reads):
+        """Test public reads use the replica until the user changes data"""
+        self.client.get(f'/api/v1/data-import/public-data/{self.process.id}/')
+        self.assertIn(mock.call(True), use_replica_reads.call_args_list)
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(f'/api/v1/data-import/processes/{self.process.id}/toggle-status/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        use_replica_reads.reset_mock()
+        self.client.get('/api/v1/data-import/public-search/?q=Santos')
+        self.assertNotIn(mock.call(True), use_replica_reads.call_args_list)
+
+
+class FailoverCacheTest(TestCase):
+    """Tests for the Redis cache backend with a local failover tier"""
+
+    def setUp(self):
+        from core.cache_backends import FailoverCache, _states
+
+        location = 'redis://127.0.0.1:1/0'
+        self.addCleanup(_states.pop, location, None)
+        self.cache = FailoverCache(location, {'OPTIONS': {'RETRY_INTERVAL': 60}})
+        self.redis = mock.Mock()
+        self.cache._redis = self.redis
+
+    def test_redis_down_is_served_locally_without_retrying(self):
+        """Test a connection error fails over to local memory and Redis isn't retried before the interval"""
+        from redis.exceptions import ConnectionError as RedisConnectionError
+        from core.cache_backends import tier_metrics
+
+        self.redis.set.side_effect = RedisConnectionError('refused')
+        self.cache.set('porto', 'Santos')
+        self.assertEqual(self.cache.get('porto'), 'Santos')
+
+        self.assertEqual(self.redis.set.call_count, 1)
+        self.redis.get.assert_not_called()
+        self.assertEqual(self.cache.tier, 'local')
+        metrics = tier_metrics()['redis://127.0.0.1:1/0']
+        self.assertEqual((metrics['failovers'], metrics['local']), (1, 2))
+
+    def test_recovery_replays_invalidations(self):
+        """Test deletions made while Redis was down are applied once it answers again"""
+        from redis.exceptions import ConnectionError as RedisConnectionError
+
+        self.redis.set.side_effect = RedisConnectionError('refused')
+        self.cache.set('process:1', 'local')
+        self.cache.delete('process:1')
+        self.cache.delete_pattern('view:process_list*')
+
+        # The retry interval elapsed and Redis is back
+        self.cache._state.down_until = 0
+        self.redis.get.return_value = 'redis'
+        self.assertEqual(self.cache.get('process:1'), 'redis')
+
+        self.assertEqual(self.cache.tier, 'redis')
+        self.redis.delete.assert_called_once_with('process:1', version=None)
+        self.redis.delete_pattern.assert_called_once_with('view:process_list*', version=None)
+        self.assertIsNone(self.cache._local.get('process:1'))
+
+
+class RecordPartitioningTest(TestCase):
+    """Tests for the PostgreSQL record partitioning on other backends"""
+
+    @skipIf(connection.vendor == 'postgresql', 'Covered by PostgresRecordPartitioningTest')
+    @override_settings(RECORD_PARTITIONING=True)
+    def test_partitioning_is_a_noop_off_postgresql(self):
+        """Test partitions are neither created nor dropped on SQLite and the conversion refuses to run"""
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        from .partitioning import ensure_partition, drop_partition, partition_name
+
+        self.assertEqual(partition_name(12), 'data_import_importeddatarecord_p12')
+        self.assertFalse(ensure_partition(12))
+        self.assertFalse(drop_partition(12))
+        with self.assertRaises(CommandError):
+            call_command('partition_records')
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Record partitioning requires PostgreSQL')
+@override_settings(RECORD_PARTITIONING=True)
+class PostgresRecordPartitioningTest(TransactionTestCase):
+    """Tests for the record partitioning DDL on PostgreSQL"""
+
+    # The DDL runs on a copy of the records table, so the conversion and its
+    # partitions are dropped with it instead of outliving the test
+    table = 'test_partitioned_records'
+
+    def setUp(self):
+        qn = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TABLE {qn(self.table)} (LIKE {qn(ImportedDataRecord._meta.db_table)} INCLUDING ALL)'
+            )
+        self.addCleanup(self.drop_table)
+        patcher = mock.patch.object(ImportedDataRecord._meta, 'db_table', self.table)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(username='particao', email='part@test.com', password='testpass123')
+
+    def drop_table(self):
+        qn = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            # Dropping the partitioned table drops its partitions and sequence
+            cursor.execute(f'DROP TABLE IF EXISTS {qn(self.table)} CASCADE')
+            cursor.execute(f'DROP TABLE IF EXISTS {qn(self.table + "_legacy")} CASCADE')
+
+    def partition_of(self, record_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT tableoid::regclass::text FROM {connection.ops.quote_name(self.table)} WHERE id = %s',
+                [record_id]
+            )
+            return cursor.fetchone()[0]
+
+    def partitions(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = to_regclass(%s)', [self.table]
+            )
+            return {row[0] for row in cursor.fetchall()}
+
+    def test_convert_and_ensure_partition(self):
+        """Test the conversion keeps rows and ids, and new datasets get their own attached partition"""
+        from .partitioning import convert_to_partitioned, ensure_partition, is_partitioned, partition_name
+
+        first = create_process_with_records(self.user, table_name='portos_a')
+        create_process_with_records(self.user, table_name='portos_b')
+        max_id = ImportedDataRecord.all_objects.order_by('-id').values_list('id', flat=True)[0]
+
+        self.assertEqual(convert_to_partitioned(log=lambda message: None), 2)
+        with connection.cursor() as cursor:
+            self.assertTrue(is_partitioned(cursor))
+            cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [self.table])
+            self.assertIsNotNone(cursor.fetchone()[0])
+        self.assertEqual(ImportedDataRecord.all_objects.count(), 6)
+
+        # New rows keep getting ids past the copied ones, in their dataset's partition
+        record = ImportedDataRecord.objects.create(process=first, data={'porto': 'Rio'}, row_hash='x')
+        self.assertGreater(record.id, max_id)
+        self.assertEqual(self.partition_of(record.id), partition_name(first.id))
+
+        third = DataImportProcess.objects.create(table_name='portos_c', endpoint_url='file:c.csv', created_by=self.user)
+        self.assertTrue(ensure_partition(third.id))
+        self.assertFalse(ensure_partition(third.id))
+        record = ImportedDataRecord.objects.create(process=third, data={'porto': 'Vitoria'}, row_hash='y')
+        self.assertEqual(self.partition_of(record.id), partition_name(third.id))
+
+    def test_import_creates_partition_outside_transaction(self):
+        """Test imports create the partition first and remove it again when they fail"""
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from .partitioning import convert_to_partitioned, default_partition_name, partition_name
+
+        convert_to_partitioned(log=lambda message: None)
+        upload = SimpleUploadedFile('portos.csv', b'porto,carga\nSantos,10\n', content_type='text/csv')
+        process = DataImportService.import_data('portos_d', user=self.user, file=upload, import_type='file')
+        record = ImportedDataRecord.objects.get(process=process)
+        self.assertEqual(self.partition_of(record.id), partition_name(process.id))
+
+        with mock.patch.object(DataImportService, 'insert_data_orm', side_effect=RuntimeError('boom')):
+            with self.assertRaises(Exception):
+                upload = SimpleUploadedFile('portos.csv', b'porto,carga\nSantos,10\n', content_type='text/csv')
+                DataImportService.import_data('portos_e', user=self.user, file=upload, import_type='file')
+        self.assertFalse(DataImportProcess.all_objects.filter(table_name='portos_e').exists())
+        # The failed import's partition is gone again
+        self.assertEqual(self.partitions(), {default_partition_name(), partition_name(process.id)})
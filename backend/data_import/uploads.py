@@ -0,0 +1,199 @@
+"""
+Resumable chunked uploads
+
+Files too large for a single multipart request are sent in pieces:
+1. POST uploads/ creates a ChunkedUpload and an empty part file in the spool
+   (see spool.upload_part_path).
+2. PUT uploads/<upload_id>/ writes one chunk at the offset sent in the
+   Upload-Offset header. An optional Upload-Checksum header
+   ("<sha256|sha1|md5> <base64 digest>", as in tus) is verified before the
+   offset advances; a chunk that fails it is truncated away and can be resent.
+   The offset is committed with a compare-and-swap once the chunk is on disk,
+   so no database lock is held while the body streams in.
+   GET/HEAD return the current offset so clients resume after a dropped
+   connection.
+3. POST uploads/<upload_id>/complete/ checks the optional SHA-256 of the whole
+   file, moves it into the spool and hands it to the background import.
+"""
+import base64
+import binascii
+import hashlib
+import logging
+import os
+from contextlib import contextmanager
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from .models import ChunkedUpload
+from .spool import upload_part_path
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+CHECKSUM_ALGORITHMS = {
+    'sha256': hashlib.sha256,
+    'sha1': hashlib.sha1,
+    'md5': hashlib.md5,
+}
+
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+
+class UploadChunkError(ValueError):
+    """
+    A chunk (or the completed file) was rejected; the message is user-facing
+    """
+
+
+def parse_checksum_header(value):
+    """
+    Parse an Upload-Checksum header into (algorithm, digest bytes)
+    """
+    try:
+        algorithm, encoded = value.strip().split(' ', 1)
+        digest = base64.b64decode(encoded.strip(), validate=True)
+    except (ValueError, binascii.Error):
+        raise UploadChunkError('Header Upload-Checksum inválido. Use "<algoritmo> <digest em base64>"')
+
+    algorithm = algorithm.lower()
+    if algorithm not in CHECKSUM_ALGORITHMS:
+        raise UploadChunkError(
+            f'Algoritmo de checksum não suportado. Use: {", ".join(CHECKSUM_ALGORITHMS)}'
+        )
+    return algorithm, digest
+
+
+def create_part_file(upload):
+    """
+    Create the empty file an upload's chunks are written to
+    """
+    open(upload_part_path(upload.upload_id), 'wb').close()
+
+
+def discard_part_file(upload):
+    try:
+        os.remove(upload_part_path(upload.upload_id))
+    except FileNotFoundError:
+        pass
+
+
+def write_chunk(upload, stream, length, checksum=None):
+    """
+    Write `length` bytes from `stream` at the upload's current offset and
+    return the new offset. Short reads and checksum mismatches leave the part
+    file as it was before the chunk.
+    """
+    if upload.offset + length > upload.size:
+        raise UploadChunkError('O bloco ultrapassa o tamanho declarado do arquivo')
+
+    hasher = CHECKSUM_ALGORITHMS[checksum[0]]() if checksum else None
+    remaining = length
+
+    with open(upload_part_path(upload.upload_id), 'r+b') as fh:
+        fh.seek(upload.offset)
+        while remaining:
+            data = stream.read(min(WRITE_BUFFER_SIZE, remaining))
+            if not data:
+                break
+            fh.write(data)
+            if hasher:
+                hasher.update(data)
+            remaining -= len(data)
+
+        if remaining:
+            fh.truncate(upload.offset)
+            raise UploadChunkError('Bloco incompleto: a conexão foi encerrada antes do fim do bloco')
+        if hasher and hasher.digest() != checksum[1]:
+            fh.truncate(upload.offset)
+            raise UploadChunkError('Checksum do bloco não confere. Reenvie o bloco')
+        # Drop anything a previous, rejected attempt left past this chunk
+        fh.truncate(upload.offset + length)
+
+    return upload.offset + length
+
+
+@contextmanager
+def _part_file_lock(upload):
+    """
+    Hold an exclusive flock on the part file so only one request writes to an
+    upload at a time (a no-op where fcntl is unavailable).
+    """
+    with open(upload_part_path(upload.upload_id), 'rb') as fh:
+        if fcntl:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        yield
+
+
+def store_chunk(upload, stream, length, checksum=None):
+    """
+    Write a chunk at the upload's offset and advance it with a compare-and-swap.
+
+    No database transaction is held while the body streams in; the part file
+    lock serializes writers instead. Returns the new offset, or None when the
+    upload moved on (another request won the offset, or it was cancelled or
+    expired) — the part file is then left as it was.
+    """
+    offset = upload.offset
+    try:
+        with _part_file_lock(upload):
+            # Re-check under the lock: a writer that waited must not overwrite
+            # the chunk that was just committed
+            if not ChunkedUpload.objects.filter(pk=upload.pk, status='uploading', offset=offset).exists():
+                return None
+
+            new_offset = write_chunk(upload, stream, length, checksum)
+            updated = ChunkedUpload.objects.filter(
+                pk=upload.pk, status='uploading', offset=offset
+            ).update(offset=new_offset, updated_at=timezone.now())
+            if not updated:
+                with open(upload_part_path(upload.upload_id), 'r+b') as fh:
+                    fh.truncate(offset)
+                return None
+    except FileNotFoundError:
+        # The upload was cancelled or expired and its part file removed
+        return None
+
+    upload.offset = new_offset
+    return new_offset
+
+
+def verify_upload(upload):
+    """
+    Hash the completed file and check it against the checksum sent on
+    creation. Returns the SHA-256 hex digest.
+    """
+    digest = hashlib.sha256()
+    with open(upload_part_path(upload.upload_id), 'rb') as fh:
+        for block in iter(lambda: fh.read(WRITE_BUFFER_SIZE), b''):
+            digest.update(block)
+    digest = digest.hexdigest()
+
+    if upload.checksum and upload.checksum.lower() != digest:
+        raise UploadChunkError('Checksum do arquivo não confere com o informado na criação do upload')
+    return digest
+
+
+def expire_stale_uploads(ttl=None):
+    """
+    Mark uploads without activity for `ttl` seconds as expired and remove their
+    part files. Returns the number of uploads expired.
+    """
+    ttl = settings.IMPORT_SPOOL_TTL if ttl is None else ttl
+    stale = ChunkedUpload.objects.filter(
+        status='uploading',
+        updated_at__lt=timezone.now() - timedelta(seconds=ttl)
+    )
+
+    expired = 0
+    for upload in stale:
+        discard_part_file(upload)
+        expired += ChunkedUpload.objects.filter(pk=upload.pk, status='uploading').update(
+            status='expired', updated_at=timezone.now()
+        )
+    if expired:
+        logger.info(f"Expired {expired} stale chunked uploads")
+    return expired
@@ -3,25 +3,39 @@ from .views import (
     ImportDataView, ListProcessesView, ProcessDetailView, DeleteProcessView,
     AppendDataView, ToggleStatusView, DataPreviewView, SearchDataView, DownloadDataView,
     PublicSearchDataView, PublicDownloadDataView, PublicListDatasetsView, PublicDataPreviewView,
-    PublicColumnMetadataView, DashboardStatsView, ReanalyzeColumnTypesView, TaskStatusView
+    PublicColumnMetadataView, DashboardStatsView, ReanalyzeColumnTypesView, TaskStatusView,
+    TaskStatusStreamView, ExportDataView, ExportDownloadView, ChunkedUploadCreateView, ChunkedUploadView,
+    ChunkedUploadCompleteView, BatchImportView, KeyColumnsView, DatasetVersionsView,
+    RollbackVersionView
 )
 
 app_name = 'data_import'
 
 urlpatterns = [
     path('', ImportDataView.as_view(), name='import-data'),
+    path('batch/', BatchImportView.as_view(), name='batch-import'),
     path('processes/', ListProcessesView.as_view(), name='list-processes'),
     path('processes/<int:pk>/', ProcessDetailView.as_view(), name='process-detail'),
     path('processes/<int:pk>/delete/', DeleteProcessView.as_view(), name='delete-process'),
     path('processes/<int:pk>/append/', AppendDataView.as_view(), name='append-data'),
+    path('processes/<int:pk>/key-columns/', KeyColumnsView.as_view(), name='key-columns'),
+    path('processes/<int:pk>/versions/', DatasetVersionsView.as_view(), name='dataset-versions'),
+    path('processes/<int:pk>/versions/<int:number>/rollback/', RollbackVersionView.as_view(), name='rollback-version'),
     path('processes/<int:pk>/toggle-status/', ToggleStatusView.as_view(), name='toggle-status'),
     path('processes/<int:pk>/preview/', DataPreviewView.as_view(), name='data-preview'),
     path('search/', SearchDataView.as_view(), name='search-data'),
     path('processes/<int:pk>/download/', DownloadDataView.as_view(), name='download-data'),
+    path('processes/<int:pk>/export/', ExportDataView.as_view(), name='export-data'),
     path('dashboard-stats/', DashboardStatsView.as_view(), name='dashboard-stats'),
     path('processes/<int:pk>/reanalyze-types/', ReanalyzeColumnTypesView.as_view(), name='reanalyze-types'),
+    # Resumable chunked uploads
+    path('uploads/', ChunkedUploadCreateView.as_view(), name='chunked-upload-create'),
+    path('uploads/<uuid:upload_id>/', ChunkedUploadView.as_view(), name='chunked-upload'),
+    path('uploads/<uuid:upload_id>/complete/', ChunkedUploadCompleteView.as_view(), name='chunked-upload-complete'),
     # Async task status
     path('tasks/<str:task_id>/status/', TaskStatusView.as_view(), name='task-status'),
+    path('tasks/<str:task_id>/events/', TaskStatusStreamView.as_view(), name='task-status-stream'),
+    path('tasks/<str:task_id>/download/', ExportDownloadView.as_view(), name='export-download'),
     # Public endpoints (no authentication required)
     path('public-datasets/', PublicListDatasetsView.as_view(), name='public-list-datasets'),
     path('public-search/', PublicSearchDataView.as_view(), name='public-search-data'),
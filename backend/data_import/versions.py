@@ -0,0 +1,116 @@
+"""
+Dataset versions
+
+Every import or append of a dataset is a version (DatasetVersion, numbered per
+dataset). Records are stamped with the version that created them (version)
+and, when an append with key columns replaces or deletes them, with the
+version that retired them (retired_version); retired records are kept but
+hidden from the live dataset (deleted_at). So:
+
+    - the dataset as of version N is the records with version <= N that were
+      not retired up to N, an index-only filter (records_as_of)
+    - rolling back the latest version deletes the records it created and
+      brings back the ones it retired (rollback_version), no reimport needed
+"""
+import logging
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+from core.db_routing import pin_to_primary
+
+logger = logging.getLogger(__name__)
+
+
+class VersionError(ValueError):
+    """
+    A version can't be read or rolled back; the message is user-facing
+    """
+
+
+def start_version(process, kind, created_by_id=None, task_id=''):
+    """
+    Create the next version of a dataset. Versions started by a task are
+    reused when the task is retried.
+    """
+    from .models import DataImportProcess, DatasetVersion
+
+    with transaction.atomic():
+        # Serialize version numbering per dataset
+        DataImportProcess.objects.select_for_update().filter(pk=process.pk).first()
+        if task_id:
+            version = DatasetVersion.objects.filter(process=process, task_id=task_id).first()
+            if version:
+                return version
+        last = DatasetVersion.objects.filter(process=process).aggregate(last=Max('number'))['last']
+        return DatasetVersion.objects.create(
+            process=process,
+            number=(last or 0) + 1,
+            kind=kind,
+            task_id=task_id or '',
+            created_by_id=created_by_id,
+        )
+
+
+def finish_version(version, statistics, record_count):
+    """
+    Store the statistics and resulting record count of a version
+    """
+    version.statistics = statistics
+    version.record_count = record_count
+    version.save(update_fields=['statistics', 'record_count'])
+    # Background imports finish after the request: let their author read them from the primary
+    pin_to_primary(version.created_by_id)
+
+
+def get_version(process, number):
+    """
+    Active version `number` of a dataset (VersionError if unknown)
+    """
+    from .models import DatasetVersion
+
+    try:
+        return DatasetVersion.objects.get(process=process, number=int(number), status='active')
+    except (DatasetVersion.DoesNotExist, TypeError, ValueError):
+        raise VersionError(f'Versão não encontrada: {number}')
+
+
+def records_as_of(process, number):
+    """
+    Records of a dataset as of version `number`
+    """
+    from .models import ImportedDataRecord
+
+    return ImportedDataRecord.all_objects.filter(
+        Q(retired_version__isnull=True) | Q(retired_version__gt=number),
+        process=process,
+        version__lte=number,
+    )
+
+
+def rollback_version(process, number):
+    """
+    Undo the latest active version of a dataset: delete the records it created
+    and restore the records it retired. Returns the rolled back version.
+    """
+    from .models import DatasetVersion, ImportedDataRecord
+
+    version = get_version(process, number)
+    latest = DatasetVersion.objects.filter(process=process, status='active').aggregate(last=Max('number'))['last']
+    if version.number != latest:
+        raise VersionError(f'Apenas a última versão ({latest}) pode ser revertida')
+
+    with transaction.atomic():
+        deleted, _ = ImportedDataRecord.all_objects.filter(process=process, version=version.number).delete()
+        restored = ImportedDataRecord.all_objects.filter(
+            process=process, retired_version=version.number
+        ).update(retired_version=None, deleted_at=None)
+
+        version.status = 'rolled_back'
+        version.rolled_back_at = timezone.now()
+        version.save(update_fields=['status', 'rolled_back_at'])
+
+        process.record_count = process.records.count()
+        process.save(update_fields=['record_count', 'updated_at'])
+
+    logger.info(f"Rolled back {process.table_name} v{version.number}: {deleted} removed, {restored} restored")
+    return version
@@ -3,24 +3,59 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.pagination import PageNumberPagination
-from django.http import HttpResponse
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from django.http import HttpResponse, StreamingHttpResponse
+from django.core.files import File
+from django.conf import settings
+from django.urls import reverse
 from django.utils.decorators import method_decorator
+from django.db import transaction
 from django.db.models import Sum, Count
 from django.db.models.functions import TruncMonth
 from datetime import datetime, timedelta
 from django_ratelimit.decorators import ratelimit
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from drf_spectacular.types import OpenApiTypes
-from .models import DataImportProcess
-from .serializers import DataImportRequestSerializer, DataImportProcessSerializer
+from core.renderers import ORJSONRenderer, EventStreamRenderer
+from core.db_routing import ReplicaReadMixin
+from .models import DataImportProcess, ChunkedUpload
+from .serializers import (
+    DataImportRequestSerializer, DataImportProcessSerializer, DataExportRequestSerializer,
+    ChunkedUploadCreateSerializer, ChunkedUploadCompleteSerializer, BatchImportRequestSerializer,
+    KeyColumnsSerializer, DatasetVersionSerializer
+)
 from .services import DataImportService
 from .permissions import IsDatasetOwner, CanDeleteDatasets
 from .cache import invalidate_process_caches
+from .exports import (
+    EXPORT_TASK_NAME, build_export_key, export_task_id, export_artifact_path,
+    get_or_create_export_job, ranged_file_response,
+    csv_streaming_response, encode_ndjson, encode_json_envelope, json_streaming_response
+)
+from .readers import iter_record_data, iter_record_json, fetch_record_data
+from .dispatch import should_import_async, dispatch_import, dispatch_append, dispatch_batch_import, dispatch_restore
+from .batch import list_entries, plan_batch, BatchSpecError
+from .merge import key_columns, set_key_columns, KeyColumnsError
+from .deletion import mark_process_deleted
+from .versions import start_version, finish_version, get_version, records_as_of, rollback_version, VersionError
+from .progress import load_task_state, wait_for_task_state, TERMINAL_STATUSES
+from .uploads import (
+    UploadChunkError, parse_checksum_header, create_part_file, discard_part_file,
+    store_chunk, verify_upload
+)
+from .spool import upload_part_path
+from .preflight import scan_file, check_file_limits, FileLimitError
+import io
 import logging
+import time
+import orjson
 import uuid
 
 logger = logging.getLogger(__name__)
 
+# Seconds anonymous clients wait before retrying a public export still being built
+PUBLIC_EXPORT_RETRY_AFTER = 10
+
 
 def log_error_safely(error: Exception, context: str = "") -> str:
     """
@@ -39,6 +74,40 @@ def log_error_safely(error: Exception, context: str = "") -> str:
     return error_id
 
 
+def accepted_task_response(request, async_task, message):
+    """
+    202 response for an import/append handed off to a background task
+    """
+    return Response(
+        {
+            'success': True,
+            'async': True,
+            'message': message,
+            'task_id': async_task.task_id,
+            'status': async_task.status,
+            'status_url': request.build_absolute_uri(
+                reverse('data_import:task-status', args=[async_task.task_id])
+            ),
+            'events_url': request.build_absolute_uri(
+                reverse('data_import:task-status-stream', args=[async_task.task_id])
+            ),
+        },
+        status=status.HTTP_202_ACCEPTED
+    )
+
+
+def archived_process_response(process):
+    """
+    400 response for changes to a dataset whose records are archived
+    """
+    if process.archived_at is None:
+        return None
+    return Response(
+        {'error': f'O dataset {process.table_name} está arquivado. Reative-o antes de alterá-lo.'},
+        status=status.HTTP_400_BAD_REQUEST
+    )
+
+
 class DataImportPagination(PageNumberPagination):
     """
     Paginação para lista de processos
@@ -65,10 +134,15 @@ class DataImportPagination(PageNumberPagination):
     - Tamanho máximo: 50MB
     - Linhas máximas: 100.000
     - Colunas máximas: 100
+
+    Importações grandes (acima de IMPORT_ASYNC_MIN_BYTES / IMPORT_ASYNC_MIN_ROWS)
+    são processadas em segundo plano: a resposta é 202 com o `task_id`, e o
+    progresso é consultado em `/tasks/<task_id>/status/`.
     ''',
     request=DataImportRequestSerializer,
     responses={
         201: DataImportProcessSerializer,
+        202: OpenApiTypes.OBJECT,
         400: OpenApiTypes.OBJECT,
         500: OpenApiTypes.OBJECT,
     },
@@ -127,6 +201,16 @@ class ImportDataView(APIView):
             logger.info(f"   - Arquivo: {uploaded_file.name}")
 
         try:
+            if should_import_async(import_type, uploaded_file=uploaded_file, endpoint_url=endpoint_url):
+                async_task = dispatch_import(
+                    table_name, request.user, import_type,
+                    endpoint_url=endpoint_url, uploaded_file=uploaded_file
+                )
+                logger.info(f"[ASYNC] Importacao enviada para a fila: {async_task.task_id}")
+                return accepted_task_response(
+                    request, async_task, 'Importação iniciada em segundo plano.'
+                )
+
             logger.info("[PROCESS] Iniciando importacao...")
             # Executa importação
             process = DataImportService.import_data(
@@ -156,6 +240,11 @@ class ImportDataView(APIView):
                 status=status.HTTP_201_CREATED
             )
 
+        except FileLimitError as e:
+            return Response(
+                {'success': False, 'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         except Exception as e:
             error_id = log_error_safely(e, "Data import failed")
 
@@ -164,7 +253,7 @@ class ImportDataView(APIView):
             if 'Erro ao ler arquivo' in error_message:
                 user_message = "Não foi possível ler o arquivo. Verifique se está no formato correto (.xlsx, .xls ou .csv)."
             elif 'Formato de arquivo não suportado' in error_message:
-                user_message = "Formato de arquivo não suportado. Use arquivos .xlsx, .xls ou .csv"
+                user_message = "Formato de arquivo não suportado. Use arquivos .xlsx, .xls ou .csv (ou .csv compactado)"
             elif 'arquivo está vazio' in error_message:
                 user_message = "O arquivo está vazio ou não contém dados válidos"
             elif 'timeout' in error_message.lower():
@@ -241,6 +330,19 @@ class ProcessDetailView(APIView):
             )
 
 
+def _enqueue_purge(process_id):
+    """
+    Queue the record purge of a deleted dataset (purge_deleted_datasets_async
+    retries it later if the broker is unavailable)
+    """
+    from .tasks import purge_dataset_async
+
+    try:
+        purge_dataset_async.delay(process_id)
+    except Exception as e:
+        logger.warning(f"Could not enqueue purge of dataset {process_id}: {e}")
+
+
 class DeleteProcessView(APIView):
     """
     View para deletar um processo e sua tabela
@@ -250,21 +352,23 @@ class DeleteProcessView(APIView):
 
     def delete(self, request, pk):
         """
-        Deleta um processo e seus registros associados (usando ORM)
+        Deleta um processo na hora e seus registros em segundo plano
         """
         try:
             process = DataImportProcess.objects.get(pk=pk)
 
             self.check_object_permissions(request, process)
             table_name = process.table_name
+            record_count = process.record_count
 
-            from .models import ImportedDataRecord
-            record_count = ImportedDataRecord.objects.filter(process=process).count()
-
-            process.delete()
+            # The dataset disappears from every view now; the records are
+            # deleted in batches by a background task (see deletion.py)
+            with transaction.atomic():
+                mark_process_deleted(process)
+                transaction.on_commit(lambda: _enqueue_purge(pk))
             invalidate_process_caches(pk)
 
-            logger.info(f"[OK] Processo {table_name} e {record_count} registros deletados com sucesso")
+            logger.info(f"[OK] Processo {table_name} excluido, {record_count} registros serao removidos")
 
             return Response(
                 {
@@ -304,6 +408,10 @@ class AppendDataView(APIView):
 
             self.check_object_permissions(request, process)
 
+            archived = archived_process_response(process)
+            if archived:
+                return archived
+
             logger.info("="*60)
             logger.info(f"[APPEND] Adicionando dados a tabela: {process.table_name}")
             logger.info("="*60)
@@ -327,6 +435,18 @@ class AppendDataView(APIView):
             import_type = serializer.validated_data['import_type']
             endpoint_url = serializer.validated_data.get('endpoint_url')
             uploaded_file = serializer.validated_data.get('file')
+            delete_missing = serializer.validated_data['delete_missing']
+
+            if should_import_async(import_type, uploaded_file=uploaded_file, endpoint_url=endpoint_url):
+                async_task = dispatch_append(
+                    process, request.user, import_type,
+                    endpoint_url=endpoint_url, uploaded_file=uploaded_file,
+                    delete_missing=delete_missing
+                )
+                logger.info(f"[ASYNC] Adicao de dados enviada para a fila: {async_task.task_id}")
+                return accepted_task_response(
+                    request, async_task, 'Adição de dados iniciada em segundo plano.'
+                )
 
             # Busca novos dados
             if import_type == 'endpoint':
@@ -340,14 +460,13 @@ class AppendDataView(APIView):
             else:
                 raise ValueError(f'Tipo de importação inválido: {import_type}')
 
-            insert_stats = DataImportService.insert_data_orm(
-                process,
-                data,
-                process.column_structure
+            # Datasets with key columns are merged by key (see merge.py)
+            version = start_version(process, 'append', created_by_id=request.user.id)
+            insert_stats = DataImportService.append_data(
+                process, data, delete_missing=delete_missing, version=version.number
             )
-
-            process.record_count += insert_stats['inserted']
             process.save()
+            finish_version(version, insert_stats, process.record_count)
 
             invalidate_process_caches(pk)
 
@@ -362,6 +481,10 @@ class AppendDataView(APIView):
 
             # Cria mensagem detalhada
             message_parts = [f"{insert_stats['inserted']} novos registros adicionados"]
+            if insert_stats.get('updated'):
+                message_parts.append(f"{insert_stats['updated']} registros atualizados")
+            if insert_stats.get('deleted'):
+                message_parts.append(f"{insert_stats['deleted']} registros excluídos")
             if insert_stats['duplicates'] > 0:
                 message_parts.append(f"{insert_stats['duplicates']} duplicatas ignoradas")
             if insert_stats['errors'] > 0:
@@ -384,6 +507,11 @@ class AppendDataView(APIView):
                 {'error': 'Processo não encontrado'},
                 status=status.HTTP_404_NOT_FOUND
             )
+        except FileLimitError as e:
+            return Response(
+                {'success': False, 'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         except Exception as e:
             error_id = log_error_safely(e, "Data append failed")
 
@@ -397,6 +525,123 @@ class AppendDataView(APIView):
             )
 
 
+class KeyColumnsView(APIView):
+    """
+    View para declarar as colunas-chave de um dataset
+    PUT /api/data-import/processes/<id>/key-columns/
+
+    Adições a datasets com chave atualizam os registros existentes pela chave
+    em vez de apenas inserir linhas novas.
+    """
+    permission_classes = [IsAuthenticated, IsDatasetOwner]
+
+    def put(self, request, pk):
+        try:
+            process = DataImportProcess.objects.get(pk=pk)
+            self.check_object_permissions(request, process)
+            archived = archived_process_response(process)
+            if archived:
+                return archived
+
+            serializer = KeyColumnsSerializer(data=request.data)
+            if not serializer.is_valid():
+                return Response(
+                    {'error': 'Dados inválidos', 'details': serializer.errors},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            columns = set_key_columns(process, serializer.validated_data['columns'])
+            process.record_count = process.records.count()
+            process.save(update_fields=['record_count', 'updated_at'])
+            invalidate_process_caches(pk)
+
+            return Response({
+                'success': True,
+                'key_columns': columns,
+                'process': DataImportProcessSerializer(process).data
+            })
+
+        except DataImportProcess.DoesNotExist:
+            return Response({'error': 'Processo não encontrado'}, status=status.HTTP_404_NOT_FOUND)
+        except KeyColumnsError as e:
+            return Response({'success': False, 'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            error_id = log_error_safely(e, "Key columns update failed")
+            return Response(
+                {
+                    'success': False,
+                    'error': 'Erro ao definir colunas-chave. Por favor, tente novamente.',
+                    'error_id': error_id
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class DatasetVersionsView(APIView):
+    """
+    View para listar as versões (importações e adições) de um dataset
+    GET /api/data-import/processes/<id>/versions/
+    """
+    permission_classes = [IsAuthenticated, IsDatasetOwner]
+
+    def get(self, request, pk):
+        try:
+            process = DataImportProcess.objects.get(pk=pk)
+            self.check_object_permissions(request, process)
+
+            return Response({
+                'success': True,
+                'versions': DatasetVersionSerializer(process.versions.all(), many=True).data
+            })
+
+        except DataImportProcess.DoesNotExist:
+            return Response({'error': 'Processo não encontrado'}, status=status.HTTP_404_NOT_FOUND)
+
+
+class RollbackVersionView(APIView):
+    """
+    View para reverter a última versão de um dataset
+    POST /api/data-import/processes/<id>/versions/<number>/rollback/
+
+    Remove os registros criados pela versão e restaura os que ela substituiu,
+    sem reimportar o dataset.
+    """
+    permission_classes = [IsAuthenticated, IsDatasetOwner]
+
+    def post(self, request, pk, number):
+        try:
+            process = DataImportProcess.objects.get(pk=pk)
+            self.check_object_permissions(request, process)
+            archived = archived_process_response(process)
+            if archived:
+                return archived
+
+            version = rollback_version(process, number)
+            invalidate_process_caches(pk)
+
+            return Response({
+                'success': True,
+                'message': f'Versão {version.number} revertida',
+                'version': DatasetVersionSerializer(version).data,
+                'process': DataImportProcessSerializer(process).data
+            })
+
+        except DataImportProcess.DoesNotExist:
+            return Response({'error': 'Processo não encontrado'}, status=status.HTTP_404_NOT_FOUND)
+        except VersionError as e:
+            return Response({'success': False, 'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            error_id = log_error_safely(e, "Version rollback failed")
+            return Response(
+                {
+                    'success': False,
+                    'error': 'Erro ao reverter versão. Por favor, tente novamente.',
+                    'error_id': error_id
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
 class ToggleStatusView(APIView):
     """
     View para alternar o status de um processo entre ativo e inativo
@@ -415,6 +660,14 @@ class ToggleStatusView(APIView):
             # Verifica permissão
             self.check_object_permissions(request, process)
 
+            # Reativar um dataset arquivado recarrega seus registros em segundo plano
+            if process.status != 'active' and process.archived_at is not None:
+                async_task = dispatch_restore(process, request.user)
+                return accepted_task_response(
+                    request, async_task,
+                    f'Processo {process.table_name} sendo restaurado do arquivo; ficará ativo ao final.'
+                )
+
             # Alterna status
             if process.status == 'active':
                 process.status = 'inactive'
@@ -476,17 +729,21 @@ class DataPreviewView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            # Query records using ORM
-            records = ImportedDataRecord.objects.filter(process=process)[:5]
-
-            # Convert to list of dictionaries
-            data = [record.data for record in records]
+            # Fetch only the JSON payload of the first records (as of
+            # ?version=N when given)
+            records = ImportedDataRecord.objects.filter(process=process)
+            total_records = process.record_count
+            if request.GET.get('version'):
+                version = get_version(process, request.GET['version'])
+                records = records_as_of(process, version.number)
+                total_records = version.record_count
+            data = fetch_record_data(records, limit=5)
 
             return Response({
                 'success': True,
                 'columns': columns,
                 'data': data,
-                'total_records': process.record_count
+                'total_records': total_records
             })
 
         except DataImportProcess.DoesNotExist:
@@ -494,6 +751,8 @@ class DataPreviewView(APIView):
                 {'error': 'Processo não encontrado'},
                 status=status.HTTP_404_NOT_FOUND
             )
+        except VersionError as e:
+            return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
             return Response(
                 {'error': f'Erro ao buscar prévia: {str(e)}'},
@@ -546,10 +805,10 @@ class SearchDataView(APIView):
                     # Find matching records
                     matching_records = ImportedDataRecord.objects.filter(
                         process=process
-                    ).filter(search_query)[:100]
+                    ).filter(search_query)
+                    table_results = fetch_record_data(matching_records, limit=100)
 
-                    if matching_records.exists():
-                        table_results = [record.data for record in matching_records]
+                    if table_results:
 
                         results.append({
                             'process_id': process.id,
@@ -577,12 +836,6 @@ class SearchDataView(APIView):
             )
 
 
-class Echo:
-    """An object that implements just the write method of the file-like interface for streaming."""
-    def write(self, value):
-        return value
-
-
 class DownloadDataView(APIView):
     """
     View para baixar dados de uma tabela em CSV com streaming
@@ -606,34 +859,27 @@ class DownloadDataView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            def iter_csv_rows():
-                """Generator function to stream CSV rows"""
-                buffer = Echo()
-                writer = csv.writer(buffer)
-
-                # Yield header
-                yield writer.writerow(columns)
-
-                # Stream records in batches to avoid loading all data in memory
-                records = ImportedDataRecord.objects.filter(process=process).iterator(chunk_size=1000)
-                for record in records:
-                    row = [record.data.get(col, '') for col in columns]
-                    yield writer.writerow(row)
-
-            # Create streaming response
-            response = StreamingHttpResponse(
-                iter_csv_rows(),
-                content_type='text/csv'
+            # Stream 64KB CSV chunks built from the raw `data` column
+            records = ImportedDataRecord.objects.filter(process=process)
+            file_name = f'{process.table_name}.csv'
+            if request.GET.get('version'):
+                version = get_version(process, request.GET['version'])
+                records = records_as_of(process, version.number)
+                file_name = f'{process.table_name}_v{version.number}.csv'
+            return csv_streaming_response(
+                request,
+                iter_record_data(records),
+                columns,
+                file_name
             )
-            response['Content-Disposition'] = f'attachment; filename="{process.table_name}.csv"'
-
-            return response
 
         except DataImportProcess.DoesNotExist:
             return Response(
                 {'error': 'Processo não encontrado'},
                 status=status.HTTP_404_NOT_FOUND
             )
+        except VersionError as e:
+            return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
             error_id = log_error_safely(e, "Download failed")
             return Response(
@@ -679,7 +925,7 @@ class PublicListDatasetsView(APIView):
 
 
 @method_decorator(ratelimit(key='ip', rate='100/h', method='GET'), name='get')
-class PublicSearchDataView(APIView):
+class PublicSearchDataView(ReplicaReadMixin, APIView):
     """
     Public view to search data across all active tables (no authentication required)
     GET /api/data-import/public-search/?q=termo
@@ -722,10 +968,10 @@ class PublicSearchDataView(APIView):
                     # Find matching records
                     matching_records = ImportedDataRecord.objects.filter(
                         process=process
-                    ).filter(search_query)[:100]
+                    ).filter(search_query)
+                    table_results = fetch_record_data(matching_records, limit=100)
 
-                    if matching_records.exists():
-                        table_results = [record.data for record in matching_records]
+                    if table_results:
 
                         results.append({
                             'process_id': process.id,
@@ -753,12 +999,50 @@ class PublicSearchDataView(APIView):
             )
 
 
-@method_decorator(ratelimit(key='ip', rate='50/h', method='GET'), name='get')
-class PublicDownloadDataView(APIView):
+def _public_download_params(request, process):
+    """
+    Columns and file format requested for a public download
+    """
+    all_columns = list(process.column_structure.keys())
+    columns_param = request.GET.get('columns', '')
+    if columns_param:
+        selected_columns = [col for col in columns_param.split(',') if col in all_columns]
+    else:
+        selected_columns = all_columns
+
+    # file_format avoids a conflict with DRF's format param
+    file_format = request.GET.get('file_format', request.GET.get('format', 'csv')).lower()
+    if file_format not in ['csv', 'xlsx']:
+        file_format = 'csv'
+    return selected_columns, file_format
+
+
+def _public_download_rate(group, request):
+    """
+    Rate limit for public downloads. Retries for a large Excel export whose job
+    is already pending, running or ready are not counted: the frontend polls
+    the same URL until the file is generated.
+    """
+    from .models import AsyncTask
+
+    process = DataImportProcess.objects.filter(
+        pk=request.resolver_match.kwargs.get('pk'), status='active'
+    ).first()
+    if process and process.record_count > settings.EXPORT_SYNC_MAX_ROWS:
+        selected_columns, file_format = _public_download_params(request, process)
+        if file_format == 'xlsx' and selected_columns:
+            task_id = export_task_id(build_export_key(process, 'xlsx', selected_columns))
+            if AsyncTask.objects.filter(task_id=task_id).exclude(status='failed').exists():
+                return None
+    return '50/h'
+
+
+@method_decorator(ratelimit(key='ip', rate=_public_download_rate, method='GET'), name='get')
+class PublicDownloadDataView(ReplicaReadMixin, APIView):
     """
     Public view to download table data with streaming support (no authentication required)
     GET /api/data-import/public-download/<id>/?format=csv&columns=col1,col2
-    Rate limit: 50 downloads per hour per IP
+    Rate limit: 50 downloads per hour per IP (retries for a pending Excel export are not counted)
     """
     permission_classes = [AllowAny]
 
@@ -769,14 +1053,7 @@ class PublicDownloadDataView(APIView):
         """
         try:
             process = DataImportProcess.objects.get(pk=pk, status='active')
-            all_columns = list(process.column_structure.keys())
-
-            # Get selected columns from query params
-            columns_param = request.GET.get('columns', '')
-            if columns_param:
-                selected_columns = [col for col in columns_param.split(',') if col in all_columns]
-            else:
-                selected_columns = all_columns
+            selected_columns, file_format = _public_download_params(request, process)
 
             if not selected_columns:
                 return Response(
@@ -784,36 +1061,46 @@ class PublicDownloadDataView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            # Get format from query params (use file_format to avoid conflict with DRF's format param)
-            file_format = request.GET.get('file_format', request.GET.get('format', 'csv')).lower()
-            if file_format not in ['csv', 'xlsx']:
-                file_format = 'csv'
-
             from .models import ImportedDataRecord
 
             if file_format == 'csv':
-                def iter_csv_rows():
-                    """Generator function to stream CSV rows"""
-                    buffer = Echo()
-                    writer = csv.writer(buffer, delimiter=';', quoting=csv.QUOTE_MINIMAL)
-
-                    # Yield UTF-8 BOM for Excel compatibility
-                    yield '\ufeff'
-
-                    # Yield header
-                    yield writer.writerow(selected_columns)
-
-                    # Stream records in batches
-                    records = ImportedDataRecord.objects.filter(process=process).iterator(chunk_size=1000)
-                    for record in records:
-                        row = [record.data.get(col, '') for col in selected_columns]
-                        yield writer.writerow(row)
-
-                response = StreamingHttpResponse(
-                    iter_csv_rows(),
-                    content_type='text/csv; charset=utf-8'
+                # UTF-8 BOM and ';' delimiter for Excel compatibility
+                records = ImportedDataRecord.objects.filter(process=process)
+                response = csv_streaming_response(
+                    request,
+                    iter_record_data(records, columns=selected_columns),
+                    selected_columns,
+                    f'{process.table_name}.csv',
+                    delimiter=';',
+                    bom=True
                 )
-                response['Content-Disposition'] = f'attachment; filename="{process.table_name}.csv"'
+
+            elif process.record_count > settings.EXPORT_SYNC_MAX_ROWS:
+                # Large Excel exports run as a background export job; identical
+                # requests share the job and its artifact
+                async_task, export_key, artifact_ready = get_or_create_export_job(
+                    process, 'xlsx', selected_columns
+                )
+                if artifact_ready:
+                    return ranged_file_response(
+                        request,
+                        export_artifact_path(export_key, 'xlsx'),
+                        'xlsx',
+                        f'{process.table_name}.xlsx'
+                    )
+
+                # Anonymous clients can't poll the task status endpoint: answer
+                # 503 + Retry-After so a plain download never saves this body
+                # as the spreadsheet; the same URL serves the file once ready
+                response = Response(
+                    {
+                        'error': 'Exportação em processamento. Tente novamente em alguns instantes.',
+                        'retry_after': PUBLIC_EXPORT_RETRY_AFTER,
+                        'progress': async_task.progress,
+                    },
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE
+                )
+                response['Retry-After'] = str(PUBLIC_EXPORT_RETRY_AFTER)
 
             else:
                 # For Excel, we need to use write-only mode for better memory efficiency
@@ -826,11 +1113,10 @@ class PublicDownloadDataView(APIView):
                 # Write header
                 ws.append(selected_columns)
 
-                # Write data in batches using iterator
-                records = ImportedDataRecord.objects.filter(process=process).iterator(chunk_size=1000)
-                for record in records:
-                    row = [record.data.get(col, '') for col in selected_columns]
-                    ws.append(row)
+                # Stream only the selected columns from the database
+                records = ImportedDataRecord.objects.filter(process=process)
+                for data in iter_record_data(records, columns=selected_columns):
+                    ws.append([data.get(col, '') for col in selected_columns])
 
                 # Save to bytes
                 output = io.BytesIO()
@@ -859,10 +1145,10 @@ class PublicDownloadDataView(APIView):
             )
 
 
-class PublicDataPreviewView(APIView):
+class PublicDataPreviewView(ReplicaReadMixin, APIView):
     """
     Public view to get all data from a specific dataset (no authentication required)
-    GET /api/data-import/public-data/<id>/
+    GET /api/data-import/public-data/<id>/?columns=col1,col2&stream=json|ndjson
     """
     permission_classes = [AllowAny]
 
@@ -884,12 +1170,37 @@ class PublicDataPreviewView(APIView):
                     'error': 'Estrutura de colunas não disponível'
                 }, status=status.HTTP_400_BAD_REQUEST)
 
-            # Query all data using ORM
+            # Optional column projection (?columns=col1,col2) is done in SQL
+            columns_param = request.GET.get('columns', '')
+            if columns_param:
+                columns = [col for col in columns_param.split(',') if col in columns]
+                if not columns:
+                    return Response({
+                        'success': False,
+                        'error': 'Nenhuma coluna válida selecionada'
+                    }, status=status.HTTP_400_BAD_REQUEST)
+
             from .models import ImportedDataRecord
             records = ImportedDataRecord.objects.filter(process=process)
+            projection = columns if columns_param else None
+
+            # Streaming mode (?stream=json|ndjson): records are encoded in chunks
+            # straight from a server-side cursor, so memory stays bounded
+            stream_format = request.GET.get('stream', '').lower()
+            if stream_format in ('json', 'ndjson'):
+                json_iter = iter_record_json(records, columns=projection)
+                if stream_format == 'ndjson':
+                    chunks = encode_ndjson(json_iter)
+                else:
+                    chunks = encode_json_envelope({
+                        'success': True,
+                        'process_id': process.id,
+                        'table_name': process.table_name,
+                        'columns': columns,
+                    }, json_iter)
+                return json_streaming_response(request, chunks, stream_format)
 
-            # Convert to list of dictionaries
-            data = [record.data for record in records]
+            data = fetch_record_data(records, columns=projection)
 
             return Response({
                 'success': True,
@@ -912,7 +1223,7 @@ class PublicDataPreviewView(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class PublicColumnMetadataView(APIView):
+class PublicColumnMetadataView(ReplicaReadMixin, APIView):
     """
     Public view to get column metadata including types and unique values
     GET /api/data-import/public-metadata/<id>/
@@ -963,8 +1274,8 @@ class PublicColumnMetadataView(APIView):
                     # Query unique values using Django JSONField
                     records = ImportedDataRecord.objects.filter(process=process)
                     unique_set = set()
-                    for record in records:
-                        value = record.data.get(col_name)
+                    for data in iter_record_data(records, columns=[col_name]):
+                        value = data[col_name]
                         if value is not None:
                             unique_set.add(str(value))
                             if len(unique_set) >= 100:
@@ -1019,7 +1330,7 @@ class PublicColumnMetadataView(APIView):
     ''',
     responses={200: OpenApiTypes.OBJECT},
 )
-class DashboardStatsView(APIView):
+class DashboardStatsView(ReplicaReadMixin, APIView):
     """
     View para retornar estatísticas agregadas para o dashboard
     GET /api/data-import/dashboard-stats/
@@ -1157,18 +1468,19 @@ class ReanalyzeColumnTypesView(APIView):
             # Get all records for this process
             from .models import ImportedDataRecord
             records = ImportedDataRecord.objects.filter(process=process)
+            data = fetch_record_data(records)
 
-            if not records.exists():
+            if not data:
                 return Response({
                     'success': False,
                     'error': 'Nenhum registro encontrado para este dataset'
                 }, status=status.HTTP_400_BAD_REQUEST)
 
-            # Convert records to list of dicts
-            data = [record.data for record in records]
-
             # Re-analyze column structure with improved type detection
             new_column_structure = DataImportService.analyze_column_structure(data)
+            for name in key_columns(process.column_structure):
+                if name in new_column_structure:
+                    new_column_structure[name]['key'] = True
 
             # Update process with new column structure
             process.column_structure = new_column_structure
@@ -1194,10 +1506,39 @@ class ReanalyzeColumnTypesView(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def _task_status_forbidden(request, state):
+    """
+    Check if the user can read the task state (export jobs are shared between
+    identical requests, like the datasets they read)
+    """
+    if state.get('task_name') == EXPORT_TASK_NAME or request.user.is_superuser:
+        return False
+    return state.get('created_by_id') != request.user.id
+
+
+def _task_status_payload(request, state):
+    """
+    Build the TaskStatusView response body from a progress state
+    """
+    from .models import AsyncTask
+
+    payload = {key: value for key, value in state.items() if key != 'created_by_id'}
+    payload['status_display'] = dict(AsyncTask.TASK_STATUS_CHOICES).get(state['status'], state['status'])
+    if state['status'] == 'success' and state.get('task_name') == EXPORT_TASK_NAME:
+        payload['download_url'] = request.build_absolute_uri(
+            reverse('data_import:export-download', args=[state['task_id']])
+        )
+    return payload
+
+
 class TaskStatusView(APIView):
     """
     View para verificar o status de uma task assíncrona
     GET /api/data-import/tasks/<task_id>/status/
+
+    O estado é lido do cache (publicado pelo worker a cada etapa). Para
+    long-polling, envie `?since=<version>&wait=<segundos>`: a resposta só volta
+    quando a versão mudar, a task terminar ou o tempo acabar.
     """
     permission_classes = [IsAuthenticated]
 
@@ -1208,45 +1549,28 @@ class TaskStatusView(APIView):
         try:
             from .models import AsyncTask
 
-            task = AsyncTask.objects.get(task_id=task_id)
+            try:
+                since = int(request.query_params['since']) if 'since' in request.query_params else None
+                wait = min(float(request.query_params.get('wait', 0)), settings.TASK_STATUS_LONG_POLL_MAX)
+            except ValueError:
+                return Response(
+                    {'error': 'Parâmetros since/wait inválidos'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            state = load_task_state(task_id)
 
             # Check if user owns this task
-            if task.created_by != request.user and not request.user.is_superuser:
+            if _task_status_forbidden(request, state):
                 return Response(
                     {'error': 'Você não tem permissão para acessar esta task'},
                     status=status.HTTP_403_FORBIDDEN
                 )
 
-            # Prepare response
-            response_data = {
-                'task_id': task.task_id,
-                'task_name': task.task_name,
-                'status': task.status,
-                'status_display': task.get_status_display(),
-                'progress': task.progress,
-                'created_at': task.created_at,
-                'updated_at': task.updated_at,
-            }
-
-            # Add result if completed
-            if task.status == 'success':
-                response_data['result'] = task.result
-                response_data['completed_at'] = task.completed_at
-
-            # Add error if failed
-            if task.status == 'failed':
-                response_data['error'] = task.error
-
-            # Add process info if available
-            if task.process:
-                response_data['process'] = {
-                    'id': task.process.id,
-                    'table_name': task.process.table_name,
-                    'record_count': task.process.record_count,
-                    'status': task.process.status,
-                }
+            if since is not None and wait > 0:
+                state = wait_for_task_state(task_id, since=since, timeout=wait)
 
-            return Response(response_data)
+            return Response(_task_status_payload(request, state))
 
         except AsyncTask.DoesNotExist:
             return Response(
@@ -1259,3 +1583,592 @@ class TaskStatusView(APIView):
                 'error': 'Erro ao verificar status da task',
                 'error_id': error_id
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class TaskStatusStreamView(APIView):
+    """
+    View para acompanhar uma task assíncrona via Server-Sent Events
+    GET /api/data-import/tasks/<task_id>/events/
+
+    Emite um evento `progress` a cada mudança de estado e encerra quando a task
+    termina (ou após TASK_STATUS_STREAM_TIMEOUT segundos; o cliente reconecta
+    com o header Last-Event-ID).
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [ORJSONRenderer, EventStreamRenderer]
+
+    def get(self, request, task_id):
+        from .models import AsyncTask
+
+        try:
+            state = load_task_state(task_id)
+        except AsyncTask.DoesNotExist:
+            return Response(
+                {'error': 'Task não encontrada'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        if _task_status_forbidden(request, state):
+            return Response(
+                {'error': 'Você não tem permissão para acessar esta task'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        try:
+            last_version = int(request.headers.get('Last-Event-ID', -1))
+        except ValueError:
+            last_version = -1
+
+        def events():
+            deadline = time.monotonic() + settings.TASK_STATUS_STREAM_TIMEOUT
+            current, version = state, last_version
+            while True:
+                if current.get('version', 0) != version:
+                    version = current.get('version', 0)
+                    data = orjson.dumps(_task_status_payload(request, current)).decode()
+                    yield f'id: {version}\nevent: progress\ndata: {data}\n\n'
+                if current['status'] in TERMINAL_STATUSES:
+                    yield 'event: end\ndata: {}\n\n'
+                    return
+                if time.monotonic() >= deadline:
+                    return
+                current = wait_for_task_state(
+                    task_id, since=version,
+                    timeout=min(15, deadline - time.monotonic())
+                )
+                if current.get('version', 0) == version and current['status'] not in TERMINAL_STATUSES:
+                    # Keep proxies from closing an idle connection
+                    yield ': keep-alive\n\n'
+
+        response = StreamingHttpResponse(events(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+@extend_schema(
+    tags=['Tasks'],
+    summary='Criar job de exportação',
+    description='''
+    Cria (ou reutiliza) um job assíncrono de exportação de dataset.
+
+    Requisições idênticas (mesmo dataset, formato, colunas e filtros) compartilham
+    o mesmo job e o mesmo arquivo gerado. O progresso é consultado em
+    `/tasks/<task_id>/status/` e o arquivo final em `/tasks/<task_id>/download/`.
+    ''',
+    request=DataExportRequestSerializer,
+    responses={
+        200: OpenApiTypes.OBJECT,
+        202: OpenApiTypes.OBJECT,
+        400: OpenApiTypes.OBJECT,
+    },
+)
+@method_decorator(ratelimit(key='user', rate='30/h', method='POST'), name='post')
+class ExportDataView(APIView):
+    """
+    View para criar jobs assíncronos de exportação
+    POST /api/data-import/processes/<id>/export/
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        """
+        Enqueue an export job for a dataset (deduplicated by request parameters)
+        """
+        try:
+            process = DataImportProcess.objects.get(pk=pk)
+
+            serializer = DataExportRequestSerializer(data=request.data, context={'process': process})
+            if not serializer.is_valid():
+                return Response(
+                    {'error': 'Dados inválidos', 'details': serializer.errors},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            file_format = serializer.validated_data['format']
+            async_task, export_key, artifact_ready = get_or_create_export_job(
+                process,
+                file_format,
+                serializer.validated_data['columns'],
+                serializer.validated_data['filters'],
+                user=request.user
+            )
+
+            return Response(
+                {
+                    'success': True,
+                    'task_id': async_task.task_id,
+                    'status': async_task.status,
+                    'progress': async_task.progress,
+                    'status_url': request.build_absolute_uri(
+                        reverse('data_import:task-status', args=[async_task.task_id])
+                    ),
+                    'download_url': request.build_absolute_uri(
+                        reverse('data_import:export-download', args=[async_task.task_id])
+                    ),
+                },
+                status=status.HTTP_200_OK if artifact_ready else status.HTTP_202_ACCEPTED
+            )
+
+        except DataImportProcess.DoesNotExist:
+            return Response(
+                {'error': 'Processo não encontrado'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        except Exception as e:
+            error_id = log_error_safely(e, "Export job creation failed")
+            return Response(
+                {
+                    'error': 'Erro ao criar exportação. Por favor, tente novamente.',
+                    'error_id': error_id
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class ExportDownloadView(APIView):
+    """
+    View para baixar o arquivo de um job de exportação (suporta HTTP Range)
+    GET /api/data-import/tasks/<task_id>/download/
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, task_id):
+        """
+        Download a finished export artifact, resuming from `Range` if provided
+        """
+        try:
+            from .models import AsyncTask
+
+            task = AsyncTask.objects.select_related('process').get(
+                task_id=task_id, task_name=EXPORT_TASK_NAME
+            )
+
+            if task.status != 'success' or not task.result:
+                return Response(
+                    {
+                        'error': 'Exportação ainda não concluída',
+                        'status': task.status,
+                        'progress': task.progress,
+                    },
+                    status=status.HTTP_409_CONFLICT
+                )
+
+            file_format = task.result['format']
+            path = export_artifact_path(task.result['export_key'], file_format)
+
+            import os
+            if not os.path.exists(path):
+                return Response(
+                    {'error': 'Arquivo de exportação expirado. Solicite uma nova exportação.'},
+                    status=status.HTTP_410_GONE
+                )
+
+            return ranged_file_response(
+                request, path, file_format, f"{task.result['table_name']}.{file_format}"
+            )
+
+        except AsyncTask.DoesNotExist:
+            return Response(
+                {'error': 'Exportação não encontrada'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        except Exception as e:
+            error_id = log_error_safely(e, "Export download failed")
+            return Response(
+                {
+                    'error': 'Erro ao baixar exportação. Por favor, tente novamente.',
+                    'error_id': error_id
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+def _upload_payload(request, upload):
+    return {
+        'upload_id': str(upload.upload_id),
+        'file_name': upload.file_name,
+        'size': upload.size,
+        'offset': upload.offset,
+        'status': upload.status,
+        'task_id': upload.task.task_id if upload.task else None,
+        'chunk_size': settings.UPLOAD_CHUNK_SIZE,
+        'upload_url': request.build_absolute_uri(
+            reverse('data_import:chunked-upload', args=[upload.upload_id])
+        ),
+        'complete_url': request.build_absolute_uri(
+            reverse('data_import:chunked-upload-complete', args=[upload.upload_id])
+        ),
+    }
+
+
+def _upload_response(request, upload, status_code=status.HTTP_200_OK, **extra):
+    response = Response({**_upload_payload(request, upload), **extra}, status=status_code)
+    response['Upload-Offset'] = str(upload.offset)
+    response['Upload-Length'] = str(upload.size)
+    return response
+
+
+def _upload_incomplete_response(request, upload):
+    if upload.status != 'uploading' or upload.offset != upload.size:
+        return _upload_response(
+            request, upload, status.HTTP_409_CONFLICT,
+            error='Upload incompleto ou já finalizado'
+        )
+    return None
+
+
+def _claim_upload(request, upload):
+    """
+    Mark a fully received upload as completed and verify its checksum.
+    Returns a 409 response when another request claimed it first, so it
+    can't be imported twice; raises UploadChunkError on a checksum mismatch.
+    """
+    claimed = ChunkedUpload.objects.filter(pk=upload.pk, status='uploading').update(status='completed')
+    if not claimed:
+        upload.refresh_from_db()
+        return _upload_response(
+            request, upload, status.HTTP_409_CONFLICT,
+            error='Upload já finalizado'
+        )
+    upload.status = 'completed'
+
+    try:
+        upload.checksum = verify_upload(upload)
+    except UploadChunkError:
+        discard_part_file(upload)
+        ChunkedUpload.objects.filter(pk=upload.pk).update(status='aborted')
+        raise
+    return None
+
+
+@extend_schema(
+    tags=['Data Import'],
+    summary='Iniciar upload em partes',
+    description='''
+    Inicia um upload retomável para arquivos maiores que o limite do upload comum.
+
+    Envie os blocos com `PUT` em `upload_url` (header `Upload-Offset` e, opcionalmente,
+    `Upload-Checksum: sha256 <digest em base64>`) e finalize com `POST` em `complete_url`.
+    ''',
+    request=ChunkedUploadCreateSerializer,
+    responses={201: OpenApiTypes.OBJECT, 400: OpenApiTypes.OBJECT},
+)
+@method_decorator(ratelimit(key='user', rate='30/h', method='POST'), name='post')
+class ChunkedUploadCreateView(APIView):
+    """
+    View para iniciar uploads em partes (retomáveis)
+    POST /api/data-import/uploads/
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = ChunkedUploadCreateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                {'error': 'Dados inválidos', 'details': serializer.errors},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            upload = ChunkedUpload.objects.create(
+                file_name=serializer.validated_data['file_name'],
+                size=serializer.validated_data['size'],
+                checksum=serializer.validated_data.get('checksum', ''),
+                created_by=request.user,
+            )
+            create_part_file(upload)
+            logger.info(f"[UPLOAD] Upload em partes iniciado: {upload.upload_id} ({upload.size} bytes)")
+            return _upload_response(request, upload, status.HTTP_201_CREATED)
+
+        except Exception as e:
+            error_id = log_error_safely(e, "Chunked upload creation failed")
+            return Response(
+                {
+                    'error': 'Erro ao iniciar upload. Por favor, tente novamente.',
+                    'error_id': error_id
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class ChunkedUploadView(APIView):
+    """
+    View para enviar blocos de um upload em partes
+    GET/HEAD /api/data-import/uploads/<upload_id>/  -> offset atual (para retomar)
+    PUT      /api/data-import/uploads/<upload_id>/  -> grava um bloco em Upload-Offset
+    DELETE   /api/data-import/uploads/<upload_id>/  -> cancela o upload
+    """
+    permission_classes = [IsAuthenticated, IsDatasetOwner]
+
+    def get_upload(self, request, upload_id):
+        upload = ChunkedUpload.objects.select_related('task').get(upload_id=upload_id)
+        self.check_object_permissions(request, upload)
+        return upload
+
+    def get(self, request, upload_id):
+        try:
+            return _upload_response(request, self.get_upload(request, upload_id))
+        except ChunkedUpload.DoesNotExist:
+            return Response({'error': 'Upload não encontrado'}, status=status.HTTP_404_NOT_FOUND)
+
+    def put(self, request, upload_id):
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except (KeyError, ValueError):
+            return Response(
+                {'error': 'Headers Upload-Offset e Content-Length são obrigatórios'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if length <= 0 or length > settings.UPLOAD_CHUNK_MAX_BYTES:
+            return Response(
+                {'error': f'Tamanho de bloco inválido. Máximo: {settings.UPLOAD_CHUNK_MAX_BYTES} bytes'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            checksum = None
+            if request.headers.get('Upload-Checksum'):
+                checksum = parse_checksum_header(request.headers['Upload-Checksum'])
+
+            upload = self.get_upload(request, upload_id)
+            if upload.status != 'uploading':
+                return _upload_response(
+                    request, upload, status.HTTP_409_CONFLICT,
+                    error='Upload não está mais aceitando blocos'
+                )
+            if offset != upload.offset:
+                return _upload_response(
+                    request, upload, status.HTTP_409_CONFLICT,
+                    error='Upload-Offset não corresponde ao offset atual do upload'
+                )
+
+            # The raw body is streamed to the part file, never loaded whole
+            if store_chunk(upload, request.stream, length, checksum) is None:
+                # Another request moved the offset, or the upload was closed, mid-write
+                upload.refresh_from_db()
+                return _upload_response(
+                    request, upload, status.HTTP_409_CONFLICT,
+                    error=(
+                        'Upload não está mais aceitando blocos' if upload.status != 'uploading'
+                        else 'Upload-Offset não corresponde ao offset atual do upload'
+                    )
+                )
+
+            return _upload_response(request, upload)
+
+        except ChunkedUpload.DoesNotExist:
+            return Response({'error': 'Upload não encontrado'}, status=status.HTTP_404_NOT_FOUND)
+        except UploadChunkError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except PermissionDenied:
+            raise
+        except Exception as e:
+            error_id = log_error_safely(e, "Chunk upload failed")
+            return Response(
+                {
+                    'error': 'Erro ao gravar bloco. Reenvie a partir do offset atual.',
+                    'error_id': error_id
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    def delete(self, request, upload_id):
+        try:
+            upload = self.get_upload(request, upload_id)
+            if upload.status == 'uploading':
+                discard_part_file(upload)
+                upload.status = 'aborted'
+                upload.save(update_fields=['status', 'updated_at'])
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        except ChunkedUpload.DoesNotExist:
+            return Response({'error': 'Upload não encontrado'}, status=status.HTTP_404_NOT_FOUND)
+
+
+@extend_schema(
+    tags=['Data Import'],
+    summary='Concluir upload em partes',
+    description='''
+    Conclui um upload em partes e inicia a importação em segundo plano: informe
+    `table_name` para criar um dataset ou `process_id` para adicionar dados a um existente.
+    ''',
+    request=ChunkedUploadCompleteSerializer,
+    responses={202: OpenApiTypes.OBJECT, 400: OpenApiTypes.OBJECT, 409: OpenApiTypes.OBJECT},
+)
+class ChunkedUploadCompleteView(APIView):
+    """
+    View para concluir um upload em partes e enviá-lo para importação
+    POST /api/data-import/uploads/<upload_id>/complete/
+    """
+    permission_classes = [IsAuthenticated, IsDatasetOwner]
+
+    def post(self, request, upload_id):
+        try:
+            upload = ChunkedUpload.objects.get(upload_id=upload_id)
+            self.check_object_permissions(request, upload)
+
+            serializer = ChunkedUploadCompleteSerializer(data=request.data)
+            if not serializer.is_valid():
+                return Response(
+                    {'error': 'Dados inválidos', 'details': serializer.errors},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            process = None
+            if serializer.validated_data.get('process_id'):
+                process = DataImportProcess.objects.get(pk=serializer.validated_data['process_id'])
+                self.check_object_permissions(request, process)
+                archived = archived_process_response(process)
+                if archived:
+                    return archived
+
+            conflict = _upload_incomplete_response(request, upload)
+            if conflict:
+                return conflict
+
+            part_path = upload_part_path(upload.upload_id)
+            with open(part_path, 'rb') as fh:
+                DataImportRequestSerializer._validate_file_content(File(fh, name=upload.file_name))
+            check_file_limits(scan_file(part_path, upload.file_name), check_rows=False)
+
+            conflict = _claim_upload(request, upload)
+            if conflict:
+                return conflict
+
+            if process is None:
+                async_task = dispatch_import(
+                    serializer.validated_data['table_name'], request.user, 'file',
+                    chunked_upload=upload
+                )
+                message = 'Importação iniciada em segundo plano.'
+            else:
+                async_task = dispatch_append(
+                    process, request.user, 'file', chunked_upload=upload,
+                    delete_missing=serializer.validated_data['delete_missing']
+                )
+                message = 'Adição de dados iniciada em segundo plano.'
+
+            upload.task = async_task
+            upload.save(update_fields=['checksum', 'task', 'updated_at'])
+            logger.info(f"[UPLOAD] Upload {upload.upload_id} concluido, task {async_task.task_id}")
+            return accepted_task_response(request, async_task, message)
+
+        except ChunkedUpload.DoesNotExist:
+            return Response({'error': 'Upload não encontrado'}, status=status.HTTP_404_NOT_FOUND)
+        except DataImportProcess.DoesNotExist:
+            return Response({'error': 'Processo não encontrado'}, status=status.HTTP_404_NOT_FOUND)
+        except (UploadChunkError, FileLimitError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except ValidationError as e:
+            return Response(
+                {'error': 'Dados inválidos', 'details': e.detail},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except PermissionDenied:
+            raise
+        except Exception as e:
+            error_id = log_error_safely(e, "Chunked upload completion failed")
+            return Response(
+                {
+                    'error': 'Erro ao concluir upload. Por favor, tente novamente.',
+                    'error_id': error_id
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+@extend_schema(
+    tags=['Data Import'],
+    summary='Importar planilhas/arquivos em lote',
+    description='''
+    Importa de uma vez todas as abas de uma planilha .xlsx ou todos os arquivos CSV/XLSX
+    de um .zip, cada um em um dataset. As entradas são processadas em paralelo em segundo
+    plano e o progresso agregado é reportado por uma única task.
+
+    `mapping` define o destino de cada aba/arquivo: `"nome_tabela"` (novo dataset),
+    `{"process_id": id}` (adicionar a um dataset existente) ou `null` (ignorar).
+    Entradas fora do mapeamento geram datasets com `table_prefix` + nome da entrada.
+    Arquivos acima de 50MB devem ser enviados pelo upload em partes (`upload_id`).
+    ''',
+    request=BatchImportRequestSerializer,
+    responses={202: OpenApiTypes.OBJECT, 400: OpenApiTypes.OBJECT, 409: OpenApiTypes.OBJECT},
+)
+@method_decorator(ratelimit(key='user', rate='10/h', method='POST'), name='post')
+class BatchImportView(APIView):
+    """
+    View para importar várias abas de uma planilha ou arquivos de um .zip
+    POST /api/data-import/batch/
+    """
+    permission_classes = [IsAuthenticated, IsDatasetOwner]
+
+    def post(self, request):
+        serializer = BatchImportRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                {'error': 'Dados inválidos', 'details': serializer.errors},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        uploaded_file = serializer.validated_data.get('file')
+        upload = None
+
+        try:
+            if uploaded_file is not None:
+                entries = list_entries(uploaded_file, uploaded_file.name)
+            else:
+                upload = ChunkedUpload.objects.get(upload_id=serializer.validated_data['upload_id'])
+                self.check_object_permissions(request, upload)
+                conflict = _upload_incomplete_response(request, upload)
+                if conflict:
+                    return conflict
+                entries = list_entries(upload_part_path(upload.upload_id), upload.file_name)
+
+            plan = plan_batch(
+                entries, serializer.validated_data['mapping'], serializer.validated_data['table_prefix']
+            )
+            for target in plan:
+                if 'process_id' in target:
+                    process = DataImportProcess.objects.get(pk=target['process_id'])
+                    self.check_object_permissions(request, process)
+                    archived = archived_process_response(process)
+                    if archived:
+                        return archived
+
+            if upload is not None:
+                conflict = _claim_upload(request, upload)
+                if conflict:
+                    return conflict
+
+            async_task = dispatch_batch_import(
+                request.user, plan, uploaded_file=uploaded_file, chunked_upload=upload
+            )
+            if upload is not None:
+                upload.task = async_task
+                upload.save(update_fields=['checksum', 'task', 'updated_at'])
+
+            logger.info(f"[BATCH] Importacao em lote de {len(plan)} entradas enviada: {async_task.task_id}")
+            response = accepted_task_response(
+                request, async_task, f'Importação em lote de {len(plan)} entradas iniciada em segundo plano.'
+            )
+            response.data['entries'] = plan
+            return response
+
+        except ChunkedUpload.DoesNotExist:
+            return Response({'error': 'Upload não encontrado'}, status=status.HTTP_404_NOT_FOUND)
+        except DataImportProcess.DoesNotExist:
+            return Response({'error': 'Processo não encontrado'}, status=status.HTTP_404_NOT_FOUND)
+        except (BatchSpecError, UploadChunkError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except PermissionDenied:
+            raise
+        except Exception as e:
+            error_id = log_error_safely(e, "Batch import failed")
+            return Response(
+                {
+                    'error': 'Erro ao iniciar importação em lote. Por favor, tente novamente.',
+                    'error_id': error_id
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
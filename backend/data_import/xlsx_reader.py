@@ -0,0 +1,374 @@
+"""
+XLSX reader for file imports
+
+Rows of a worksheet (the first one by default) are streamed in batches of
+plain values, without building openpyxl's cell object model or a pandas
+DataFrame:
+- python-calamine (Rust parser) is used when installed and IMPORT_XLSX_ENGINE
+  is 'auto';
+- otherwise the worksheet XML is read with ElementTree.iterparse, clearing
+  each row once it is converted. Shared strings are loaded once into a list
+  indexed by position, and numbers in date-formatted cells are converted to
+  dates in bulk per batch.
+
+Values come out as the CSV readers produce them, so hashes and inferred types
+do not depend on the format or the engine:
+- dates are 'YYYY-MM-DD' strings ('YYYY-MM-DD HH:MM:SS' with a time of day,
+  'HH:MM:SS' for times);
+- whole numbers are ints, and integer columns with missing values become
+  floats (as pandas reads them);
+- empty cells are None and empty rows are skipped.
+
+pandas/openpyxl (read_excel) is still used for .xls files.
+"""
+import datetime
+import re
+import zipfile
+from xml.etree.ElementTree import iterparse
+import pandas as pd
+from django.conf import settings
+from .dialect import parse_source
+from .preflight import SPREADSHEET_NS, worksheets, worksheet_path
+
+try:
+    from python_calamine import CalamineWorkbook
+except ImportError:  # pragma: no cover - optional dependency
+    CalamineWorkbook = None
+
+BATCH_ROWS = 5000
+
+# Built-in number formats that display dates or times
+BUILTIN_DATE_FORMATS = set(range(14, 23)) | set(range(27, 37)) | set(range(45, 48)) | set(range(50, 59))
+# Quoted literals, [Red]/[$-416] sections and escaped characters of a format code
+FORMAT_LITERALS_RE = re.compile(r'"[^"]*"|\[[^\]]*\]|\\.')
+DATE_CODES_RE = re.compile(r'[dmyhs]', re.IGNORECASE)
+INTEGER_RE = re.compile(r'-?\d+')
+CELL_REF_RE = re.compile(r'([A-Z]+)')
+
+ROW_TAG = f'{SPREADSHEET_NS}row'
+CELL_TAG = f'{SPREADSHEET_NS}c'
+VALUE_TAG = f'{SPREADSHEET_NS}v'
+TEXT_TAG = f'{SPREADSHEET_NS}t'
+SHEET_DATA_TAG = f'{SPREADSHEET_NS}sheetData'
+
+
+def calamine_enabled():
+    return CalamineWorkbook is not None and settings.IMPORT_XLSX_ENGINE != 'stream'
+
+
+def _is_path(source):
+    return isinstance(source, str) or hasattr(source, '__fspath__')
+
+
+def _column_index(ref):
+    index = 0
+    for letter in CELL_REF_RE.match(ref).group(1):
+        index = index * 26 + (ord(letter) - ord('A') + 1)
+    return index - 1
+
+
+def column_names(header):
+    """
+    Column names of a header row, named like pandas does: 'Unnamed: 3' for
+    empty cells and 'name.1' for repeated names
+    """
+    names, seen = [], {}
+    for index, value in enumerate(header):
+        name = f'Unnamed: {index}' if value is None else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f'{name}.{seen[name]}'
+        seen.setdefault(name, 0)
+        names.append(name)
+    return names
+
+
+def format_date(value):
+    """
+    String for a date, datetime or time value read from a worksheet
+    """
+    if isinstance(value, datetime.datetime):
+        if value.time() == datetime.time():
+            return value.date().isoformat()
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, datetime.time):
+        return value.strftime('%H:%M:%S')
+    return str(value)  # timedelta (durations)
+
+
+def convert_serial_dates(serials):
+    """
+    Convert Excel serial numbers (days since 1899-12-30) to date strings in
+    one vectorized call
+    """
+    moments = pd.to_datetime(pd.Series(serials, dtype='float64'), unit='D', origin='1899-12-30').dt.round('s')
+    with_time = moments.dt.strftime('%Y-%m-%d %H:%M:%S')
+    dates = moments.dt.strftime('%Y-%m-%d')
+    times = moments.dt.strftime('%H:%M:%S')
+    has_time = moments != moments.dt.normalize()
+    only_time = pd.Series(serials, dtype='float64') < 1
+    return times.where(only_time, with_time.where(has_time, dates)).tolist()
+
+
+# Streaming XML reader
+
+def _is_date_format(code):
+    return bool(DATE_CODES_RE.search(FORMAT_LITERALS_RE.sub('', code)))
+
+
+def _date_styles(archive):
+    """
+    Indexes of the cell styles (cellXfs) that display numbers as dates
+    """
+    try:
+        styles = archive.open('xl/styles.xml')
+    except KeyError:
+        return set()
+
+    custom_formats, date_styles, style_index, in_cell_xfs = {}, set(), 0, False
+    with styles:
+        for event, elem in iterparse(styles, events=('start', 'end')):
+            tag = elem.tag.replace(SPREADSHEET_NS, '')
+            if event == 'start':
+                if tag == 'cellXfs':
+                    in_cell_xfs = True
+                continue
+            if tag == 'numFmt':
+                custom_formats[int(elem.get('numFmtId'))] = elem.get('formatCode', '')
+            elif tag == 'cellXfs':
+                in_cell_xfs = False
+            elif tag == 'xf' and in_cell_xfs:
+                format_id = int(elem.get('numFmtId', 0))
+                if format_id in BUILTIN_DATE_FORMATS or _is_date_format(custom_formats.get(format_id, '')):
+                    date_styles.add(style_index)
+                style_index += 1
+    return date_styles
+
+
+def _shared_strings(archive):
+    """
+    Shared string table as a list (cells store an index into it)
+    """
+    try:
+        table = archive.open('xl/sharedStrings.xml')
+    except KeyError:
+        return []
+
+    strings = []
+    with table:
+        for _, elem in iterparse(table):
+            if elem.tag == f'{SPREADSHEET_NS}si':
+                # Plain text or rich-text runs (phonetic hints are left out)
+                parts = elem.findall(TEXT_TAG) + elem.findall(f'{SPREADSHEET_NS}r/{TEXT_TAG}')
+                strings.append(''.join(part.text or '' for part in parts))
+                elem.clear()
+    return strings
+
+
+def _cell_value(cell, strings, date_styles):
+    """
+    (value, is_date_serial) of a <c> element
+    """
+    cell_type = cell.get('t', 'n')
+    if cell_type == 'inlineStr':
+        return ''.join(text.text or '' for text in cell.iter(TEXT_TAG)) or None, False
+
+    raw = cell.findtext(VALUE_TAG)
+    if raw is None or cell_type == 'e':
+        return None, False
+    if cell_type == 's':
+        return strings[int(raw)] or None, False
+    if cell_type == 'b':
+        return raw == '1', False
+    if cell_type in ('str', 'd'):
+        return raw or None, False
+
+    if int(cell.get('s', 0)) in date_styles:
+        return float(raw), True
+    return int(raw) if INTEGER_RE.fullmatch(raw) else float(raw), False
+
+
+def _iter_xml_rows(source, min_row, max_row, sheet=None):
+    """
+    Yield (row number, values, date serials to convert) of a worksheet, the
+    header row first
+    """
+    with zipfile.ZipFile(source) as archive:
+        strings = _shared_strings(archive)
+        date_styles = _date_styles(archive)
+
+        with archive.open(worksheet_path(archive, sheet)) as worksheet:
+            sheet_data, row_number, serials = None, 0, []
+            for event, elem in iterparse(worksheet, events=('start', 'end')):
+                if event == 'start':
+                    if elem.tag == SHEET_DATA_TAG:
+                        sheet_data = elem
+                    continue
+                if elem.tag != ROW_TAG:
+                    continue
+
+                row_number = int(elem.get('r') or row_number + 1)
+                if max_row is not None and row_number > max_row:
+                    break
+                if row_number == 1 or row_number >= min_row:
+                    values, position = [], 0
+                    for cell in elem.iter(CELL_TAG):
+                        ref = cell.get('r')
+                        position = _column_index(ref) if ref else position
+                        value, is_serial = _cell_value(cell, strings, date_styles)
+                        if value is not None:
+                            values.extend([None] * (position - len(values)))
+                            values.append(value)
+                            if is_serial:
+                                serials.append((values, position))
+                        position += 1
+                    yield row_number, values, serials
+                    serials = []
+                # Rows already converted are dropped from the tree
+                if sheet_data is not None:
+                    sheet_data.clear()
+                else:
+                    elem.clear()
+
+
+def _xml_batches(source, min_row, max_row, batch_rows, sheet=None):
+    header, batch, serials = None, [], []
+    for row_number, values, row_serials in _iter_xml_rows(source, min_row, max_row, sheet):
+        if header is None and row_number == 1:
+            _fill_dates(row_serials)
+            header = values
+            continue
+        if header is None:
+            header = []  # worksheet without a first row
+        if not values:
+            continue
+        batch.append(values)
+        serials.extend(row_serials)
+        if len(batch) >= batch_rows:
+            _fill_dates(serials)
+            yield header, batch
+            batch, serials = [], []
+
+    if batch:
+        _fill_dates(serials)
+    yield header or [], batch
+
+
+def _fill_dates(serials):
+    if not serials:
+        return
+    texts = convert_serial_dates([values[position] for values, position in serials])
+    for (values, position), text in zip(serials, texts):
+        values[position] = text
+
+
+# python-calamine reader
+
+def _calamine_value(value):
+    if value == '':
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, (datetime.date, datetime.time, datetime.timedelta)):
+        return format_date(value)
+    return value
+
+
+def _calamine_batches(source, min_row, max_row, batch_rows, sheet=None):
+    if _is_path(source):
+        workbook = CalamineWorkbook.from_path(str(source))
+    else:
+        workbook = CalamineWorkbook.from_filelike(source)
+
+    try:
+        if sheet is None:
+            worksheet = workbook.get_sheet_by_index(0)
+        elif sheet in workbook.sheet_names:
+            worksheet = workbook.get_sheet_by_name(sheet)
+        else:
+            raise KeyError(f'Planilha não encontrada: {sheet}')
+        first_row = worksheet.start[0] + 1 if worksheet.start else 1
+        rows = worksheet.iter_rows()
+
+        header, batch = [], []
+        for row_number, row in enumerate(rows, start=first_row):
+            if max_row is not None and row_number > max_row:
+                break
+            values = [_calamine_value(value) for value in row]
+            if row_number == first_row:
+                header = values
+                continue
+            if row_number < min_row or not any(value is not None for value in values):
+                continue
+            while values and values[-1] is None:
+                values.pop()
+            batch.append(values)
+            if len(batch) >= batch_rows:
+                yield header, batch
+                batch = []
+        yield header, batch
+    finally:
+        workbook.close()
+
+
+def sheet_names(source):
+    """
+    Names of the worksheets of an XLSX path or file-like, in workbook order
+    """
+    source = parse_source(source)
+    if not _is_path(source):
+        source.seek(0)
+    with zipfile.ZipFile(source) as archive:
+        return [name for name, _ in worksheets(archive)]
+
+
+def iter_xlsx_batches(source, min_row=2, max_row=None, batch_rows=BATCH_ROWS, sheet=None):
+    """
+    Yield (column names, batch of row dicts) for rows min_row..max_row
+    (1-based, row 1 is the header) of a worksheet (default: the first one) of
+    an XLSX path or uploaded file
+    """
+    source = parse_source(source)
+    if not _is_path(source):
+        source.seek(0)
+
+    batches = _calamine_batches if calamine_enabled() else _xml_batches
+    columns = None
+    for header, rows in batches(source, min_row, max_row, batch_rows, sheet):
+        if columns is None:
+            columns = column_names(header)
+        width = max([len(columns)] + [len(values) for values in rows])
+        if width > len(columns):
+            # Values past the header, like pandas' 'Unnamed' columns
+            columns = column_names(list(header) + [None] * (width - len(header)))
+        yield columns, [dict(zip(columns, values + [None] * (len(columns) - len(values)))) for values in rows]
+
+
+def _pandas_compatible(records, columns):
+    # pandas reads numeric columns with missing values, or mixing ints and
+    # floats, as float64
+    for column in columns:
+        kinds = {type(record[column]) for record in records}
+        if int in kinds and kinds <= {int, float, type(None)} and len(kinds) > 1:
+            for record in records:
+                if record[column] is not None:
+                    record[column] = float(record[column])
+    return records
+
+
+def read_xlsx_records(source, min_row=2, max_row=None, sheet=None):
+    """
+    Parse a worksheet (default: the first one) of an XLSX path or uploaded
+    file into a list of row dicts (None for empty cells)
+    """
+    records, columns = [], []
+    for columns, batch in iter_xlsx_batches(source, min_row, max_row, sheet=sheet):
+        records.extend(batch)
+    # Rows of early batches may lack columns found later
+    for record in records:
+        if len(record) < len(columns):
+            for column in columns:
+                record.setdefault(column, None)
+    return _pandas_compatible(records, columns)
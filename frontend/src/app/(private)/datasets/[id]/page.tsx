@@ -24,7 +24,7 @@ import {
   TableHeader,
   TableRow,
 } from "@/components/ui/table"
-import { apiGet } from "@/lib/api"
+import { apiGet, waitForTask } from "@/lib/api"
 import { useToast } from "@/hooks/use-toast"
 import { config } from "@/lib/config"
 
@@ -133,9 +133,21 @@ export default function DatasetDetailsPage() {
 
       if (response.ok) {
         const data = await response.json()
+
+        // 202: arquivo grande enviado para uma task em background
+        if (response.status === 202) {
+          toast({
+            title: 'Processando arquivo',
+            description: data.message || 'Os registros serão adicionados em segundo plano.'
+          })
+          await waitForTask(data.task_id)
+        }
+
         toast({
           title: 'Sucesso!',
-          description: data.message || `Registros adicionados com sucesso!`
+          description: response.status === 202
+            ? 'Registros adicionados com sucesso!'
+            : data.message || `Registros adicionados com sucesso!`
         })
         setIsUploadDialogOpen(false)
         setSelectedFile(null)
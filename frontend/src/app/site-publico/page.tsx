@@ -172,8 +172,19 @@ export default function SitePublicoPage() {
     try {
       const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000'
       const columnsParam = selectedColumns.join(',')
-      const response = await fetch(`${API_BASE_URL}/api/data-import/public-download/${processId}/?file_format=${downloadFormat}&columns=${encodeURIComponent(columnsParam)}`)
-      if (!response.ok) throw new Error('Erro ao baixar dados')
+      const downloadUrl = `${API_BASE_URL}/api/data-import/public-download/${processId}/?file_format=${downloadFormat}&columns=${encodeURIComponent(columnsParam)}`
+      let response = await fetch(downloadUrl)
+      // 503 + Retry-After: planilha grande ainda sendo gerada no servidor
+      for (let attempt = 0; response.status === 503 && attempt < 30; attempt++) {
+        if (attempt === 0) toast.info("Preparando o arquivo, o download começará em instantes...")
+        const retryAfter = Number(response.headers.get('Retry-After')) || 10
+        await new Promise((resolve) => setTimeout(resolve, retryAfter * 1000))
+        response = await fetch(downloadUrl)
+      }
+      if (!response.ok) {
+        const errorData = await response.json().catch(() => ({}))
+        throw new Error(errorData.error || 'Erro ao baixar dados')
+      }
       const blob = await response.blob()
       const url = window.URL.createObjectURL(blob)
       const a = document.createElement('a')
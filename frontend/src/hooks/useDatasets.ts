@@ -1,7 +1,7 @@
 "use client"
 
 import { useState, useEffect } from 'react'
-import { apiGet, apiPost, apiDelete } from '@/lib/api'
+import { apiGet, apiPost, apiDelete, waitForTask } from '@/lib/api'
 import { config } from '@/lib/config'
 
 export interface Dataset {
@@ -97,6 +97,12 @@ export function useDatasets() {
       }
 
       const result = await response.json()
+
+      // 202: importação grande enviada para uma task em background
+      if (response.status === 202) {
+        await waitForTask(result.task_id)
+      }
+
       await fetchDatasets()
       return result
     } catch (error) {
@@ -118,3 +118,30 @@ export async function apiDelete(endpoint: string): Promise<unknown> {
 
   return response.json()
 }
+
+export interface TaskState {
+  task_id: string
+  status: "pending" | "running" | "success" | "failed"
+  progress: number
+  error?: string
+  result?: Record<string, unknown>
+}
+
+/**
+ * Aguarda uma task assíncrona (resposta 202 de importação/append) terminar,
+ * consultando /tasks/<id>/status/ periodicamente. Lança um erro se a task falhar.
+ */
+export async function waitForTask(taskId: string, intervalMs = 2000): Promise<TaskState> {
+  for (;;) {
+    const state = await apiGet(`/api/data-import/tasks/${taskId}/status/`) as TaskState
+
+    if (state.status === "success") {
+      return state
+    }
+    if (state.status === "failed") {
+      throw new Error(state.error || "Task failed")
+    }
+
+    await new Promise((resolve) => setTimeout(resolve, intervalMs))
+  }
+}